@@ -4,13 +4,28 @@ A collaborative music queue app with Spotify integration and Last.fm recommendat
 """
 
 import os
-from flask import Flask, session, redirect
+import hmac
+
+# WebSocket mode runs on eventlet green threads; patch the standard library
+# before anything else imports it (the eventlet gunicorn worker already does)
+if os.getenv("SOCKETIO_MODE", "polling").lower() == "websocket":
+    import eventlet
+    eventlet.monkey_patch()
+
+from flask import Flask, session, redirect, request
 from datetime import datetime, timezone
 
 # Import configuration and initialization functions
 from backend.utils.config import init_app
 from backend.models.models import init_db
 from backend.websockets.handlers import init_socketio
+from backend.websockets.backpressure import get_backpressure_stats
+from backend.utils.chat_writer import get_chat_writer
+from backend.utils.rate_limit import get_rate_limit_stats
+from backend.utils.presence import get_presence
+from backend.utils.executor import get_executor_stats
+from backend.utils.compression import init_compression
+from backend.utils.host import is_current_host
 
 # Import blueprints
 from backend.auth.spotify_auth import auth_bp
@@ -22,6 +37,7 @@ from backend.routes.playback import playback_bp
 from backend.routes.session import session_mgmt_bp
 from backend.auth.user_auth import user_auth_bp
 from backend.routes.search import search_bp
+from backend.routes.chat import chat_bp
 
 
 def create_app():
@@ -39,6 +55,9 @@ def create_app():
     # Initialize database
     init_db()
     
+    # Compress large JSON responses
+    init_compression(app)
+    
     # Initialize Socket.IO
     socketio = init_socketio(app)
     
@@ -52,6 +71,7 @@ def create_app():
     app.register_blueprint(session_mgmt_bp)
     app.register_blueprint(user_auth_bp, url_prefix="/user_auth")
     app.register_blueprint(search_bp, url_prefix="/search")
+    app.register_blueprint(chat_bp, url_prefix="/chat")
     
     # Health check route
     @app.route("/health")
@@ -59,6 +79,27 @@ def create_app():
         """Simple health check endpoint"""
         return {"status": "healthy", "timestamp": datetime.now(timezone.utc).isoformat()}
     
+    # Runtime metrics for this process: for the current host, or a scraper
+    # sending "Authorization: Bearer <METRICS_TOKEN>"
+    metrics_token = os.getenv("METRICS_TOKEN")
+    
+    @app.route("/metrics")
+    def metrics():
+        """Background pool queue depths, wait and run times, client outbound queues, chat writes, rate limiting and presence"""
+        authorization = request.headers.get("Authorization", "")
+        token_ok = bool(metrics_token) and hmac.compare_digest(authorization, f"Bearer {metrics_token}")
+        if not token_ok and (session.get("role") != "host" or not is_current_host(session.get("user_id"))):
+            return {"error": "Metrics are only available to the host"}, 403
+        
+        return {
+            "executors": get_executor_stats(),
+            "outbound": get_backpressure_stats(socketio),
+            "chat_writer": get_chat_writer().get_stats(),
+            "rate_limits": get_rate_limit_stats(),
+            "presence": get_presence().counts(),
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }
+    
     # Main application route
     @app.route("/")
     def index():
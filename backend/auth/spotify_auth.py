@@ -3,13 +3,15 @@ Authentication routes for BeatSync Mixer.
 Handles login, callback, and session management.
 """
 
-import os
 import time
-import threading
 from datetime import datetime, timezone
 from flask import Blueprint, request, session, redirect, jsonify
 from backend.api.spotify import spotify_oauth, exchange_token, fetch_user_profile, fetch_playlists
 from backend.utils.cache import cache_playlists_async, simplify_playlists_data
+from backend.utils.host import claim_host, update_host
+from backend.utils.executor import submit_task
+from backend.websockets.broadcast import broadcast
+from backend.websockets.context import invalidate_identity
 
 
 auth_bp = Blueprint('auth', __name__)
@@ -32,27 +34,27 @@ def login():
         
         # Clear session and queue when hosting to ensure fresh start
         if requested_role == 'host':
+            invalidate_identity()
             session.clear()
             
             # Also clear the queue for a fresh start
             try:
-                from backend.models.models import get_db, QueueItem, Vote
-                from backend.utils.cache import clear_currently_playing, clear_queue_snapshot
-                with get_db() as db:
-                    # Clear all votes and queue items
-                    db.query(Vote).delete()
-                    db.query(QueueItem).delete()
-                    
-                    # Clear caches
-                    clear_currently_playing()
-                    clear_queue_snapshot()
-                    
-                    # Emit queue cleared event to all connected clients
-                    from flask import current_app
-                    if hasattr(current_app, 'socketio'):
-                        current_app.socketio.emit('queue_cleared')
-                        current_app.socketio.emit('votes_cleared')
-                        current_app.socketio.emit('playback_paused', {'is_playing': False})
+                from backend.queue_store import get_queue_store
+                from backend.utils.cache import clear_currently_playing, record_queue_change
+                
+                # Clear all votes and queue items
+                get_queue_store().clear()
+                
+                # Clear caches and bump the queue version now that the clear is committed
+                clear_currently_playing()
+                record_queue_change("clear")
+                
+                # Emit queue cleared event to all connected clients
+                from flask import current_app
+                if hasattr(current_app, 'socketio'):
+                    broadcast('queue_cleared')
+                    broadcast('votes_cleared')
+                    broadcast('playback_paused', {'is_playing': False})
                         
                 print("Cleared queue, votes, and caches for new host session")
             except Exception as e:
@@ -111,23 +113,20 @@ def callback():
         # Get the requested role from session
         requested_role = session.get('requested_role', 'listener')
         
+        # Sockets already open in this browser or for this user cached their old role
+        invalidate_identity(user_id)
+        
         # Handle role assignment
         if requested_role == 'host':
-            # Check if someone is already hosting
-            host_file = 'current_host.txt'
-            
-            if os.path.exists(host_file):
+            # Claim the host role atomically; fails if someone is already hosting
+            if not claim_host(user_id, display_name):
                 return redirect("/select-role?error=host_taken")
             
-            # Set as host and create host file
+            # Set as host
             session["role"] = "host"
             session["user_id"] = user_id
             session["display_name"] = display_name
             
-            # Create host file to track current host
-            with open(host_file, 'w') as f:
-                f.write(f"{user_id}|{display_name}")
-            
             # IMMEDIATELY cache host access token for listeners - CRITICAL for track loading
             try:
                 from flask import current_app
@@ -166,8 +165,9 @@ def callback():
                     print(f"Background: Error caching playlists: {e}")
             
             # Start background caching - login continues immediately
-            threading.Thread(target=cache_playlists_background, daemon=True).start()
-            print(f"Started background playlist caching for {display_name}")
+            from flask import current_app
+            if submit_task("prefetch", cache_playlists_background, app=current_app._get_current_object()):
+                print(f"Started background playlist caching for {display_name}")
             
         else:
             # Set as listener
@@ -225,6 +225,7 @@ def join_listener():
         
         # Set listener session without Spotify authentication
         # Listener number will be assigned when they connect via WebSocket
+        invalidate_identity()
         session["role"] = "listener"
         session["user_id"] = guest_id
         session["display_name"] = "Listener"  # Temporary, will be updated on WebSocket connect
@@ -259,14 +260,12 @@ def fetch_user_profile_route():
         user_profile = fetch_user_profile(access_token)
         
         if user_profile:
-            session["user_id"] = user_profile.get("id", session.get("user_id"))
+            previous_user_id = session.get("user_id")
+            session["user_id"] = user_profile.get("id", previous_user_id)
             session["display_name"] = user_profile.get("display_name") or user_profile.get("id", "Spotify User")
             
             if session.get("role") == "host":
-                host_file = 'current_host.txt'
-                if os.path.exists(host_file):
-                    with open(host_file, 'w') as f:
-                        f.write(f"{session['user_id']}|{session['display_name']}")
+                update_host(previous_user_id, session["user_id"], session["display_name"])
             
             return jsonify({
                 "success": True,
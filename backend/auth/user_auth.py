@@ -6,6 +6,7 @@ Handles user registration, login, and session management without Spotify depende
 import re
 from flask import Blueprint, request, session, jsonify, render_template_string
 from backend.models.models import get_db, User
+from backend.websockets.context import invalidate_identity
 
 
 user_auth_bp = Blueprint('user_auth', __name__)
@@ -444,7 +445,8 @@ def login():
             if not user or not user.check_password(password):
                 return jsonify({"error": "Invalid username/email or password"}), 401
             
-            # Set session
+            # Set session; sockets already open in this browser or for this user cached their old role
+            invalidate_identity(user.id)
             session['user_id'] = user.id
             session['username'] = user.username
             session['display_name'] = user.username  # Add display_name for chat
@@ -465,6 +467,7 @@ def login():
 @user_auth_bp.route("/logout", methods=["POST"])
 def logout():
     """User logout"""
+    invalidate_identity()
     session.clear()
     return jsonify({"message": "Logged out successfully"}), 200
 
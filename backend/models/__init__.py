@@ -6,9 +6,9 @@ Database models for BeatSync Mixer
 from .models import *
 
 # Also allow direct imports from specific model files
-from .database_config import get_db, init_db
+from .database_config import get_db, init_db, dialect_insert
 from .user_models import User
-from .queue_models import QueueItem, Vote
+from .queue_models import QueueItem, Vote, VoteLedger
 from .chat_models import ChatMessage
 from .playback_models import CurrentlyPlaying
 from .playlist_models import CustomPlaylist, PlaylistTrack
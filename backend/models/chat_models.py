@@ -3,12 +3,16 @@ Chat and communication models for BeatSync Mixer.
 """
 
 from datetime import datetime, timezone
-from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
 from .database_config import Base
 
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # Newest-first history pages seek on (timestamp, id) instead of scanning
+        Index("ix_chat_messages_timestamp_id", "timestamp", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user = Column(String, nullable=False)
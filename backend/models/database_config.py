@@ -3,8 +3,9 @@ Database configuration and session management for BeatSync Mixer.
 """
 
 import os
+import time
 from contextlib import contextmanager
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -27,10 +28,49 @@ Base = declarative_base()
 def init_db():
     """Initialize database tables"""
     print("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
+    # Several worker processes booting at once can race on CREATE TABLE; the
+    # loser retries after a moment and create_all then skips what now exists
+    for attempt in range(1, 4):
+        try:
+            Base.metadata.create_all(bind=engine)
+            break
+        except Exception as e:
+            if attempt == 3:
+                raise
+            print(f"Table creation raced with another process ({e.__class__.__name__}), retrying")
+            time.sleep(0.5 * attempt)
+    dedupe_queue_items()
+    ensure_indexes()
     print("Database tables created successfully")
 
 
+def dedupe_queue_items():
+    """Drop duplicate queue rows (keeping the oldest) so the unique track index can be built"""
+    if not inspect(engine).has_table("queue_items"):
+        return
+    
+    try:
+        with engine.begin() as conn:
+            result = conn.execute(text(
+                "DELETE FROM queue_items WHERE id NOT IN "
+                "(SELECT MIN(id) FROM queue_items GROUP BY track_uri)"
+            ))
+            if result.rowcount:
+                print(f"Removed {result.rowcount} duplicate queue items")
+    except Exception as e:
+        print(f"Warning: Could not dedupe queue items: {e}")
+
+
+def ensure_indexes():
+    """Create indexes added after a table was first created (create_all skips existing tables)"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except Exception as e:
+                print(f"Warning: Could not create index {index.name}: {e}")
+
+
 @contextmanager
 def get_db():
     """Context manager for database sessions with automatic commit/rollback"""
@@ -43,3 +83,18 @@ def get_db():
         raise e
     finally:
         db.close()
+
+
+def dialect_insert(model):
+    """INSERT construct supporting ON CONFLICT for the active dialect.
+    
+    Returns None on dialects without upsert support so callers can fall back
+    to a read-then-write path.
+    """
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif engine.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert(model)
@@ -4,16 +4,16 @@ This file imports all models from specific model files for backward compatibilit
 """
 
 # Import database configuration
-from .database_config import Base, engine, SessionLocal, init_db, get_db
+from .database_config import Base, engine, SessionLocal, init_db, get_db, dialect_insert
 
 # Import all models
 from .user_models import User
-from .queue_models import QueueItem, Vote
+from .queue_models import QueueItem, Vote, VoteLedger, QueueFence
 from .chat_models import ChatMessage
 from .playback_models import CurrentlyPlaying
 
 # Export everything for backward compatibility
 __all__ = [
-    'Base', 'engine', 'SessionLocal', 'init_db', 'get_db',
-    'User', 'QueueItem', 'Vote', 'ChatMessage', 'CurrentlyPlaying'
+    'Base', 'engine', 'SessionLocal', 'init_db', 'get_db', 'dialect_insert',
+    'User', 'QueueItem', 'Vote', 'VoteLedger', 'QueueFence', 'ChatMessage', 'CurrentlyPlaying'
 ]
@@ -3,12 +3,16 @@ Music queue and voting models for BeatSync Mixer.
 """
 
 from datetime import datetime, timezone
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, UniqueConstraint, Index
 from .database_config import Base
 
 
 class QueueItem(Base):
     __tablename__ = "queue_items"
+    __table_args__ = (
+        # A track can only be queued once; inserts rely on this for ON CONFLICT dedupe
+        Index("uq_queue_items_track_uri", "track_uri", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     track_uri = Column(String, nullable=False)
@@ -30,3 +34,33 @@ class Vote(Base):
     
     def __repr__(self):
         return f"<Vote {self.vote_type} for {self.track_uri}>"
+
+
+class VoteLedger(Base):
+    """One row per (user, track): the user's current vote, updated in place"""
+    __tablename__ = "vote_ledger"
+    __table_args__ = (
+        UniqueConstraint("user_id", "track_uri", name="uq_vote_ledger_user_track"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    track_uri = Column(String, nullable=False, index=True)
+    vote_type = Column(String, nullable=False)  # 'up' or 'down'
+    user_id = Column(String, nullable=False)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    
+    def __repr__(self):
+        return f"<VoteLedger {self.user_id} {self.vote_type} for {self.track_uri}>"
+
+
+class QueueFence(Base):
+    """Newest fencing token accepted for queue writes (see SQLQueueStore.remove_track)"""
+    __tablename__ = "queue_fences"
+    
+    QUEUE = "queue"
+    
+    name = Column(String, primary_key=True)
+    token = Column(BigInteger, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<QueueFence {self.name}={self.token}>"
@@ -0,0 +1,57 @@
+"""
+Queue storage backends for BeatSync Mixer.
+QUEUE_STORE selects the backend: "sql" (default), "memory" or "redis".
+"""
+
+import os
+import threading
+from .base_store import QueueStore, StaleFenceError, pick_next_track
+from .sql_store import SQLQueueStore
+from .memory_store import InMemoryQueueStore
+from .redis_store import RedisQueueStore
+
+
+QUEUE_STORE_BACKEND = os.getenv("QUEUE_STORE", "sql").lower()
+
+_queue_store = None
+_queue_store_lock = threading.Lock()
+
+
+def create_queue_store(backend=None):
+    """Build a queue store for the given backend name (falls back to SQL)"""
+    backend = (backend or QUEUE_STORE_BACKEND).lower()
+    
+    if backend == "memory":
+        print("Using in-memory queue store")
+        return InMemoryQueueStore()
+    
+    if backend == "redis":
+        from backend.utils.config import create_manual_redis_client
+        client = create_manual_redis_client()
+        try:
+            if client and client.ping():
+                print("Using Redis queue store")
+                return RedisQueueStore(client)
+        except Exception as e:
+            print(f"Redis ping failed for queue store: {e}")
+        print("Redis unavailable for queue store, falling back to SQL")
+    elif backend != "sql":
+        print(f"Unknown QUEUE_STORE '{backend}', falling back to SQL")
+    
+    return SQLQueueStore()
+
+
+def get_queue_store():
+    """Get the process-wide queue store"""
+    global _queue_store
+    if _queue_store is None:
+        with _queue_store_lock:
+            if _queue_store is None:
+                _queue_store = create_queue_store()
+    return _queue_store
+
+
+__all__ = [
+    'QueueStore', 'StaleFenceError', 'SQLQueueStore', 'InMemoryQueueStore', 'RedisQueueStore',
+    'create_queue_store', 'get_queue_store', 'pick_next_track'
+]
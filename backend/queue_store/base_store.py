@@ -0,0 +1,96 @@
+"""
+Queue storage interface for BeatSync Mixer.
+Every backend stores the queued tracks and their votes and returns plain dicts
+so routes, socket handlers and the snapshot cache don't depend on the storage.
+"""
+
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+
+
+class StaleFenceError(Exception):
+    """A write carried a fencing token older than one the store already accepted"""
+
+
+class QueueStore(ABC):
+    """Base class for queue/vote storage backends"""
+    
+    name = "base"
+    
+    @abstractmethod
+    def add_tracks(self, tracks):
+        """Queue tracks that aren't queued yet.
+        
+        Takes [{track_uri, track_name}] and returns the inserted tracks as
+        [{track_uri, track_name, timestamp}] in the given order.
+        """
+    
+    def add_track(self, track_uri, track_name):
+        """Queue a single track, returning the inserted track or None if already queued"""
+        added = self.add_tracks([{"track_uri": track_uri, "track_name": track_name}])
+        return added[0] if added else None
+    
+    @abstractmethod
+    def remove_track(self, track_uri, fence_token=None):
+        """Remove a track and its votes, returning True if it was queued.
+        
+        With a fence_token (the auto-play lease's fencing token) the check and
+        the removal are one atomic step: StaleFenceError is raised, and nothing
+        removed, if a newer token has already been used.
+        """
+    
+    @abstractmethod
+    def clear(self, fence_token=None):
+        """Remove every track and vote, returning the number of tracks removed.
+        
+        A fence_token is checked and recorded as for remove_track, in the same
+        atomic step as the clear.
+        """
+    
+    @abstractmethod
+    def cast_vote(self, track_uri, user_id, vote_type):
+        """Record an 'up'/'down' vote and return the track's (up_votes, down_votes),
+        or None without recording anything if the track isn't queued"""
+    
+    @abstractmethod
+    def retract_vote(self, track_uri, user_id):
+        """Retract a user's vote and return the track's (up_votes, down_votes),
+        or None if the track isn't queued"""
+    
+    @abstractmethod
+    def get_items(self):
+        """All queued tracks, oldest first, as
+        [{id, track_uri, track_name, timestamp, up_votes, down_votes}]
+        """
+    
+    def get_track(self, track_uri):
+        """A single queued track (same shape as get_items) or None"""
+        return next((item for item in self.get_items() if item["track_uri"] == track_uri), None)
+    
+    def count(self):
+        """Number of queued tracks"""
+        return len(self.get_items())
+    
+    def get_next_track(self):
+        """The track to play next: highest net score, oldest first among ties"""
+        return pick_next_track(self.get_items())
+
+
+def pick_next_track(items):
+    """Choose the next track from items in queue order (every track stays eligible)"""
+    best_track = None
+    for item in items:
+        net_score = item["up_votes"] - item["down_votes"]
+        if best_track is None or net_score > best_track["net_score"]:
+            best_track = {
+                "track_uri": item["track_uri"],
+                "track_name": item["track_name"],
+                "up_votes": item["up_votes"],
+                "down_votes": item["down_votes"],
+                "net_score": net_score
+            }
+    return best_track
+
+
+def utc_now():
+    return datetime.now(timezone.utc)
@@ -0,0 +1,117 @@
+"""
+In-process queue store for BeatSync Mixer.
+Keeps the queue and votes in Python dicts - the fastest option for a
+single-node party, but the state lives only as long as the process.
+"""
+
+import threading
+from backend.utils.votes import VOTE_MODE
+from .base_store import QueueStore, StaleFenceError, utc_now
+
+
+class InMemoryQueueStore(QueueStore):
+    """Queue held in process memory (single worker only)"""
+    
+    name = "memory"
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items = {}   # {track_uri: item}, insertion ordered
+        self._counts = {}  # {track_uri: [up_votes, down_votes]}
+        self._user_votes = {}  # {track_uri: {user_id: [vote_type, ...]}}
+        self._next_id = 1
+        self._fence = 0  # newest fencing token seen by remove_track/clear
+    
+    def add_tracks(self, tracks):
+        added = []
+        with self._lock:
+            for track in tracks:
+                if track["track_uri"] in self._items:
+                    continue
+                item = {
+                    "id": self._next_id,
+                    "track_uri": track["track_uri"],
+                    "track_name": track["track_name"],
+                    "timestamp": utc_now().isoformat()
+                }
+                self._next_id += 1
+                self._items[item["track_uri"]] = item
+                added.append({key: item[key] for key in ("track_uri", "track_name", "timestamp")})
+        return added
+    
+    def _advance_fence(self, fence_token):
+        if fence_token is not None:
+            if fence_token < self._fence:
+                raise StaleFenceError(f"fencing token {fence_token} is older than {self._fence}")
+            self._fence = fence_token
+    
+    def remove_track(self, track_uri, fence_token=None):
+        with self._lock:
+            self._advance_fence(fence_token)
+            self._counts.pop(track_uri, None)
+            self._user_votes.pop(track_uri, None)
+            return self._items.pop(track_uri, None) is not None
+    
+    def clear(self, fence_token=None):
+        with self._lock:
+            self._advance_fence(fence_token)
+            removed = len(self._items)
+            self._items.clear()
+            self._counts.clear()
+            self._user_votes.clear()
+        return removed
+    
+    def _adjust(self, track_uri, vote_type, delta):
+        counts = self._counts.setdefault(track_uri, [0, 0])
+        counts[0 if vote_type == "up" else 1] += delta
+    
+    def cast_vote(self, track_uri, user_id, vote_type):
+        with self._lock:
+            if track_uri not in self._items:
+                # Removed (or never queued): don't leave counts for a later re-add
+                return None
+            history = self._user_votes.setdefault(track_uri, {}).setdefault(user_id, [])
+            if VOTE_MODE == "ledger":
+                # One current vote per user: changing it moves the count, repeating it is a no-op
+                if history and history[-1] != vote_type:
+                    self._adjust(track_uri, history[-1], -1)
+                    history.clear()
+                if not history:
+                    history.append(vote_type)
+                    self._adjust(track_uri, vote_type, 1)
+            else:
+                history.append(vote_type)
+                self._adjust(track_uri, vote_type, 1)
+            return tuple(self._counts.get(track_uri, (0, 0)))
+    
+    def retract_vote(self, track_uri, user_id):
+        with self._lock:
+            if track_uri not in self._items:
+                return None
+            history = self._user_votes.get(track_uri, {}).get(user_id)
+            if history:
+                # Ledger mode holds at most one vote; unlimited mode retracts the latest click
+                self._adjust(track_uri, history.pop(), -1)
+            return tuple(self._counts.get(track_uri, (0, 0)))
+    
+    def get_items(self):
+        with self._lock:
+            return [
+                {
+                    **item,
+                    "up_votes": self._counts.get(track_uri, (0, 0))[0],
+                    "down_votes": self._counts.get(track_uri, (0, 0))[1]
+                }
+                for track_uri, item in self._items.items()
+            ]
+    
+    def get_track(self, track_uri):
+        with self._lock:
+            item = self._items.get(track_uri)
+            if not item:
+                return None
+            up_votes, down_votes = self._counts.get(track_uri, (0, 0))
+            return {**item, "up_votes": up_votes, "down_votes": down_votes}
+    
+    def count(self):
+        return len(self._items)
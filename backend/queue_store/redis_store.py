@@ -0,0 +1,242 @@
+"""
+Redis queue store for BeatSync Mixer.
+Tracks live in a hash, queue order in a sorted set scored by insertion
+sequence, vote counts in `up`/`down` hashes, and the next-track ranking in a
+sorted set scored by net votes (older tracks win ties). Adds, votes,
+removals and clears are Lua scripts so every worker sees atomic updates.
+"""
+
+import json
+from backend.utils.votes import VOTE_MODE
+from .base_store import QueueStore, StaleFenceError, utc_now
+
+
+# rank score = net_score * RANK_SCALE - sequence, so ties go to the oldest track
+RANK_SCALE = 10 ** 9
+
+ADD_TRACK_SCRIPT = """
+-- KEYS: items, order, rank, seq, up, down  ARGV: track_uri, item_json_prefix, scale
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 1 then
+  return 0
+end
+local seq = redis.call('INCR', KEYS[4])
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2] .. ',"id":' .. seq .. '}')
+redis.call('ZADD', KEYS[2], seq, ARGV[1])
+local up = tonumber(redis.call('HGET', KEYS[5], ARGV[1]) or '0')
+local down = tonumber(redis.call('HGET', KEYS[6], ARGV[1]) or '0')
+redis.call('ZADD', KEYS[3], (up - down) * tonumber(ARGV[3]) - seq, ARGV[1])
+return seq
+"""
+
+VOTE_SCRIPT = """
+-- KEYS: up, down, rank, order, track_votes  ARGV: track_uri, vote ('up'|'down'|'retract'), user_id, mode, scale
+local uri, vote, user, mode = ARGV[1], ARGV[2], ARGV[3], ARGV[4]
+-- A vote racing the track's removal must not recreate its counts, or a later
+-- re-add would inherit them
+local seq = redis.call('ZSCORE', KEYS[4], uri)
+if not seq then
+  return false
+end
+local function bump(kind, delta)
+  redis.call('HINCRBY', kind == 'up' and KEYS[1] or KEYS[2], uri, delta)
+end
+if mode == 'ledger' then
+  local previous = redis.call('HGET', KEYS[5], user)
+  if vote == 'retract' then
+    if previous then
+      bump(previous, -1)
+      redis.call('HDEL', KEYS[5], user)
+    end
+  elseif previous ~= vote then
+    if previous then bump(previous, -1) end
+    bump(vote, 1)
+    redis.call('HSET', KEYS[5], user, vote)
+  end
+else
+  if vote == 'retract' then
+    local last = redis.call('HGET', KEYS[5], user .. '|last')
+    if last and tonumber(redis.call('HGET', KEYS[5], user .. '|' .. last) or '0') > 0 then
+      bump(last, -1)
+      if redis.call('HINCRBY', KEYS[5], user .. '|' .. last, -1) <= 0 then
+        local other = last == 'up' and 'down' or 'up'
+        if tonumber(redis.call('HGET', KEYS[5], user .. '|' .. other) or '0') > 0 then
+          redis.call('HSET', KEYS[5], user .. '|last', other)
+        else
+          redis.call('HDEL', KEYS[5], user .. '|last')
+        end
+      end
+    end
+  else
+    bump(vote, 1)
+    redis.call('HINCRBY', KEYS[5], user .. '|' .. vote, 1)
+    redis.call('HSET', KEYS[5], user .. '|last', vote)
+  end
+end
+local up = tonumber(redis.call('HGET', KEYS[1], uri) or '0')
+local down = tonumber(redis.call('HGET', KEYS[2], uri) or '0')
+redis.call('ZADD', KEYS[3], (up - down) * tonumber(ARGV[5]) - tonumber(seq), uri)
+return {up, down}
+"""
+
+
+REMOVE_TRACK_SCRIPT = """
+-- KEYS: items, order, rank, up, down, track_votes, fence  ARGV: track_uri, fencing token ('' for none)
+if ARGV[2] ~= '' then
+  local token = tonumber(ARGV[2])
+  if token < tonumber(redis.call('GET', KEYS[7]) or '0') then
+    return -1
+  end
+  redis.call('SET', KEYS[7], ARGV[2])
+end
+local removed = redis.call('HDEL', KEYS[1], ARGV[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('ZREM', KEYS[3], ARGV[1])
+redis.call('HDEL', KEYS[4], ARGV[1])
+redis.call('HDEL', KEYS[5], ARGV[1])
+redis.call('DEL', KEYS[6])
+return removed
+"""
+
+CLEAR_SCRIPT = """
+-- KEYS: items, order, rank, up, down, fence  ARGV: fencing token ('' for none), track votes key prefix
+if ARGV[1] ~= '' then
+  local token = tonumber(ARGV[1])
+  if token < tonumber(redis.call('GET', KEYS[6]) or '0') then
+    return -1
+  end
+  redis.call('SET', KEYS[6], ARGV[1])
+end
+local track_uris = redis.call('ZRANGE', KEYS[2], 0, -1)
+for _, track_uri in ipairs(track_uris) do
+  redis.call('DEL', ARGV[2] .. track_uri)
+end
+redis.call('DEL', KEYS[1], KEYS[2], KEYS[3], KEYS[4], KEYS[5])
+return #track_uris
+"""
+
+
+class RedisQueueStore(QueueStore):
+    """Queue held in Redis (shared by every worker and node)"""
+    
+    name = "redis"
+    
+    def __init__(self, client, prefix="beatsync:queue:"):
+        self.client = client
+        self.prefix = prefix
+        self.items_key = prefix + "items"
+        self.order_key = prefix + "order"
+        self.rank_key = prefix + "rank"
+        self.seq_key = prefix + "seq"
+        self.up_key = prefix + "up"
+        self.down_key = prefix + "down"
+        self.fence_key = prefix + "fence"
+        self.track_votes_prefix = prefix + "votes:"
+        self._add_script = client.register_script(ADD_TRACK_SCRIPT)
+        self._vote_script = client.register_script(VOTE_SCRIPT)
+        self._remove_script = client.register_script(REMOVE_TRACK_SCRIPT)
+        self._clear_script = client.register_script(CLEAR_SCRIPT)
+    
+    def _track_votes_key(self, track_uri):
+        return self.track_votes_prefix + track_uri
+    
+    def add_tracks(self, tracks):
+        added = []
+        for track in tracks:
+            timestamp = utc_now().isoformat()
+            # The script appends the sequence-based id to this JSON object prefix
+            item_prefix = json.dumps({"track_name": track["track_name"], "timestamp": timestamp})[:-1]
+            seq = self._add_script(
+                keys=[self.items_key, self.order_key, self.rank_key, self.seq_key, self.up_key, self.down_key],
+                args=[track["track_uri"], item_prefix, RANK_SCALE]
+            )
+            if seq:
+                added.append({
+                    "track_uri": track["track_uri"],
+                    "track_name": track["track_name"],
+                    "timestamp": timestamp
+                })
+        return added
+    
+    def remove_track(self, track_uri, fence_token=None):
+        removed = self._remove_script(
+            keys=[self.items_key, self.order_key, self.rank_key, self.up_key, self.down_key,
+                  self._track_votes_key(track_uri), self.fence_key],
+            args=[track_uri, "" if fence_token is None else int(fence_token)]
+        )
+        if removed < 0:
+            raise StaleFenceError(f"fencing token {fence_token} is older than the last one used")
+        return removed > 0
+    
+    def clear(self, fence_token=None):
+        # Listing the tracks, the fence check and the deletes are one atomic step
+        removed = self._clear_script(
+            keys=[self.items_key, self.order_key, self.rank_key, self.up_key, self.down_key, self.fence_key],
+            args=["" if fence_token is None else int(fence_token), self.track_votes_prefix]
+        )
+        if removed < 0:
+            raise StaleFenceError(f"fencing token {fence_token} is older than the last one used")
+        return removed
+    
+    def _vote(self, track_uri, user_id, vote):
+        counts = self._vote_script(
+            keys=[self.up_key, self.down_key, self.rank_key, self.order_key, self._track_votes_key(track_uri)],
+            args=[track_uri, vote, user_id, VOTE_MODE, RANK_SCALE]
+        )
+        if counts is None:
+            return None
+        up_votes, down_votes = counts
+        return int(up_votes), int(down_votes)
+    
+    def cast_vote(self, track_uri, user_id, vote_type):
+        return self._vote(track_uri, user_id, vote_type)
+    
+    def retract_vote(self, track_uri, user_id):
+        return self._vote(track_uri, user_id, "retract")
+    
+    def _load_items(self, track_uris):
+        if not track_uris:
+            return []
+        pipe = self.client.pipeline()
+        pipe.hmget(self.items_key, track_uris)
+        pipe.hmget(self.up_key, track_uris)
+        pipe.hmget(self.down_key, track_uris)
+        raw_items, up_counts, down_counts = pipe.execute()
+        
+        items = []
+        for track_uri, raw_item, up_votes, down_votes in zip(track_uris, raw_items, up_counts, down_counts):
+            if not raw_item:
+                continue
+            item = json.loads(raw_item)
+            items.append({
+                "id": item["id"],
+                "track_uri": track_uri,
+                "track_name": item["track_name"],
+                "timestamp": item["timestamp"],
+                "up_votes": int(up_votes or 0),
+                "down_votes": int(down_votes or 0)
+            })
+        return items
+    
+    def get_items(self):
+        return self._load_items(self.client.zrange(self.order_key, 0, -1))
+    
+    def get_track(self, track_uri):
+        items = self._load_items([track_uri])
+        return items[0] if items else None
+    
+    def count(self):
+        return self.client.zcard(self.order_key)
+    
+    def get_next_track(self):
+        # The rank sorted set already orders by net score with oldest-first ties
+        items = self._load_items(self.client.zrevrange(self.rank_key, 0, 0))
+        if not items:
+            return None
+        item = items[0]
+        return {
+            "track_uri": item["track_uri"],
+            "track_name": item["track_name"],
+            "up_votes": item["up_votes"],
+            "down_votes": item["down_votes"],
+            "net_score": item["up_votes"] - item["down_votes"]
+        }
@@ -0,0 +1,148 @@
+"""
+SQL queue store for BeatSync Mixer.
+Keeps the queue in the `queue_items` table and votes in `votes`/`vote_ledger`.
+"""
+
+from datetime import timedelta
+from sqlalchemy.exc import IntegrityError
+from backend.models.models import get_db, QueueItem, QueueFence, dialect_insert
+from backend.utils.votes import count_votes, cast_vote, retract_vote, delete_votes
+from .base_store import QueueStore, StaleFenceError, utc_now
+
+
+class SQLQueueStore(QueueStore):
+    """Queue backed by the SQLAlchemy models (persistent, shared by every worker)"""
+    
+    name = "sql"
+    
+    def add_tracks(self, tracks):
+        if not tracks:
+            return []
+        
+        now = utc_now()
+        rows = []
+        for track in tracks:
+            rows.append({
+                "track_uri": track["track_uri"],
+                "track_name": track["track_name"],
+                # Spread timestamps by a microsecond so FIFO tie-breaks keep the given order
+                "timestamp": now + timedelta(microseconds=len(rows))
+            })
+        
+        with get_db() as db:
+            inserted_rows = self._insert_rows(db, rows)
+        
+        return [{**row, "timestamp": row["timestamp"].isoformat()} for row in inserted_rows]
+    
+    def _insert_rows(self, db, rows):
+        """Insert rows, skipping tracks already queued.
+        
+        Duplicate detection is a single INSERT ... ON CONFLICT (track_uri) DO NOTHING
+        RETURNING statement on SQLite and PostgreSQL, so concurrent adds of the same
+        track never race and never need a prior read.
+        """
+        stmt = dialect_insert(QueueItem)
+        if stmt is not None:
+            stmt = stmt.values(rows).on_conflict_do_nothing(index_elements=["track_uri"])
+            inserted = {uri for (uri,) in db.execute(stmt.returning(QueueItem.track_uri))}
+            return [row for row in rows if row["track_uri"] in inserted]
+        
+        # Other dialects: let the unique index reject duplicates one savepoint at a time
+        inserted_rows = []
+        for row in rows:
+            try:
+                with db.begin_nested():
+                    db.add(QueueItem(**row))
+                inserted_rows.append(row)
+            except IntegrityError:
+                continue
+        return inserted_rows
+    
+    def _advance_fence(self, db, fence_token):
+        """Record fence_token in this transaction, or raise if a newer one was used.
+        
+        The conditional UPDATE locks the fence row until commit, so concurrent
+        fenced removals and clears are serialized.
+        """
+        stmt = dialect_insert(QueueFence)
+        if stmt is not None:
+            db.execute(stmt.values(name=QueueFence.QUEUE, token=0).on_conflict_do_nothing(index_elements=["name"]))
+        elif db.get(QueueFence, QueueFence.QUEUE) is None:
+            db.add(QueueFence(name=QueueFence.QUEUE, token=0))
+            db.flush()
+        
+        advanced = db.query(QueueFence).filter(
+            QueueFence.name == QueueFence.QUEUE,
+            QueueFence.token <= fence_token
+        ).update({QueueFence.token: fence_token}, synchronize_session=False)
+        if not advanced:
+            raise StaleFenceError(f"fencing token {fence_token} is older than the last one used")
+    
+    def remove_track(self, track_uri, fence_token=None):
+        with get_db() as db:
+            if fence_token is not None:
+                self._advance_fence(db, fence_token)
+            deleted = db.query(QueueItem).filter(
+                QueueItem.track_uri == track_uri
+            ).delete(synchronize_session=False)
+            delete_votes(db, track_uri)
+        return deleted > 0
+    
+    def clear(self, fence_token=None):
+        with get_db() as db:
+            if fence_token is not None:
+                self._advance_fence(db, fence_token)
+            removed = db.query(QueueItem).delete()
+            delete_votes(db)
+        return removed
+    
+    def _lock_queued(self, db, track_uri):
+        """Lock the track's queue row for this transaction; False if it isn't queued.
+        
+        On PostgreSQL the row lock orders the vote with a concurrent
+        remove_track: either the vote commits first and the removal deletes
+        it, or the removal commits first and the vote sees no row.
+        """
+        return db.query(QueueItem.id).filter(
+            QueueItem.track_uri == track_uri
+        ).with_for_update().first() is not None
+    
+    def cast_vote(self, track_uri, user_id, vote_type):
+        with get_db() as db:
+            if not self._lock_queued(db, track_uri):
+                return None
+            return cast_vote(db, track_uri, user_id, vote_type)
+    
+    def retract_vote(self, track_uri, user_id):
+        with get_db() as db:
+            if not self._lock_queued(db, track_uri):
+                return None
+            return retract_vote(db, track_uri, user_id)
+    
+    def _to_dict(self, item, vote_counts):
+        up_votes, down_votes = vote_counts.get(item.track_uri, (0, 0))
+        return {
+            "id": item.id,
+            "track_uri": item.track_uri,
+            "track_name": item.track_name,
+            "timestamp": item.timestamp.isoformat() if item.timestamp else None,
+            "up_votes": up_votes,
+            "down_votes": down_votes
+        }
+    
+    def get_items(self):
+        with get_db() as db:
+            items = db.query(QueueItem).order_by(QueueItem.timestamp).all()
+            vote_counts = count_votes(db)
+            return [self._to_dict(item, vote_counts) for item in items]
+    
+    def get_track(self, track_uri):
+        with get_db() as db:
+            item = db.query(QueueItem).filter(QueueItem.track_uri == track_uri).first()
+            if not item:
+                return None
+            return self._to_dict(item, count_votes(db, [track_uri]))
+    
+    def count(self):
+        with get_db() as db:
+            return db.query(QueueItem).count()
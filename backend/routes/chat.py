@@ -0,0 +1,31 @@
+"""
+Chat history routes for BeatSync Mixer.
+Pages through older chat messages with a cursor (see load_history_page).
+"""
+
+from flask import Blueprint, request, jsonify, session
+from backend.utils.chat_history import load_history_page, CHAT_HISTORY_LIMIT
+
+
+chat_bp = Blueprint('chat', __name__)
+
+
+@chat_bp.route("/history")
+def chat_history():
+    """Chat messages older than ?before_id= (and its ?before_timestamp=), oldest first"""
+    if not session.get("role"):
+        return jsonify({"error": "You must be logged in to read chat"}), 401
+    
+    try:
+        page = load_history_page(
+            before_id=request.args.get("before_id", type=int),
+            before_timestamp=request.args.get("before_timestamp"),
+            limit=request.args.get("limit", CHAT_HISTORY_LIMIT, type=int)
+        )
+        return jsonify(page)
+        
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Error loading chat history page: {e}")
+        return jsonify({"error": "Failed to load chat history"}), 500
@@ -6,6 +6,8 @@ Handles Spotify playback, device management, and status.
 from flask import Blueprint, session, request, jsonify, abort
 from backend.api.spotify import start_playback, pause_playback, get_devices, get_playback_state
 from backend.utils.cache import set_currently_playing, clear_currently_playing
+from backend.websockets.broadcast import broadcast
+from backend.utils.host import is_current_host
 
 
 playback_bp = Blueprint('playback', __name__)
@@ -38,7 +40,7 @@ def get_spotify_token():
 @playback_bp.route("/play", methods=["POST"])
 def play_track():
     """Start playback of a specific track - Host only"""
-    if session.get("role") != "host":
+    if session.get("role") != "host" or not is_current_host(session.get("user_id")):
         return abort(403)
     
     token_info = session.get("spotify_token")
@@ -66,7 +68,7 @@ def play_track():
             # Broadcast playback state to all connected clients
             from flask import current_app
             if hasattr(current_app, 'socketio'):
-                current_app.socketio.emit('playback_started', {
+                broadcast('playback_started', {
                     'track_uri': track_uri,
                     'track_name': track_name,
                     'device_id': device_id,
@@ -85,7 +87,7 @@ def play_track():
 @playback_bp.route("/pause", methods=["POST"])
 def pause_track():
     """Pause current playback - Host only"""
-    if session.get("role") != "host":
+    if session.get("role") != "host" or not is_current_host(session.get("user_id")):
         return abort(403)
     
     token_info = session.get("spotify_token")
@@ -121,7 +123,7 @@ def pause_track():
             # Broadcast pause state to all connected clients
             from flask import current_app
             if hasattr(current_app, 'socketio'):
-                current_app.socketio.emit('playback_paused', {
+                broadcast('playback_paused', {
                     'device_id': device_id,
                     'is_playing': False
                 })
@@ -138,7 +140,7 @@ def pause_track():
 @playback_bp.route("/next", methods=["POST"])
 def next_track():
     """Skip to next track - Host only"""
-    if session.get("role") != "host":
+    if session.get("role") != "host" or not is_current_host(session.get("user_id")):
         return abort(403)
     
     token_info = session.get("spotify_token")
@@ -211,7 +213,7 @@ def get_devices_route():
 @playback_bp.route("/transfer", methods=["POST"])
 def transfer_playback():
     """Transfer playback to a specific device - Host only"""
-    if session.get("role") != "host":
+    if session.get("role") != "host" or not is_current_host(session.get("user_id")):
         return abort(403)
     
     token_info = session.get("spotify_token")
@@ -4,10 +4,11 @@ Handles playlist and track fetching with optimized caching.
 """
 
 import time
-import threading
 from flask import Blueprint, session, jsonify, request
 from backend.api.spotify import fetch_playlists, fetch_playlist_tracks
+from backend.utils.compression import versioned_json_response
 from backend.utils.cache import get_cached_playlists, cache_playlists_async, simplify_playlists_data, get_cached_tracks, set_cached_tracks
+from backend.utils.executor import submit_task
 
 
 playlists_bp = Blueprint('playlists', __name__)
@@ -86,11 +87,13 @@ def playlists():
             }
             
             # Cache asynchronously - don't block the response
+            host_name = session.get("display_name", "Host")
+            
             def cache_playlists_background():
                 try:
                     # Add metadata for listeners
                     cached_playlists = simplified_playlists.copy()
-                    cached_playlists["host_name"] = session.get("display_name", "Host")
+                    cached_playlists["host_name"] = host_name
                     cached_playlists["cached_at"] = time.time()
                     
                     # Use our optimized caching function
@@ -101,7 +104,8 @@ def playlists():
                     print(f"Background: Cache update failed: {e}")
             
             # Start background caching
-            threading.Thread(target=cache_playlists_background, daemon=True).start()
+            from flask import current_app
+            submit_task("cache_write", cache_playlists_background, app=current_app._get_current_object())
             
             # Return immediately to host
             return jsonify(simplified_playlists)
@@ -165,7 +169,7 @@ def playlist_tracks(playlist_id):
     cached_tracks = get_cached_tracks(playlist_id, limit, offset)
     if cached_tracks:
         print(f"Serving tracks from cache for {playlist_id}")
-        return jsonify(cached_tracks)
+        return tracks_response(playlist_id, limit, offset, cached_tracks)
     
     # Determine access token based on role
     access_token = None
@@ -216,14 +220,24 @@ def playlist_tracks(playlist_id):
             "total": data.get("total", 0),
             "offset": data.get("offset", offset),
             "limit": data.get("limit", limit),
-            "is_listener": user_role == "listener"
+            "is_listener": user_role == "listener",
+            "cached_at": time.time()
         }
         
         # Cache the result for future requests
         set_cached_tracks(playlist_id, simplified_tracks, limit, offset)
         
-        return jsonify(simplified_tracks)
+        return tracks_response(playlist_id, limit, offset, simplified_tracks)
         
     except Exception as e:
         print(f"Error fetching playlist tracks: {e}")
         return jsonify({"error": "Failed to fetch playlist tracks"}), 500
+
+
+def tracks_response(playlist_id, limit, offset, tracks):
+    """A page of playlist tracks, serialized (and compressed) once per cached copy"""
+    key = ("playlist_tracks", playlist_id, limit, offset, tracks.get("cached_at"))
+    if key[-1] is None:
+        # Cached before pages carried cached_at
+        return jsonify(tracks)
+    return versioned_json_response(key, lambda: tracks)
@@ -4,82 +4,282 @@ Handles queue operations, voting, and auto-play functionality.
 """
 
 import time
-import threading
-from flask import Blueprint, session, request, jsonify
-from backend.models.models import get_db, QueueItem, Vote
-from backend.api.spotify import start_playback
-from backend.utils.cache import clear_queue_snapshot
+from flask import Blueprint, session, request, jsonify, Response
+from backend.models.models import get_db
+from backend.models.playlist_models import CustomPlaylist, PlaylistTrack
+from backend.api.spotify import start_playback, fetch_playlist_tracks
+from backend.queue_store import get_queue_store, StaleFenceError
+from backend.utils.locks import acquire_lease, lease_is_current, release_lease
+from backend.utils.host import is_current_host
+from backend.utils.compression import versioned_json_response
+from backend.utils.cache import (
+    get_queue_version, get_queue_ops_since, get_versioned_queue_snapshot,
+    format_queue_items, record_queue_change
+)
+from backend.websockets.broadcast import broadcast
 
 
 queue_bp = Blueprint('queue', __name__)
 
-# Auto-play locking to prevent concurrent requests
-auto_play_lock = threading.Lock()
-last_auto_play_time = 0
+# Auto-play runs under a lease shared by every worker: selecting, playing and
+# removing the next track is one critical section, and the lease is kept for the
+# rest of the debounce window after it finishes
+AUTO_PLAY_LEASE = "auto_play"
+AUTO_PLAY_LEASE_MS = 30000  # Upper bound on one select/play/remove cycle
+AUTO_PLAY_DEBOUNCE_MS = 2000
 
+# Upper bound on tracks accepted by a single bulk enqueue
+MAX_BULK_TRACKS = 500
+SPOTIFY_PAGE_SIZE = 100
 
-@queue_bp.route("/")
-def get_queue():
-    """Get current queue items ordered by vote score (highest first)"""
-    with get_db() as db:
-        items = db.query(QueueItem).order_by(QueueItem.timestamp).all()
-        
-        # Calculate vote scores for each item
-        queue_data = []
-        for item in items:
-            # Get vote counts for this track
-            votes = db.query(Vote).filter_by(track_uri=item.track_uri).all()
-            up_votes = len([v for v in votes if v.vote_type == 'up'])
-            down_votes = len([v for v in votes if v.vote_type == 'down'])
-            net_score = up_votes - down_votes
+
+def resolve_playlist_tracks(playlist_id, source="spotify", access_token=None, user_id=None):
+    """Load the tracks of a Spotify or custom playlist as [{track_uri, track_name}]"""
+    tracks = []
+    
+    if source == "custom":
+        with get_db() as db:
+            playlist = db.query(CustomPlaylist).filter(
+                CustomPlaylist.id == playlist_id,
+                CustomPlaylist.user_id == user_id
+            ).first()
+            if not playlist:
+                return None
             
-            queue_data.append({
-                "id": item.id,
-                "track_uri": item.track_uri,
-                "track_name": item.track_name,
-                "timestamp": item.timestamp.isoformat() if item.timestamp else None,
-                "upvotes": up_votes,
-                "downvotes": down_votes,
-                "vote_score": net_score
+            rows = db.query(PlaylistTrack).filter(
+                PlaylistTrack.playlist_id == playlist.id
+            ).order_by(PlaylistTrack.position).limit(MAX_BULK_TRACKS).all()
+            for row in rows:
+                tracks.append({
+                    "track_uri": row.track_uri,
+                    "track_name": f"{row.track_name} - {row.track_artist}"
+                })
+        return tracks
+    
+    if not access_token:
+        return None
+    
+    # Page through the Spotify playlist until we have everything (or hit the cap)
+    offset = 0
+    while len(tracks) < MAX_BULK_TRACKS:
+        data = fetch_playlist_tracks(access_token, playlist_id, SPOTIFY_PAGE_SIZE, offset)
+        if not data:
+            return tracks or None
+        
+        for item in data.get("items", []):
+            track = item.get("track")
+            if not track or not track.get("uri"):
+                continue
+            artist_names = ", ".join(artist["name"] for artist in track.get("artists", []))
+            tracks.append({
+                "track_uri": track["uri"],
+                "track_name": f"{track['name']} - {artist_names}" if artist_names else track["name"]
             })
         
-        # Sort by vote score (highest first), then by timestamp (oldest first) as tiebreaker
-        queue_data.sort(key=lambda x: (-x["vote_score"], x["timestamp"] or ""))
+        offset += SPOTIFY_PAGE_SIZE
+        if offset >= data.get("total", 0):
+            break
+    
+    return tracks[:MAX_BULK_TRACKS]
+
+
+def enqueue_tracks(tracks, added_by="Anonymous"):
+    """Add many tracks to the queue in a single transaction.
+    
+    Duplicates within the request are dropped up front and duplicates against
+    the queue are skipped by the store in one bulk write (a single
+    INSERT ... ON CONFLICT for SQL); the snapshot/version and broadcast happen
+    once for the whole batch. Items past MAX_BULK_TRACKS aren't looked at.
+    Returns (added_tracks, skipped_count, truncated_count).
+    """
+    # Normalize and dedupe the request itself, keeping the caller's order
+    candidates = []
+    seen = set()
+    for track in tracks[:MAX_BULK_TRACKS]:
+        # Malformed items (not an object, or non-string fields) count as skipped
+        if not isinstance(track, dict):
+            continue
+        track_uri = track.get("track_uri")
+        track_name = track.get("track_name")
+        if not isinstance(track_uri, str) or not isinstance(track_name, str):
+            continue
+        track_name = track_name.strip()
+        if not track_name or not track_uri.startswith("spotify:") or track_uri in seen:
+            continue
+        seen.add(track_uri)
+        candidates.append({"track_uri": track_uri, "track_name": track_name})
+    
+    added = get_queue_store().add_tracks(candidates)
+    
+    truncated = max(0, len(tracks) - MAX_BULK_TRACKS)
+    skipped = len(tracks) - truncated - len(added)
+    if not added:
+        return [], skipped, truncated
+    
+    # One version bump / snapshot rebuild for the whole batch
+    record_queue_change("add_bulk", {"tracks": added})
+    
+    from flask import current_app
+    if hasattr(current_app, 'socketio'):
+        broadcast("tracks_added", {
+            "tracks": added,
+            "count": len(added),
+            "added_by": added_by
+        })
+    
+    print(f"Bulk enqueue added {len(added)} tracks ({skipped} skipped, {truncated} over the limit)")
+    return added, skipped, truncated
+
+
+def get_playlist_access_token(use_session=True):
+    """Host's Spotify token for the current session, or the cached host token.
+    
+    Socket events pass use_session=False: they always use the cached host
+    token, so the event doesn't load the Flask session.
+    """
+    if use_session and session.get("role") == "host":
+        token_info = session.get("spotify_token") or {}
+        return token_info.get("access_token")
+    
+    try:
+        from flask import current_app
+        cache = getattr(current_app, 'cache', None)
+        return cache.get("host_access_token") if cache else None
+    except Exception as e:
+        print(f"Failed to get cached host token: {e}")
+        return None
+
+
+def bulk_enqueue_request(data, identity=None):
+    """Shared REST/socket entry point: enqueue a track list or a whole playlist.
+    
+    identity is the socket's cached {"role", "user_id", "display_name"}; REST
+    callers leave it out and the session is used. Socket callers never touch
+    the session. Returns (response_dict, status_code).
+    """
+    data = data or {}
+    if not isinstance(data, dict):
+        return {"error": "Request body must be a JSON object"}, 400
+    from_session = identity is None
+    if from_session:
+        identity = {"role": session.get("role"), "user_id": session.get("user_id"), "display_name": session.get("display_name")}
+    tracks = data.get("tracks")
+    playlist_id = data.get("playlist_id")
+    
+    if not tracks and not playlist_id:
+        return {"error": "Provide either 'tracks' or 'playlist_id'"}, 400
+    
+    # A missing or empty track list means "load the playlist"
+    if not tracks:
+        source = data.get("source", "spotify")
+        if source not in ("spotify", "custom"):
+            return {"error": "Invalid playlist source"}, 400
         
-        return jsonify({"queue": queue_data, "count": len(queue_data)})
+        tracks = resolve_playlist_tracks(
+            playlist_id,
+            source=source,
+            access_token=get_playlist_access_token(use_session=from_session) if source == "spotify" else None,
+            user_id=identity.get("user_id")
+        )
+        if tracks is None:
+            return {"error": "Playlist not found or host must be online to load it"}, 404
+    
+    if not isinstance(tracks, list):
+        return {"error": "'tracks' must be a list"}, 400
+    
+    added, skipped, truncated = enqueue_tracks(tracks, added_by=identity.get("display_name") or "Anonymous")
+    message = f"Added {len(added)} tracks to queue"
+    if truncated:
+        message += f" (only the first {MAX_BULK_TRACKS} were considered)"
+    return {
+        "status": "success",
+        "message": message,
+        "added": len(added),
+        "skipped": skipped,
+        "truncated": truncated,
+        "tracks": added
+    }, 200
+
+
+@queue_bp.route("/")
+def get_queue():
+    """Get current queue items ordered by vote score (highest first).
+    
+    Served from the versioned queue snapshot. Clients can revalidate with
+    If-None-Match (304 when unchanged) or pass ?since=<version> to receive
+    only the operations applied after that version.
+    """
+    version = get_queue_version()
+    etag = f"queue-v{version}"
+    
+    since = request.args.get("since", type=int)
+    if since is not None:
+        ops = get_queue_ops_since(since, version) if since <= version else None
+        if ops is not None:
+            return jsonify({"version": version, "since": since, "ops": ops})
+        # Gap is no longer covered by the ops log - fall through to a full snapshot
+    
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+    
+    version, items = get_versioned_queue_snapshot()
+    full = since is not None
+    
+    def build_payload():
+        queue_data = format_queue_items(items)
+        payload = {"queue": queue_data, "count": len(queue_data), "version": version}
+        if full:
+            payload["full"] = True
+        return payload
+    
+    # Serialized (and compressed) once per snapshot version
+    response = versioned_json_response(("queue", version, full), build_payload)
+    response.set_etag(f"queue-v{version}")
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@queue_bp.route("/bulk-add", methods=["POST"])
+def bulk_add_to_queue():
+    """Add a list of tracks, or every track of a Spotify/custom playlist, in one request"""
+    if not session.get("role"):
+        return jsonify({"error": "You must be logged in to add tracks"}), 401
+    
+    try:
+        result, status = bulk_enqueue_request(request.get_json(silent=True))
+        return jsonify(result), status
+    except Exception as e:
+        print(f"Error in bulk_add_to_queue: {e}")
+        return jsonify({"error": "Failed to add tracks to queue"}), 500
 
 
 @queue_bp.route("/clear", methods=["POST"])
 def clear_queue():
     """Clear all items from the queue - Host only"""
-    if session.get("role") != "host":
+    if session.get("role") != "host" or not is_current_host(session.get("user_id")):
         return jsonify({"error": "Only hosts can clear the queue", "required_role": "host", "current_role": session.get("role")}), 403
     
     try:
-        with get_db() as db:
-            # Count items before deletion for feedback
-            item_count = db.query(QueueItem).count()
-            
-            # Clear queue items
-            db.query(QueueItem).delete()
-            
-            # Also clear votes for queue items
-            db.query(Vote).delete()
-            
-            # Clear queue snapshot cache
-            clear_queue_snapshot()
-            
-            # Broadcast queue clear to all clients
-            from flask import current_app
-            if hasattr(current_app, 'socketio'):
-                current_app.socketio.emit("queue_cleared")
-                current_app.socketio.emit("votes_cleared")
-            
-            return jsonify({
-                "status": "success", 
-                "message": f"Queue cleared successfully. Removed {item_count} items.",
-                "items_removed": item_count
-            })
+        # Clear queue items and their votes, counting them for feedback
+        item_count = get_queue_store().clear()
+        
+        # Bump the queue version and rebuild the snapshot now that the clear is committed
+        record_queue_change("clear")
+        
+        # Broadcast queue clear to all clients
+        from flask import current_app
+        if hasattr(current_app, 'socketio'):
+            broadcast("queue_cleared")
+            broadcast("votes_cleared")
+        
+        return jsonify({
+            "status": "success", 
+            "message": f"Queue cleared successfully. Removed {item_count} items.",
+            "items_removed": item_count
+        })
     except Exception as e:
         print(f"Error clearing queue: {e}")
         return jsonify({"error": "Database error while clearing queue"}), 500
@@ -89,55 +289,15 @@ def clear_queue():
 def get_next_track():
     """Get the next track to play - ALL tracks in queue are eligible regardless of votes"""
     try:
-        with get_db() as db:
-            # Get all queue items ordered by timestamp (FIFO - first in, first out)
-            # But we'll still consider votes for ordering among tracks added around the same time
-            queue_items = db.query(QueueItem).order_by(QueueItem.timestamp).all()
-            
-            if not queue_items:
-                return jsonify({"error": "Queue is empty"}), 404
-            
-            # NEW LOGIC: All tracks are eligible, but votes affect order preference
-            # We'll still prioritize higher voted tracks, but never skip any track
-            
-            best_track = None
-            best_score = -999  # Start with very low score
-            fallback_track = None  # Always have a fallback (oldest track)
-            
-            for item in queue_items:
-                # Get vote counts for this track
-                votes = db.query(Vote).filter_by(track_uri=item.track_uri).all()
-                up_votes = len([v for v in votes if v.vote_type == 'up'])
-                down_votes = len([v for v in votes if v.vote_type == 'down'])
-                
-                # Calculate net score (likes - dislikes)
-                net_score = up_votes - down_votes
-                
-                track_data = {
-                    "track_uri": item.track_uri,
-                    "track_name": item.track_name,
-                    "up_votes": up_votes,
-                    "down_votes": down_votes,
-                    "net_score": net_score
-                }
-                
-                # Set fallback to the first (oldest) track if not set
-                if fallback_track is None:
-                    fallback_track = track_data
-                
-                # Find the track with the highest net score, but don't exclude any
-                if net_score > best_score:
-                    best_score = net_score
-                    best_track = track_data
-            
-            # Return the best voted track, or fallback to oldest if all have same/negative scores
-            result_track = best_track if best_track else fallback_track
-            
-            if result_track:
-                print(f"Next track selected: {result_track['track_name']} (Score: {result_track['net_score']}, Up: {result_track['up_votes']}, Down: {result_track['down_votes']})")
-                return jsonify(result_track)
-            else:
-                return jsonify({"error": "No tracks in queue"}), 404
+        # All tracks are eligible, but votes affect order preference: the highest
+        # net score wins and the oldest track wins ties (never skip any track)
+        result_track = get_queue_store().get_next_track()
+        
+        if result_track:
+            print(f"Next track selected: {result_track['track_name']} (Score: {result_track['net_score']}, Up: {result_track['up_votes']}, Down: {result_track['down_votes']})")
+            return jsonify(result_track)
+        else:
+            return jsonify({"error": "Queue is empty"}), 404
                 
     except Exception as e:
         print(f"Error in get_next_track: {e}")
@@ -147,21 +307,28 @@ def get_next_track():
 @queue_bp.route("/auto-play", methods=["POST"])
 def auto_play_next():
     """Automatically play the next track based on voting - Host only"""
-    global last_auto_play_time
-    
-    if session.get("role") != "host":
+    if session.get("role") != "host" or not is_current_host(session.get("user_id")):
         print("Auto-play denied: User is not host")
         return jsonify({"error": "Host only"}), 403
     
-    # Server-side debounce: prevent multiple auto-play requests within 2 seconds
-    current_time = time.time()
-    with auto_play_lock:
-        if current_time - last_auto_play_time < 2:
-            print(f"Auto-play request blocked by server debounce (last call: {current_time - last_auto_play_time:.2f}s ago)")
-            return jsonify({"error": "Auto-play request too soon"}), 429
-        last_auto_play_time = current_time
+    # Server-side debounce and single leader: one auto-play at a time across all
+    # workers, and none within 2 seconds of the previous one starting
+    started_at = time.time()
+    lease_token = acquire_lease(AUTO_PLAY_LEASE, AUTO_PLAY_LEASE_MS)
+    if lease_token is None:
+        print("Auto-play request blocked: another auto-play is running or finished too recently")
+        return jsonify({"error": "Auto-play request too soon"}), 429
+    
+    try:
+        return play_next_track(lease_token)
+    finally:
+        elapsed_ms = (time.time() - started_at) * 1000
+        release_lease(AUTO_PLAY_LEASE, lease_token, hold_ms=AUTO_PLAY_DEBOUNCE_MS - elapsed_ms)
+
 
-    print("Auto-play request received from host")
+def play_next_track(lease_token):
+    """Pick, play and remove the next track while holding the auto-play lease"""
+    print(f"Auto-play request received from host (lease {lease_token})")
     
     try:
         # Get the next track based on voting
@@ -190,6 +357,13 @@ def auto_play_next():
         device_id = data.get("device_id")
         print(f"Playing on device: {device_id}")
         
+        # Don't start playback if our lease ran out and another worker took over.
+        # Spotify can't check a fencing token, so this is a best-effort check just
+        # before the call; the queue removal below is fenced by the store itself.
+        if not lease_is_current(AUTO_PLAY_LEASE, lease_token):
+            print(f"Auto-play lease {lease_token} lost before playback, aborting")
+            return jsonify({"error": "Auto-play lease expired"}), 409
+        
         # Play the track using manual IP-based request
         success = start_playback(access_token, device_id, [track_uri])
         if not success:
@@ -204,7 +378,7 @@ def auto_play_next():
         # Broadcast the currently playing track to all clients
         from flask import current_app
         if hasattr(current_app, 'socketio'):
-            current_app.socketio.emit('playback_started', {
+            broadcast('playback_started', {
                 'track_uri': track_uri,
                 'track_name': next_track['track_name'],
                 'device_id': device_id,
@@ -215,61 +389,41 @@ def auto_play_next():
         # Remove ONLY this specific track from the queue
         print(f"Successfully started playback of {next_track['track_name']}, removing from queue...")
         
-        # Remove the track from the queue and its votes with additional safety checks
+        # Cheap early exit if we already know the lease was lost
+        if not lease_is_current(AUTO_PLAY_LEASE, lease_token):
+            print(f"Auto-play lease {lease_token} lost before removal, leaving queue to the new leader")
+            return jsonify({"error": "Auto-play lease expired"}), 409
+        
+        # Remove the track that was just played and its votes. The store checks
+        # the fencing token in the same atomic write, so a superseded worker whose
+        # lease expired after the check above still can't remove anything
         try:
-            with get_db() as db:
-                # Count queue items before removal for debugging
-                total_before = db.query(QueueItem).count()
-                print(f"Queue count before removal: {total_before}")
-                
-                # Find and remove ONLY the specific track that was just played
-                item = db.query(QueueItem).filter(
-                    QueueItem.track_uri == track_uri
-                ).first()
-                
-                if item:
-                    track_name = item.track_name  # Store name before deletion
-                    track_id = item.id  # Store ID for verification
-                    
-                    # Double-check this is the track we expect
-                    if item.track_uri != track_uri:
-                        print(f"ERROR: Track URI mismatch! Expected {track_uri}, got {item.track_uri}")
-                        return jsonify({"error": "Track URI mismatch"}), 500
-                    
-                    # Remove the specific queue item
-                    db.delete(item)
-                    print(f"Marked '{track_name}' (ID: {track_id}) for deletion from queue")
-                    
-                    # Also remove associated votes for this specific track
-                    votes_to_delete = db.query(Vote).filter(Vote.track_uri == track_uri).all()
-                    votes_count = len(votes_to_delete)
-                    for vote in votes_to_delete:
-                        db.delete(vote)
-                    print(f"Marked {votes_count} votes for '{track_name}' for deletion")
-                    
-                    # Count queue items after removal for debugging
-                    total_after = db.query(QueueItem).count()
-                    items_removed = total_before - total_after
-                    print(f"Queue count after removal: {total_after} (removed {items_removed} items)")
-                    
-                    if items_removed != 1:
-                        print(f"WARNING: Expected to remove 1 item, but removed {items_removed} items!")
-                    
-                    # Emit removal event to all clients
-                    from flask import current_app
-                    if hasattr(current_app, 'socketio'):
-                        current_app.socketio.emit('track_removed', {
-                            'track_uri': track_uri,
-                            'track_name': track_name
-                        })
-                    print(f"Broadcasted track removal: '{track_name}'")
-                else:
-                    print(f"Warning: Track {track_uri} not found in queue to remove")
-                    
+            track_name = next_track['track_name']
+            removed = get_queue_store().remove_track(track_uri, fence_token=lease_token)
+        except StaleFenceError as e:
+            print(f"Auto-play removal rejected ({e}), leaving queue to the new leader")
+            return jsonify({"error": "Auto-play lease expired"}), 409
         except Exception as db_error:
             print(f"Error removing track from queue: {db_error}")
             raise db_error
         
+        if removed:
+            print(f"Removed '{track_name}' and its votes from queue")
+            
+            # Bump the version before broadcasting so clients refetch the new queue
+            record_queue_change("remove", {"track_uri": track_uri})
+            
+            # Emit removal event to all clients
+            from flask import current_app
+            if hasattr(current_app, 'socketio'):
+                broadcast('track_removed', {
+                    'track_uri': track_uri,
+                    'track_name': track_name
+                })
+            print(f"Broadcasted track removal: '{track_name}'")
+        else:
+            print(f"Warning: Track {track_uri} not found in queue to remove")
+        
         print(f"Auto-play complete: {next_track['track_name']} is playing and removed from queue")
         return jsonify({
             "status": "success", 
@@ -286,26 +440,25 @@ def auto_play_next():
 def remove_from_queue(track_uri):
     """Remove a specific track from the queue after it's played"""
     try:
-        with get_db() as db:
-            # Find and remove the track
-            item = db.query(QueueItem).filter_by(track_uri=track_uri).first()
-            if item:
-                db.delete(item)
-                
-                # Also remove associated votes
-                db.query(Vote).filter_by(track_uri=track_uri).delete()
-                
-                # Emit removal event to all clients
-                from flask import current_app
-                if hasattr(current_app, 'socketio'):
-                    current_app.socketio.emit('track_removed', {
-                        'track_uri': track_uri,
-                        'track_name': item.track_name
-                    })
-                
-                return jsonify({"status": "success", "message": "Track removed from queue"})
-            else:
-                return jsonify({"error": "Track not found in queue"}), 404
+        store = get_queue_store()
+        queued_track = store.get_track(track_uri)
+        
+        # Remove the track and its votes
+        if not queued_track or not store.remove_track(track_uri):
+            return jsonify({"error": "Track not found in queue"}), 404
+        track_name = queued_track["track_name"]
+        
+        record_queue_change("remove", {"track_uri": track_uri})
+        
+        # Emit removal event to all clients
+        from flask import current_app
+        if hasattr(current_app, 'socketio'):
+            broadcast('track_removed', {
+                'track_uri': track_uri,
+                'track_name': track_name
+            })
+        
+        return jsonify({"status": "success", "message": "Track removed from queue"})
                 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -5,7 +5,10 @@ Handles music search functionality without requiring Spotify user authentication
 
 from flask import Blueprint, request, jsonify, session
 from backend.api.spotify import search_tracks
-from backend.models.models import get_db, QueueItem
+from backend.queue_store import get_queue_store
+from backend.utils.cache import record_queue_change
+from backend.utils.idempotency import claim_operation, complete_operation, release_operation
+from backend.websockets.broadcast import broadcast
 
 
 search_bp = Blueprint('search', __name__)
@@ -35,11 +38,20 @@ def search_music():
 
 @search_bp.route("/add-to-queue", methods=["POST"])
 def add_to_queue():
-    """Add a track to the queue"""
+    """Add a track to the queue.
+    
+    Clients may send an Idempotency-Key header (or client_op_id in the body);
+    a retry with the same key returns the original response without writing.
+    """
+    operation_scope = f"queue_add:{session.get('user_id', 'anonymous')}"
+    operation_id = None
+    operation_claimed = False
+    
     try:
         data = request.get_json()
         track_uri = data.get('track_uri')
         track_name = data.get('track_name')
+        operation_id = request.headers.get('Idempotency-Key') or data.get('client_op_id')
         
         print(f"=== ADD TO QUEUE DEBUG ===")
         print(f"Received data: {data}")
@@ -51,59 +63,81 @@ def add_to_queue():
             print("ERROR: Missing track URI or name")
             return jsonify({"error": "Track URI and name are required"}), 400
         
-        # Check if this is a playlist track or recommendation that needs to be searched
-        if track_uri.startswith('playlist:') or track_uri.startswith('recommendation:'):
-            uri_type = 'playlist' if track_uri.startswith('playlist:') else 'recommendation'
-            print(f"INFO: {uri_type.title()} track detected, searching Spotify for actual track")
-            
-            # Extract search query from track_name (format: "Song Title - Artist Name")
-            search_query = track_name
-            
-            # Search for the track using Spotify API
-            search_results = search_tracks(search_query, limit=1)
-            
-            if not search_results.get('tracks') or len(search_results['tracks']) == 0:
-                print(f"ERROR: No Spotify tracks found for query: {search_query}")
-                return jsonify({"error": f"Could not find '{track_name}' on Spotify"}), 404
-            
-            # Use the first search result
-            spotify_track = search_results['tracks'][0]
-            track_uri = spotify_track['uri']
-            track_name = f"{spotify_track['name']} - {spotify_track['artist_names']}"
-            
-            print(f"SUCCESS: Found Spotify track: {track_uri} - {track_name}")
+        operation_claimed, previous_result = claim_operation(operation_scope, operation_id)
+        if not operation_claimed:
+            print(f"INFO: Replayed add-to-queue operation {operation_id}")
+            if previous_result:
+                return jsonify(previous_result["body"]), previous_result["status"]
+            return jsonify({"error": "This request is already being processed"}), 409
+        
+        body, status = add_track_to_queue(track_uri, track_name)
+        
+        # Only definitive outcomes are remembered; transient failures can be retried
+        if status in (200, 400):
+            complete_operation(operation_scope, operation_id, {"body": body, "status": status})
         else:
-            print(f"INFO: Regular track (not playlist/recommendation), using as-is")
+            release_operation(operation_scope, operation_id)
         
-        # Check if track is already in queue
-        with get_db() as db:
-            existing = db.query(QueueItem).filter_by(track_uri=track_uri).first()
-            if existing:
-                print(f"ERROR: Track already exists in queue: {existing.track_name}")
-                return jsonify({"error": "Track is already in the queue"}), 400
-            
-            # Add to queue
-            queue_item = QueueItem(track_uri=track_uri, track_name=track_name)
-            db.add(queue_item)
-            print(f"SUCCESS: Added track to database: {track_name}")
-            
-            # Emit event to all clients
-            from backend.websockets.handlers import socketio
-            socketio.emit('track_added', {
-                'track_uri': track_uri,
-                'track_name': track_name,
-                'added_by': session.get('username', 'Anonymous')
-            })
-            print(f"SUCCESS: Emitted track_added event")
-            
-            return jsonify({
-                "message": f"'{track_name}' added to queue",
-                "track_uri": track_uri,
-                "track_name": track_name
-            }), 200
+        return jsonify(body), status
             
     except Exception as e:
         print(f"ERROR in add_to_queue: {e}")
         import traceback
         traceback.print_exc()
+        if operation_claimed:
+            release_operation(operation_scope, operation_id)
         return jsonify({"error": "Failed to add track to queue"}), 500
+
+
+def add_track_to_queue(track_uri, track_name):
+    """Resolve and add a single track to the queue, returning (response_body, status_code)"""
+    # Check if this is a playlist track or recommendation that needs to be searched
+    if track_uri.startswith('playlist:') or track_uri.startswith('recommendation:'):
+        uri_type = 'playlist' if track_uri.startswith('playlist:') else 'recommendation'
+        print(f"INFO: {uri_type.title()} track detected, searching Spotify for actual track")
+        
+        # Extract search query from track_name (format: "Song Title - Artist Name")
+        search_query = track_name
+        
+        # Search for the track using Spotify API
+        search_results = search_tracks(search_query, limit=1)
+        
+        if not search_results.get('tracks') or len(search_results['tracks']) == 0:
+            print(f"ERROR: No Spotify tracks found for query: {search_query}")
+            return {"error": f"Could not find '{track_name}' on Spotify"}, 404
+        
+        # Use the first search result
+        spotify_track = search_results['tracks'][0]
+        track_uri = spotify_track['uri']
+        track_name = f"{spotify_track['name']} - {spotify_track['artist_names']}"
+        
+        print(f"SUCCESS: Found Spotify track: {track_uri} - {track_name}")
+    else:
+        print(f"INFO: Regular track (not playlist/recommendation), using as-is")
+    
+    # Add to queue; the store makes this a no-op if the track is already queued
+    inserted = get_queue_store().add_track(track_uri, track_name)
+    
+    if not inserted:
+        print(f"ERROR: Track already exists in queue: {track_name}")
+        return {"error": "Track is already in the queue"}, 400
+    
+    timestamp = inserted["timestamp"]
+    print(f"SUCCESS: Added track to database: {track_name}")
+    
+    # Bump the queue version and refresh the snapshot now that the add is committed
+    record_queue_change("add", {"track_uri": track_uri, "track_name": track_name, "timestamp": timestamp})
+    
+    # Emit event to all clients
+    broadcast('track_added', {
+        'track_uri': track_uri,
+        'track_name': track_name,
+        'added_by': session.get('username', 'Anonymous')
+    })
+    print(f"SUCCESS: Emitted track_added event")
+    
+    return {
+        "message": f"'{track_name}' added to queue",
+        "track_uri": track_uri,
+        "track_name": track_name
+    }, 200
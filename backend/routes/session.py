@@ -5,8 +5,14 @@ Handles role selection, host status, and session control.
 
 import os
 from flask import Blueprint, session, request, redirect, jsonify
-from backend.models.models import get_db, QueueItem, Vote, ChatMessage
-from backend.utils.cache import invalidate_playlist_cache, clear_currently_playing, clear_queue_snapshot
+from backend.models.models import get_db, ChatMessage
+from backend.queue_store import get_queue_store
+from backend.utils.cache import invalidate_playlist_cache, clear_currently_playing, record_queue_change
+from backend.utils.host import get_current_host, clear_host, is_current_host
+from backend.websockets.broadcast import broadcast, CHAT_NAMESPACE
+from backend.websockets.context import invalidate_identity
+from backend.utils.chat_history import get_chat_buffer
+from backend.utils.chat_writer import get_chat_writer
 from datetime import datetime, timezone
 
 
@@ -301,20 +307,13 @@ def select_role():
 @session_mgmt_bp.route("/host-status")
 def host_status():
     """Check if someone is currently hosting"""
-    host_file = 'current_host.txt'
-    
-    if os.path.exists(host_file):
-        try:
-            with open(host_file, 'r') as f:
-                host_info = f.read().strip().split('|')
-                if len(host_info) >= 2:
-                    return jsonify({
-                        "has_host": True,
-                        "host_id": host_info[0],
-                        "host_name": host_info[1]
-                    })
-        except:
-            pass
+    host = get_current_host()
+    if host:
+        return jsonify({
+            "has_host": True,
+            "host_id": host["user_id"],
+            "host_name": host["display_name"]
+        })
     
     return jsonify({"has_host": False})
 
@@ -325,19 +324,21 @@ def sign_out_host():
     if session.get("role") != "host":
         return jsonify({"error": "Only hosts can sign out"}), 403
     
-    # Remove host file
-    host_file = 'current_host.txt'
-    if os.path.exists(host_file):
-        os.remove(host_file)
-    
-    # Clear currently playing track
-    clear_currently_playing()
-    
-    # Clear playlist caches
-    invalidate_playlist_cache()
-    print("Cleared playlist caches on host sign out")
+    # A host whose lease was taken over only signs itself out; the shared
+    # state now belongs to the new host
+    if is_current_host(session.get("user_id")):
+        # Release the host lease
+        clear_host(session.get("user_id"))
+        
+        # Clear currently playing track
+        clear_currently_playing()
+        
+        # Clear playlist caches
+        invalidate_playlist_cache()
+        print("Cleared playlist caches on host sign out")
     
-    # Clear session
+    # Clear session, and the identity its open sockets cached
+    invalidate_identity()
     session.clear()
     
     return jsonify({"status": "success", "message": "Signed out as host"})
@@ -346,6 +347,7 @@ def sign_out_host():
 @session_mgmt_bp.route("/logout")
 def logout():
     """Clear session and redirect to role selection"""
+    invalidate_identity()
     session.clear()
     return redirect("/select-role")
 
@@ -353,43 +355,45 @@ def logout():
 @session_mgmt_bp.route("/reset-session")
 def reset_session():
     """Reset user session and redirect to role selection"""
+    invalidate_identity()
     session.clear()
     return redirect("/select-role")
 
 
 @session_mgmt_bp.route("/restart-session", methods=["POST"])
 def restart_session():
-    """Restart the entire session - clears all session data, host state, queue, votes, and chat"""
+    """Restart the entire session - clears all session data, host state, queue, votes, and chat - Host only"""
+    user_id = session.get("user_id")
+    if session.get("role") != "host" or not is_current_host(user_id):
+        return jsonify({"error": "Only the host can restart the session", "required_role": "host", "current_role": session.get("role")}), 403
+    
     try:
-        # Remove host file
-        host_file = 'current_host.txt'
-        if os.path.exists(host_file):
-            os.remove(host_file)
+        # Release the host role
+        clear_host(user_id)
         
         # Clear the queue, votes, chat, and currently playing
         try:
+            # Clear all queue items and their votes
+            get_queue_store().clear()
+            
+            get_chat_writer().discard_pending()
             with get_db() as db:
-                # Clear all votes
-                db.query(Vote).delete()
-                
-                # Clear all queue items
-                db.query(QueueItem).delete()
-                
                 # Clear all chat messages
                 db.query(ChatMessage).delete()
+            get_chat_buffer().clear()
                 
-                # Clear caches
-                clear_currently_playing()
-                clear_queue_snapshot()
-                
-                # Emit events to all connected clients
-                from flask import current_app
-                if hasattr(current_app, 'socketio'):
-                    current_app.socketio.emit('queue_cleared')
-                    current_app.socketio.emit('votes_cleared')
-                    current_app.socketio.emit('chat_cleared')
-                    current_app.socketio.emit('playback_paused', {'is_playing': False})
-                    current_app.socketio.emit('session_restarted')
+            # Clear caches and bump the queue version now that the clear is committed
+            clear_currently_playing()
+            record_queue_change("clear")
+            
+            # Emit events to all connected clients
+            from flask import current_app
+            if hasattr(current_app, 'socketio'):
+                broadcast('queue_cleared')
+                broadcast('votes_cleared')
+                broadcast('chat_cleared', namespace=CHAT_NAMESPACE)
+                broadcast('playback_paused', {'is_playing': False})
+                broadcast('session_restarted')
                 
         except Exception as e:
             print(f"Error clearing data during session restart: {e}")
@@ -0,0 +1,55 @@
+"""
+Shared state backends for BeatSync Mixer.
+STATE_STORE selects the backend: "auto" (default - Redis when reachable,
+otherwise in-process), "redis" or "memory".
+"""
+
+import os
+import threading
+from .base_store import StateStore
+from .memory_store import InMemoryStateStore
+from .redis_store import RedisStateStore
+
+
+STATE_STORE_BACKEND = os.getenv("STATE_STORE", "auto").lower()
+
+_state_store = None
+_state_store_lock = threading.Lock()
+
+
+def create_state_store(backend=None):
+    """Build a state store for the given backend name (falls back to in-process)"""
+    backend = (backend or STATE_STORE_BACKEND).lower()
+
+    if backend in ("auto", "redis"):
+        from backend.utils.config import create_manual_redis_client
+        client = create_manual_redis_client()
+        try:
+            if client and client.ping():
+                print("Using Redis state store")
+                return RedisStateStore(client)
+        except Exception as e:
+            print(f"Redis ping failed for state store: {e}")
+        if backend == "redis":
+            print("Redis unavailable for state store, falling back to in-process state")
+    elif backend != "memory":
+        print(f"Unknown STATE_STORE '{backend}', falling back to in-process state")
+
+    print("Using in-process state store")
+    return InMemoryStateStore()
+
+
+def get_state_store():
+    """Get the process-wide state store"""
+    global _state_store
+    if _state_store is None:
+        with _state_store_lock:
+            if _state_store is None:
+                _state_store = create_state_store()
+    return _state_store
+
+
+__all__ = [
+    'StateStore', 'InMemoryStateStore', 'RedisStateStore',
+    'create_state_store', 'get_state_store'
+]
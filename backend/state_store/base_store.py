@@ -0,0 +1,71 @@
+"""
+Shared party state interface for BeatSync Mixer.
+Small pieces of state every worker must agree on (the current host, listener
+numbers, cache generations) go through a StateStore instead of module globals
+or local files. Values are anything JSON-serializable; ttl is in seconds.
+publish/subscribe lets workers push invalidations to each other.
+"""
+
+from abc import ABC, abstractmethod
+
+
+class StateStore(ABC):
+    """Base class for shared state backends"""
+
+    name = "base"
+
+    @abstractmethod
+    def get(self, key):
+        """The value stored at key, or None"""
+
+    @abstractmethod
+    def set(self, key, value, ttl=None):
+        """Store value at key, expiring after ttl seconds if given"""
+
+    @abstractmethod
+    def delete(self, key):
+        """Remove key, returning True if it existed"""
+
+    @abstractmethod
+    def set_if_absent(self, key, value, ttl=None):
+        """Store value only if key doesn't exist, returning True if it was stored"""
+
+    @abstractmethod
+    def compare_and_set(self, key, expected, value, ttl=None):
+        """Replace the value at key only if it currently equals expected"""
+
+    @abstractmethod
+    def compare_and_delete(self, key, expected):
+        """Delete key only if its value currently equals expected"""
+
+    @abstractmethod
+    def incr(self, key, delta=1):
+        """Atomically add delta to an integer key (missing keys start at 0)"""
+
+    @abstractmethod
+    def expire(self, key, ttl):
+        """Reset the time to live of key, returning False if it doesn't exist"""
+
+    @abstractmethod
+    def hash_get(self, name, field):
+        """The value of field in hash name, or None"""
+
+    @abstractmethod
+    def hash_set(self, name, field, value):
+        """Store value at field in hash name"""
+
+    @abstractmethod
+    def hash_delete(self, name, field):
+        """Remove field from hash name, returning True if it existed"""
+
+    @abstractmethod
+    def hash_get_all(self, name):
+        """Every field of hash name as a dict"""
+
+    @abstractmethod
+    def publish(self, channel, message):
+        """Send message to every subscriber of channel (in every worker)"""
+
+    @abstractmethod
+    def subscribe(self, channel, callback):
+        """Call callback(message) for each message published on channel"""
@@ -0,0 +1,125 @@
+"""
+In-process state store for BeatSync Mixer.
+Keeps shared state in a dict guarded by a lock - correct for a single worker,
+and the fallback when Redis isn't available.
+"""
+
+import copy
+import time
+import threading
+from .base_store import StateStore
+
+
+class InMemoryStateStore(StateStore):
+    """State held in process memory (single worker only)"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._values = {}  # {key: (value, expires_at or None)}
+        self._hashes = {}  # {name: {field: value}}
+        self._subscribers = {}  # {channel: [callback]}
+
+    def _live(self, key):
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self._values[key]
+            return None
+        return entry
+
+    def _expiry(self, ttl):
+        return time.time() + ttl if ttl else None
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key)
+            return copy.deepcopy(entry[0]) if entry else None
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._values[key] = (copy.deepcopy(value), self._expiry(ttl))
+        return True
+
+    def delete(self, key):
+        # Like Redis DEL, this removes a plain key or a whole hash
+        with self._lock:
+            existed = self._live(key) is not None or bool(self._hashes.get(key))
+            self._values.pop(key, None)
+            self._hashes.pop(key, None)
+            return existed
+
+    def set_if_absent(self, key, value, ttl=None):
+        with self._lock:
+            if self._live(key):
+                return False
+            self._values[key] = (copy.deepcopy(value), self._expiry(ttl))
+            return True
+
+    def compare_and_set(self, key, expected, value, ttl=None):
+        with self._lock:
+            entry = self._live(key)
+            if (entry[0] if entry else None) != expected:
+                return False
+            self._values[key] = (copy.deepcopy(value), self._expiry(ttl))
+            return True
+
+    def compare_and_delete(self, key, expected):
+        with self._lock:
+            entry = self._live(key)
+            if not entry or entry[0] != expected:
+                return False
+            del self._values[key]
+            return True
+
+    def incr(self, key, delta=1):
+        with self._lock:
+            entry = self._live(key)
+            value = int(entry[0] if entry else 0) + delta
+            self._values[key] = (value, entry[1] if entry else None)
+            return value
+
+    def expire(self, key, ttl):
+        with self._lock:
+            entry = self._live(key)
+            if not entry:
+                return False
+            self._values[key] = (entry[0], self._expiry(ttl))
+            return True
+
+    def hash_get(self, name, field):
+        with self._lock:
+            return copy.deepcopy(self._hashes.get(name, {}).get(field))
+
+    def hash_set(self, name, field, value):
+        with self._lock:
+            self._hashes.setdefault(name, {})[field] = copy.deepcopy(value)
+        return True
+
+    def hash_delete(self, name, field):
+        with self._lock:
+            fields = self._hashes.get(name)
+            if not fields or field not in fields:
+                return False
+            del fields[field]
+            return True
+
+    def hash_get_all(self, name):
+        with self._lock:
+            return copy.deepcopy(self._hashes.get(name, {}))
+
+    def publish(self, channel, message):
+        with self._lock:
+            callbacks = list(self._subscribers.get(channel, []))
+        for callback in callbacks:
+            try:
+                callback(copy.deepcopy(message))
+            except Exception as e:
+                print(f"State store subscriber error on {channel}: {e}")
+
+    def subscribe(self, channel, callback):
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(callback)
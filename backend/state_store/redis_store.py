@@ -0,0 +1,114 @@
+"""
+Redis state store for BeatSync Mixer.
+Every worker and node sees the same state. Values are stored as JSON strings,
+TTLs use PX, and compare-and-set/delete run as Lua scripts so they are atomic.
+Subscriptions each get a Redis pub/sub connection served by a daemon thread.
+"""
+
+import json
+from .base_store import StateStore
+
+
+# KEYS: key  ARGV: expected JSON ('' for missing), new JSON, ttl ms (0 = none)
+COMPARE_AND_SET_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if (current or '') ~= ARGV[1] then
+  return 0
+end
+if tonumber(ARGV[3]) > 0 then
+  redis.call('SET', KEYS[1], ARGV[2], 'PX', ARGV[3])
+else
+  redis.call('SET', KEYS[1], ARGV[2])
+end
+return 1
+"""
+
+# KEYS: key  ARGV: expected JSON
+COMPARE_AND_DELETE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _dump(value):
+    return json.dumps(value, sort_keys=True)
+
+
+def _load(raw):
+    return json.loads(raw) if raw is not None else None
+
+
+def _ttl_ms(ttl):
+    return int(ttl * 1000) if ttl else None
+
+
+class RedisStateStore(StateStore):
+    """State held in Redis (shared by every worker and node)"""
+
+    name = "redis"
+
+    def __init__(self, client, prefix="beatsync:state:"):
+        self.client = client
+        self.prefix = prefix
+        self._compare_and_set = client.register_script(COMPARE_AND_SET_SCRIPT)
+        self._compare_and_delete = client.register_script(COMPARE_AND_DELETE_SCRIPT)
+
+    def _key(self, key):
+        return self.prefix + key
+
+    def get(self, key):
+        return _load(self.client.get(self._key(key)))
+
+    def set(self, key, value, ttl=None):
+        return bool(self.client.set(self._key(key), _dump(value), px=_ttl_ms(ttl)))
+
+    def delete(self, key):
+        return self.client.delete(self._key(key)) > 0
+
+    def set_if_absent(self, key, value, ttl=None):
+        return bool(self.client.set(self._key(key), _dump(value), nx=True, px=_ttl_ms(ttl)))
+
+    def compare_and_set(self, key, expected, value, ttl=None):
+        expected_raw = _dump(expected) if expected is not None else ""
+        return bool(self._compare_and_set(
+            keys=[self._key(key)],
+            args=[expected_raw, _dump(value), _ttl_ms(ttl) or 0]
+        ))
+
+    def compare_and_delete(self, key, expected):
+        return bool(self._compare_and_delete(keys=[self._key(key)], args=[_dump(expected)]))
+
+    def incr(self, key, delta=1):
+        return int(self.client.incrby(self._key(key), delta))
+
+    def expire(self, key, ttl):
+        return bool(self.client.pexpire(self._key(key), _ttl_ms(ttl)))
+
+    def hash_get(self, name, field):
+        return _load(self.client.hget(self._key(name), field))
+
+    def hash_set(self, name, field, value):
+        self.client.hset(self._key(name), field, _dump(value))
+        return True
+
+    def hash_delete(self, name, field):
+        return self.client.hdel(self._key(name), field) > 0
+
+    def hash_get_all(self, name):
+        return {field: _load(raw) for field, raw in self.client.hgetall(self._key(name)).items()}
+
+    def publish(self, channel, message):
+        self.client.publish(self._key(channel), _dump(message))
+
+    def subscribe(self, channel, callback):
+        def handle_message(message):
+            try:
+                callback(_load(message["data"]))
+            except Exception as e:
+                print(f"State store subscriber error on {channel}: {e}")
+
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{self._key(channel): handle_message})
+        return pubsub.run_in_thread(sleep_time=1, daemon=True)
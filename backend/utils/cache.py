@@ -6,17 +6,42 @@ Handles playlist and track caching with in-memory and Redis storage.
 import time
 import json
 import threading
+from collections import deque
 
 
-# In-memory cache for ultra-fast access (per-dyno)
+# In-memory cache for ultra-fast access (per-dyno). Its generation mirrors a
+# counter in the shared state store: clearing bumps the counter and pushes the
+# new generation to every worker, which drops its copy when it sees it
+CACHE_GENERATION_KEY = "cache_generation"
+CACHE_CLEARED_CHANNEL = "cache_cleared"
+
+# Safety net in case a clear notification is missed
+CACHE_GENERATION_CHECK_SECONDS = 30
+
+_generation_sync = {'checked_at': 0, 'subscribed': False}
+_generation_sync_lock = threading.Lock()
+
 in_memory_cache = {
     'playlists': None,
-    'playlists_timestamp': 0
+    'playlists_timestamp': 0,
+    'generation': None
 }
 
 
+# Recent queue operations for incremental (?since=<version>) queue reads (per-process)
+QUEUE_OPS_LOG_SIZE = 200
+queue_ops_log = deque(maxlen=QUEUE_OPS_LOG_SIZE)
+queue_ops_lock = threading.Lock()
+
+# Serialized initial_state payloads (per-process), reused by every connecting
+# client until the queue version or the currently playing track changes
+initial_state_cache = {}  # {variant: ((version, currently_playing_json), body JSON without seq)}
+initial_state_lock = threading.Lock()
+
+
 def get_in_memory_cache():
     """Get the in-memory cache dictionary"""
+    sync_in_memory_cache()
     return in_memory_cache
 
 
@@ -25,20 +50,79 @@ def set_in_memory_cache(key, value):
     in_memory_cache[key] = value
 
 
-def clear_in_memory_cache():
-    """Clear all in-memory cache"""
+def _reset_in_memory_cache(generation):
     global in_memory_cache
     in_memory_cache = {
         'playlists': None,
-        'playlists_timestamp': 0
+        'playlists_timestamp': 0,
+        'generation': generation
     }
 
 
+def _apply_generation(generation):
+    if in_memory_cache.get('generation') != generation:
+        _reset_in_memory_cache(generation)
+
+
+def _ensure_generation_subscribed(store):
+    """Listen for cache clears made by other workers (once per process)"""
+    with _generation_sync_lock:
+        if _generation_sync['subscribed']:
+            return
+        _generation_sync['subscribed'] = True
+    try:
+        store.subscribe(CACHE_CLEARED_CHANNEL, _apply_generation)
+    except Exception as e:
+        print(f"Failed to subscribe to cache clears: {e}")
+
+
+def sync_in_memory_cache():
+    """Drop this process's in-memory cache if another worker cleared it.
+    
+    Clears arrive as notifications, so a cache hit normally costs no state
+    store round trip; the shared generation is read again at most every
+    CACHE_GENERATION_CHECK_SECONDS.
+    """
+    from backend.state_store import get_state_store
+    
+    try:
+        store = get_state_store()
+        _ensure_generation_subscribed(store)
+        
+        now = time.time()
+        with _generation_sync_lock:
+            if now - _generation_sync['checked_at'] < CACHE_GENERATION_CHECK_SECONDS:
+                return
+            _generation_sync['checked_at'] = now
+        
+        generation = store.get(CACHE_GENERATION_KEY) or 0
+    except Exception as e:
+        print(f"Failed to read cache generation: {e}")
+        return
+    
+    _apply_generation(generation)
+
+
+def clear_in_memory_cache():
+    """Clear all in-memory cache, in every worker"""
+    from backend.state_store import get_state_store
+    
+    generation = None
+    try:
+        store = get_state_store()
+        generation = store.incr(CACHE_GENERATION_KEY)
+        store.publish(CACHE_CLEARED_CHANNEL, generation)
+    except Exception as e:
+        print(f"Failed to bump cache generation: {e}")
+    _reset_in_memory_cache(generation)
+
+
 def get_cached_playlists():
     """Get playlists from cache (in-memory first, then Redis)"""
     from flask import current_app
     
     # Try in-memory cache first (fastest)
+    sync_in_memory_cache()
     if in_memory_cache.get('playlists') and in_memory_cache.get('playlists_timestamp'):
         # Check if cache is still fresh (5 minutes)
         if time.time() - in_memory_cache['playlists_timestamp'] < 300:
@@ -149,6 +233,7 @@ def get_cached_tracks(playlist_id, limit=50, offset=0):
     cache_key = f"{playlist_id}:{limit}:{offset}"
     
     # Try in-memory cache first (fastest)
+    sync_in_memory_cache()
     if cache_key in in_memory_cache.get('playlist_tracks', {}):
         timestamp = in_memory_cache.get('playlist_tracks_timestamps', {}).get(cache_key)
         if timestamp and (time.time() - timestamp) < 60:  # 60 second TTL for tracks
@@ -189,7 +274,7 @@ def set_cached_tracks(playlist_id, tracks_data, limit=50, offset=0):
     in_memory_cache['playlist_tracks_timestamps'][cache_key] = time.time()
     print(f"Updated in-memory tracks cache for {cache_key}")
     
-    # Update Redis cache asynchronously
+    # Update Redis cache in the background (write-behind)
     def cache_tracks_async():
         try:
             cache = getattr(current_app, 'cache', None)
@@ -202,7 +287,8 @@ def set_cached_tracks(playlist_id, tracks_data, limit=50, offset=0):
         except Exception as e:
             print(f"Failed to cache tracks in Redis: {e}")
     
-    threading.Thread(target=cache_tracks_async, daemon=True).start()
+    from backend.utils.executor import submit_task
+    submit_task("cache_write", cache_tracks_async, app=current_app._get_current_object())
 
 
 def get_currently_playing(app=None):
@@ -272,20 +358,174 @@ def clear_currently_playing(app=None):
     return False
 
 
+def _get_cache(app=None):
+    """Resolve the cache instance from an explicit app or the current app context"""
+    if app:
+        return app.cache
+    from flask import current_app
+    return getattr(current_app, 'cache', None)
+
+
+def get_redis_client(app=None):
+    """Get the raw Redis client behind the app cache, or None when running without Redis"""
+    try:
+        cache = _get_cache(app)
+        if cache and getattr(cache, 'use_manual', False):
+            return cache.manual_client
+    except Exception as e:
+        print(f"Failed to get Redis client: {e}")
+    return None
+
+
+def get_queue_version(app=None):
+    """Get the current queue version (0 if the queue has never changed)"""
+    try:
+        cache = _get_cache(app)
+        if cache:
+            version = cache.get("queue_version")
+            if version:
+                return int(version)
+    except Exception as e:
+        print(f"Failed to get queue version from cache: {e}")
+    
+    return 0
+
+
+def record_queue_change(op, data=None, app=None):
+    """Bump the queue version for an add/vote/remove/clear and refresh the snapshot.
+    
+    Must be called after the change has been committed so the rebuilt
+    snapshot reflects it.
+    """
+    try:
+        cache = _get_cache(app)
+        if not cache:
+            print("No cache instance available for queue versioning")
+            return 0
+        
+        version = cache.incr("queue_version")
+        with queue_ops_lock:
+            queue_ops_log.append({"version": version, "op": op, "data": data or {}})
+        
+        print(f"Queue version bumped to {version} ({op})")
+        update_queue_snapshot(app)
+        return version
+    except Exception as e:
+        print(f"Failed to record queue change: {e}")
+    
+    return 0
+
+
+def get_queue_ops_since(since_version, current_version):
+    """Get the operations after since_version, or None if the log no longer covers that range"""
+    with queue_ops_lock:
+        ops = [entry for entry in queue_ops_log if since_version < entry["version"] <= current_version]
+    ops.sort(key=lambda entry: entry["version"])
+    
+    # Every version in (since, current] must be present, otherwise the client
+    # has to fall back to a full snapshot (log rolled over or another worker wrote)
+    if [entry["version"] for entry in ops] != list(range(since_version + 1, current_version + 1)):
+        return None
+    
+    return ops
+
+
+def get_versioned_queue_snapshot(app=None):
+    """Get (version, items) for the queue, rebuilding the snapshot if it is stale"""
+    version = get_queue_version(app)
+    
+    try:
+        cache = _get_cache(app)
+        if cache:
+            cached_data = cache.get("queue_snapshot")
+            if cached_data:
+                if isinstance(cached_data, str):
+                    cached_data = json.loads(cached_data)
+                if isinstance(cached_data, dict) and cached_data.get("version", -1) >= version:
+                    return cached_data["version"], cached_data["items"]
+    except Exception as e:
+        print(f"Failed to get queue snapshot from cache: {e}")
+    
+    items = update_queue_snapshot(app, version=version)
+    return version, items
+
+
+def format_queue_items(items):
+    """Queue snapshot items as clients see them, ordered by vote score (highest first)"""
+    queue_data = []
+    for item in items:
+        up_votes = item.get("up_votes", 0)
+        down_votes = item.get("down_votes", 0)
+        queue_data.append({
+            "id": item.get("id"),
+            "track_uri": item["track_uri"],
+            "track_name": item["track_name"],
+            "timestamp": item.get("timestamp"),
+            "upvotes": up_votes,
+            "downvotes": down_votes,
+            "vote_score": up_votes - down_votes
+        })
+    
+    # Sort by vote score (highest first), then by timestamp (oldest first) as tiebreaker
+    queue_data.sort(key=lambda x: (-x["vote_score"], x["timestamp"] or ""))
+    return queue_data
+
+
+def get_initial_state_payload(app=None, hide_currently_playing=False):
+    """JSON for the initial_state event: currently playing, the queue, its version
+    and the broadcast sequence it reflects.
+    
+    The body is serialized once per (queue version, currently playing) and shared
+    by every client that connects in between, so a reconnect storm costs one
+    build. The sequence is spliced in per call: broadcasts that don't change the
+    body (pauses, cleared votes, session events) still advance it.
+    Listeners get a variant without the currently playing track in the queue.
+    """
+    from backend.websockets.broadcast import get_broadcast_log, with_seq
+    
+    # Read the sequence before the state: a client resuming from it may see an
+    # event twice, but never misses one
+    seq = get_broadcast_log().current_seq()
+    
+    variant = "listener" if hide_currently_playing else "host"
+    currently_playing = get_currently_playing(app)
+    key = (get_queue_version(app), json.dumps(currently_playing, sort_keys=True))
+    
+    with initial_state_lock:
+        cached = initial_state_cache.get(variant)
+        if cached and cached[0] == key:
+            return with_seq(cached[1], seq)
+        
+        version, items = get_versioned_queue_snapshot(app)
+        if hide_currently_playing and currently_playing:
+            items = [item for item in items if item["track_uri"] != currently_playing["track_uri"]]
+        queue_data = format_queue_items(items)
+        
+        from backend.utils.serialization import encode_payload
+        body = encode_payload({
+            "version": version,
+            "currently_playing": currently_playing,
+            "queue": queue_data,
+            "count": len(queue_data)
+        })
+        initial_state_cache[variant] = (key, body)
+        print(f"Built initial state v{version} ({variant}) with {len(queue_data)} items")
+        return with_seq(body, seq)
+
+
 def get_queue_snapshot(app=None):
     """Get a snapshot of the current queue from cache"""
     try:
-        if app:
-            cache = app.cache
-        else:
-            from flask import current_app
-            cache = getattr(current_app, 'cache', None)
+        cache = _get_cache(app)
         
         if cache:
             cached_data = cache.get("queue_snapshot")
             if cached_data:
                 if isinstance(cached_data, str):
                     cached_data = json.loads(cached_data)
+                # Snapshots are stored as {"version": ..., "items": [...]}
+                if isinstance(cached_data, dict):
+                    return cached_data.get("items", [])
                 return cached_data
     except Exception as e:
         print(f"Failed to get queue snapshot from cache: {e}")
@@ -293,40 +533,34 @@ def get_queue_snapshot(app=None):
     return []
 
 
-def update_queue_snapshot(app=None):
-    """Update the queue snapshot in cache from database"""
-    from backend.models.models import get_db, QueueItem, Vote
+def update_queue_snapshot(app=None, version=None):
+    """Update the queue snapshot in cache from the queue store"""
+    from backend.queue_store import get_queue_store
     
     try:
-        with get_db() as db:
-            # Get all queue items with their vote counts
-            items = db.query(QueueItem).order_by(QueueItem.timestamp).all()
-            queue_data = []
-            
-            for item in items:
-                # Get vote counts for this track
-                up_votes = db.query(Vote).filter(Vote.track_uri == item.track_uri, Vote.vote_type == "up").count()
-                down_votes = db.query(Vote).filter(Vote.track_uri == item.track_uri, Vote.vote_type == "down").count()
-                
-                queue_data.append({
-                    'track_uri': item.track_uri,
-                    'track_name': item.track_name,
-                    'timestamp': item.timestamp.isoformat() if item.timestamp else None,
-                    'up_votes': up_votes,
-                    'down_votes': down_votes
-                })
-            
-            # Cache the queue snapshot
-            if app:
-                cache = app.cache
-            else:
-                from flask import current_app
-                cache = getattr(current_app, 'cache', None)
+        # Read the version before the queue so a concurrent change can only
+        # make this snapshot look older than it is, never newer
+        if version is None:
+            version = get_queue_version(app)
+        
+        # All queue items with their vote counts, oldest first
+        queue_data = get_queue_store().get_items()
+        
+        # Cache the queue snapshot
+        cache = _get_cache(app)
+        
+        if cache:
+            # Don't overwrite a snapshot that a newer change already produced
+            existing = cache.get("queue_snapshot")
+            if existing:
+                if isinstance(existing, str):
+                    existing = json.loads(existing)
+                if isinstance(existing, dict) and existing.get("version", -1) > version:
+                    return queue_data
             
-            if cache:
-                cache.set("queue_snapshot", json.dumps(queue_data), timeout=3600)  # 1 hour
-                print(f"Updated queue snapshot with {len(queue_data)} items")
-                return queue_data
+            cache.set("queue_snapshot", json.dumps({"version": version, "items": queue_data}), timeout=3600)  # 1 hour
+            print(f"Updated queue snapshot v{version} with {len(queue_data)} items")
+        return queue_data
     except Exception as e:
         print(f"Failed to update queue snapshot: {e}")
     
@@ -336,11 +570,7 @@ def update_queue_snapshot(app=None):
 def clear_queue_snapshot(app=None):
     """Clear queue snapshot from cache"""
     try:
-        if app:
-            cache = app.cache
-        else:
-            from flask import current_app
-            cache = getattr(current_app, 'cache', None)
+        cache = _get_cache(app)
         
         if cache:
             cache.delete("queue_snapshot")
@@ -0,0 +1,210 @@
+"""
+Recent chat history for BeatSync Mixer.
+The last CHAT_BUFFER_SIZE chat messages are kept pre-serialized in a bounded
+ring buffer, so opening the chat serves them directly instead of querying and
+serializing chat_messages rows for every client. The buffer is a capped Redis
+list when the shared state store is Redis (so every worker sees the same
+chat) and an in-process deque otherwise. It is filled from the database once,
+on first use; the database is only needed for older history after that.
+Older history is read a page at a time with load_history_page(), which seeks
+on the (timestamp, id) index from a cursor instead of using OFFSET.
+"""
+
+import os
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from sqlalchemy import and_, or_
+from backend.models.models import get_db, ChatMessage
+from backend.state_store import get_state_store, RedisStateStore
+from backend.utils.serialization import EncodedJSON, encode_payload
+
+
+CHAT_BUFFER_SIZE = int(os.getenv("CHAT_BUFFER_SIZE", "200"))
+CHAT_HISTORY_LIMIT = 50
+CHAT_PAGE_MAX = 100
+
+
+def format_chat_message(chat_msg):
+    """Client representation of a ChatMessage row"""
+    return {
+        "id": chat_msg.id,
+        "user": chat_msg.user,
+        "message": chat_msg.message,
+        "timestamp": chat_msg.timestamp.replace(tzinfo=timezone.utc).isoformat() if chat_msg.timestamp else None,
+    }
+
+
+def load_recent_from_db(limit):
+    """The newest `limit` messages from the database, oldest first, encoded"""
+    with get_db() as db:
+        rows = db.query(ChatMessage).order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc()).limit(limit).all()
+        return [encode_payload(format_chat_message(row)) for row in reversed(rows)]
+
+
+def _as_db_timestamp(value):
+    """Naive UTC datetime (as stored) from an ISO string or datetime, or None"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def load_history_page(before_id=None, before_timestamp=None, limit=CHAT_HISTORY_LIMIT):
+    """One page of chat history older than a cursor, oldest first.
+
+    The cursor is the oldest message the client already has: its id, plus its
+    timestamp when the write-behind buffer may not have saved it yet. Returns
+    {"messages", "has_more", "before_id", "before_timestamp"} where the last two
+    are the cursor for the next page.
+    """
+    limit = max(1, min(int(limit or CHAT_HISTORY_LIMIT), CHAT_PAGE_MAX))
+    if before_id is None and before_timestamp is not None:
+        raise ValueError("before_timestamp needs a before_id")
+    with get_db() as db:
+        query = db.query(ChatMessage)
+        if before_id is not None:
+            if before_timestamp is not None:
+                cursor_timestamp = _as_db_timestamp(before_timestamp)
+                if cursor_timestamp is None:
+                    raise ValueError("Invalid before_timestamp")
+            else:
+                cursor = db.query(ChatMessage.timestamp).filter(ChatMessage.id == before_id).first()
+                if cursor is None:
+                    return {"messages": [], "has_more": False, "before_id": None, "before_timestamp": None}
+                cursor_timestamp = cursor[0]
+            query = query.filter(
+                ChatMessage.timestamp <= cursor_timestamp,
+                or_(ChatMessage.timestamp < cursor_timestamp,
+                    and_(ChatMessage.timestamp == cursor_timestamp, ChatMessage.id < before_id))
+            )
+        
+        # One extra row tells us whether another page exists
+        rows = query.order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        messages = [format_chat_message(row) for row in reversed(rows)]
+    
+    oldest = messages[0] if messages else None
+    return {
+        "messages": messages,
+        "has_more": has_more,
+        "before_id": oldest["id"] if oldest else None,
+        "before_timestamp": oldest["timestamp"] if oldest else None,
+    }
+
+
+def history_payload(messages):
+    """chat_history event payload from encoded messages, without re-serializing them"""
+    return EncodedJSON('{"messages":[' + ",".join(messages) + ']}')
+
+
+class InMemoryChatBuffer:
+    """Recent encoded chat messages for a single worker"""
+
+    def __init__(self, size=CHAT_BUFFER_SIZE):
+        self._lock = threading.Lock()
+        self._messages = deque(maxlen=size)
+        self._loaded = False
+        self._payloads = {}  # {limit: chat_history payload} until the next change
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self._messages.extend(load_recent_from_db(self._messages.maxlen))
+            self._loaded = True
+
+    def append(self, encoded):
+        with self._lock:
+            self._ensure_loaded()
+            self._messages.append(encoded)
+            self._payloads.clear()
+
+    def recent_payload(self, limit=CHAT_HISTORY_LIMIT):
+        with self._lock:
+            self._ensure_loaded()
+            payload = self._payloads.get(limit)
+            if payload is None:
+                messages = list(self._messages)[-limit:] if limit else []
+                payload = self._payloads[limit] = history_payload(messages)
+            return payload
+
+    def clear(self):
+        with self._lock:
+            self._messages.clear()
+            self._payloads.clear()
+            self._loaded = True
+
+
+class RedisChatBuffer:
+    """Recent encoded chat messages in a capped Redis list shared by every worker"""
+
+    def __init__(self, client, prefix="beatsync:state:", size=CHAT_BUFFER_SIZE):
+        self.client = client
+        self.size = size
+        self.list_key = prefix + "chat:recent"
+        self.loaded_key = prefix + "chat:loaded"
+        self._loaded = False  # this process has seen the list filled
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        # One worker fills the list from the database; messages appended
+        # meanwhile stay at the tail and the older rows go in front of them
+        if self.client.set(self.loaded_key, 1, nx=True):
+            try:
+                messages = load_recent_from_db(self.size)
+                if messages:
+                    pipe = self.client.pipeline()
+                    pipe.lpush(self.list_key, *reversed(messages))
+                    pipe.ltrim(self.list_key, -self.size, -1)
+                    pipe.execute()
+            except Exception:
+                # Let the next caller (in any worker) try the load again
+                self.client.delete(self.loaded_key)
+                raise
+        self._loaded = True
+
+    def append(self, encoded):
+        self._ensure_loaded()
+        pipe = self.client.pipeline()
+        pipe.rpush(self.list_key, str(encoded))
+        pipe.ltrim(self.list_key, -self.size, -1)
+        pipe.execute()
+
+    def recent_payload(self, limit=CHAT_HISTORY_LIMIT):
+        self._ensure_loaded()
+        if not limit:
+            return history_payload([])
+        raw = self.client.lrange(self.list_key, -limit, -1)
+        return history_payload(item.decode() if isinstance(item, bytes) else item for item in raw)
+
+    def clear(self):
+        pipe = self.client.pipeline()
+        pipe.delete(self.list_key)
+        pipe.set(self.loaded_key, 1)
+        pipe.execute()
+        self._loaded = True
+
+
+_chat_buffer = None
+_chat_buffer_lock = threading.Lock()
+
+
+def get_chat_buffer():
+    """Get the process-wide chat buffer, backed by the same store as the shared state"""
+    global _chat_buffer
+    if _chat_buffer is None:
+        with _chat_buffer_lock:
+            if _chat_buffer is None:
+                store = get_state_store()
+                if isinstance(store, RedisStateStore):
+                    _chat_buffer = RedisChatBuffer(store.client, store.prefix)
+                else:
+                    _chat_buffer = InMemoryChatBuffer()
+    return _chat_buffer
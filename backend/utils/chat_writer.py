@@ -0,0 +1,171 @@
+"""
+Write-behind persistence for chat messages in BeatSync Mixer.
+Chat messages are broadcast as soon as they arrive and queued here; a
+background thread writes them to chat_messages in one bulk INSERT every
+CHAT_FLUSH_INTERVAL_MS, or sooner once CHAT_FLUSH_BATCH messages are waiting.
+At most CHAT_PENDING_LIMIT messages wait in memory: past that the sender
+flushes the backlog itself before its message is queued. Each message gets
+its id from next_chat_id() before it is broadcast, so clients, the recent
+history buffer and the saved row all agree on it. A batch that fails
+is retried row by row, and rows that still fail while the database is up are
+dropped, so one bad row can't block the rest. Whatever is still pending is
+written when the process exits.
+"""
+
+import os
+import atexit
+import threading
+from collections import deque
+from sqlalchemy import func, insert, text
+from backend.models.models import get_db, ChatMessage
+from backend.state_store import get_state_store
+
+
+CHAT_FLUSH_INTERVAL_MS = int(os.getenv("CHAT_FLUSH_INTERVAL_MS", "250"))
+CHAT_FLUSH_BATCH = int(os.getenv("CHAT_FLUSH_BATCH", "100"))
+CHAT_PENDING_LIMIT = int(os.getenv("CHAT_PENDING_LIMIT", "5000"))
+CHAT_ID_KEY = "chat:last_id"
+
+_chat_id_seeded = False
+
+
+def next_chat_id():
+    """Allocate the id the next chat message will be saved under.
+
+    The counter lives in the shared state store so every worker draws from
+    it; each process makes sure it starts past the largest saved id first.
+    """
+    global _chat_id_seeded
+    store = get_state_store()
+    if not _chat_id_seeded:
+        with get_db() as db:
+            last_saved = db.query(func.max(ChatMessage.id)).scalar() or 0
+        store.set_if_absent(CHAT_ID_KEY, last_saved)
+        _chat_id_seeded = True
+    return store.incr(CHAT_ID_KEY)
+
+
+class ChatWriteBehind:
+    """Buffers chat rows and writes them in batches on a background thread"""
+
+    def __init__(self, interval_ms=CHAT_FLUSH_INTERVAL_MS, batch=CHAT_FLUSH_BATCH, limit=CHAT_PENDING_LIMIT):
+        self.interval = interval_ms / 1000.0
+        self.batch = batch
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # one writer at a time keeps rows in order
+        self._pending = deque()
+        self._wake = threading.Event()
+        self._thread = None
+        self.stats = {"queued": 0, "written": 0, "flushes": 0, "failed_flushes": 0, "dropped": 0}
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="beatsync-chat-writer", daemon=True)
+            self._thread.start()
+
+    def add(self, message_id, user, message, timestamp):
+        """Queue one chat row (id from next_chat_id) for the next batch"""
+        with self._lock:
+            self._start()
+            full = len(self._pending) >= self.limit
+        if full:
+            # Bounded memory: the sender pays for the backlog
+            self.flush()
+        with self._lock:
+            self._pending.append({"id": message_id, "user": user, "message": message, "timestamp": timestamp})
+            self.stats["queued"] += 1
+            if len(self._pending) >= self.batch:
+                self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write every pending row in one INSERT; returns how many were written"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                rows = list(self._pending)
+                self._pending.clear()
+            try:
+                with get_db() as db:
+                    db.execute(insert(ChatMessage), rows)
+            except Exception as e:
+                print(f"Chat write-behind flush of {len(rows)} messages failed: {e}")
+                written, failed, reachable = self._write_rows(rows)
+                with self._lock:
+                    self.stats["failed_flushes"] += 1
+                    self.stats["written"] += written
+                    if reachable:
+                        # The database is up, so the rows that still failed are bad
+                        # and would fail every later batch too: drop them
+                        self.stats["dropped"] += len(failed)
+                        for row in failed:
+                            print(f"Dropped chat message from {row.get('user')!r} that can't be saved")
+                    else:
+                        # The database is down: keep them for the next
+                        # attempt, oldest first, within the limit
+                        # (guarded: failed[-0:] would be every row, not none)
+                        keep = self.limit - len(self._pending)
+                        if keep > 0:
+                            self._pending.extendleft(reversed(failed[-keep:]))
+                return written
+            with self._lock:
+                self.stats["written"] += len(rows)
+                self.stats["flushes"] += 1
+            return len(rows)
+
+    def _write_rows(self, rows):
+        """Insert rows one at a time after a failed batch; returns
+        (written, failed rows, whether the database answered).
+
+        Nothing is tried if the database doesn't answer at all, so an outage
+        doesn't cost one failed round trip per row.
+        """
+        try:
+            with get_db() as db:
+                db.execute(text("SELECT 1"))
+        except Exception:
+            return 0, rows, False
+        written = 0
+        failed = []
+        for row in rows:
+            try:
+                with get_db() as db:
+                    db.execute(insert(ChatMessage), [row])
+                written += 1
+            except Exception:
+                failed.append(row)
+        return written, failed, True
+
+    def discard_pending(self):
+        """Drop unwritten rows (the chat is being cleared)"""
+        with self._flush_lock:
+            with self._lock:
+                self._pending.clear()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["pending"] = len(self._pending)
+        return stats
+
+
+_chat_writer = None
+_chat_writer_lock = threading.Lock()
+
+
+def get_chat_writer():
+    """Get the process-wide chat writer; pending rows are flushed at exit"""
+    global _chat_writer
+    if _chat_writer is None:
+        with _chat_writer_lock:
+            if _chat_writer is None:
+                _chat_writer = ChatWriteBehind()
+                atexit.register(_chat_writer.flush)
+    return _chat_writer
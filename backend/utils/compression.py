@@ -0,0 +1,133 @@
+"""
+HTTP response compression for BeatSync Mixer.
+JSON responses of at least COMPRESSION_THRESHOLD bytes are compressed with
+brotli (when the brotli package is installed) or gzip, whichever the client
+accepts. Routes whose payload only changes with a version (a queue snapshot,
+a cached page of playlist tracks) answer with versioned_json_response(): the
+serialized body and each compressed encoding are cached under that version,
+so a payload that many clients fetch unchanged is serialized and compressed
+once rather than once per request. Other responses are compressed per request.
+Socket.IO traffic is compressed by Engine.IO itself, with its defaults.
+"""
+
+import os
+import gzip
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always available
+    brotli = None
+
+
+COMPRESSION_THRESHOLD = int(os.getenv("COMPRESSION_THRESHOLD", "1024"))
+COMPRESSION_CACHE_SIZE = int(os.getenv("COMPRESSION_CACHE_SIZE", "256"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_MIMETYPES = {"application/json"}
+
+# {version key: {None: JSON body, encoding: compressed body}}, least recently used first
+response_cache = OrderedDict()
+response_cache_lock = threading.Lock()
+
+
+def choose_encoding(accept_encoding):
+    """The best encoding we support from an Accept-Encoding header, or None"""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = params.replace(" ", "")
+        if quality.startswith("q=") and quality[2:] in ("0", "0.0", "0.00", "0.000"):
+            continue
+        accepted.add(name)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    """Compress body (bytes) with encoding"""
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _cached_body(key, encoding, make):
+    """The body cached for (key, encoding), made and cached on a miss"""
+    with response_cache_lock:
+        entry = response_cache.get(key)
+        if entry is not None and encoding in entry:
+            response_cache.move_to_end(key)
+            return entry[encoding]
+
+    body = make()
+
+    with response_cache_lock:
+        response_cache.setdefault(key, {})[encoding] = body
+        response_cache.move_to_end(key)
+        while len(response_cache) > COMPRESSION_CACHE_SIZE:
+            response_cache.popitem(last=False)
+    return body
+
+
+def versioned_json_response(key, build):
+    """JSON response for build()'s payload, which only changes when key does.
+
+    key identifies the version (e.g. ("queue", 42)); on a cache hit build()
+    isn't called and nothing is serialized or compressed again.
+    """
+    from flask import current_app, jsonify
+
+    body = _cached_body(key, None, lambda: jsonify(build()).get_data())
+    response = current_app.response_class(body, mimetype="application/json")
+    response.compression_key = key
+    return response
+
+
+def compress_response(response, accept_encoding):
+    """Compress a Flask response in place if it is large enough JSON"""
+    response.vary.add("Accept-Encoding")
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    encoding = choose_encoding(accept_encoding)
+    if encoding is None:
+        return response
+
+    body = response.get_data()
+    if len(body) < COMPRESSION_THRESHOLD:
+        return response
+
+    key = getattr(response, "compression_key", None)
+    try:
+        if key is None:
+            response.set_data(compress(body, encoding))
+        else:
+            response.set_data(_cached_body(key, encoding, lambda: compress(body, encoding)))
+    except Exception as e:
+        print(f"Response compression failed ({encoding}): {e}")
+        return response
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_compression(app):
+    """Compress the app's JSON responses"""
+    from flask import request
+
+    @app.after_request
+    def compress_json_response(response):
+        return compress_response(response, request.headers.get("Accept-Encoding", ""))
+
+    print(f"Response compression enabled (threshold {COMPRESSION_THRESHOLD} bytes, {'br, ' if brotli else ''}gzip)")
+
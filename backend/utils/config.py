@@ -6,6 +6,7 @@ Handles app configuration, session storage, and cache initialization.
 import os
 import redis
 import ssl
+import threading
 from flask_session import Session
 from flask_caching import Cache
 from dotenv import load_dotenv
@@ -70,7 +71,8 @@ class ManualRedisCache:
         self.flask_cache = flask_cache
         self.manual_client = create_manual_redis_client()
         self.use_manual = self.manual_client is not None
-        
+        self._incr_lock = threading.Lock()
+
         if self.use_manual:
             print("Using manual Redis client for caching")
         else:
@@ -109,6 +111,17 @@ class ManualRedisCache:
         else:
             return self.flask_cache.delete(key)
 
+    def incr(self, key, delta=1):
+        """Atomically increment an integer key (Redis INCRBY, Flask-Caching inc as fallback)"""
+        if self.use_manual:
+            try:
+                return int(self.manual_client.incrby(key, delta))
+            except Exception as e:
+                print(f"Manual Redis incr failed for key: {key} - {e}, falling back to Flask-Caching")
+        # Flask-Caching's inc is a get/set pair, so serialize it within this process
+        with self._incr_lock:
+            return int(self.flask_cache.cache.inc(key, delta) or 0)
+
 
 def configure_session_storage(app):
     """Configure session storage with fallback for Redis failures"""
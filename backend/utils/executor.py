@@ -0,0 +1,144 @@
+"""
+Background task pools for BeatSync Mixer.
+Work that shouldn't block a request or socket event runs on a small set of
+named, bounded thread pools instead of a new thread per task:
+- initial_sync: initial_state for newly connected clients
+- cache_write: write-behind cache updates
+- prefetch: background Spotify fetches/caching
+- chat: chat messages and history, kept apart from queue/playback work
+Each pool caps how many tasks may wait; past that, new tasks are dropped
+(load shedding) rather than piling up during a reconnect storm. Every pool
+tracks queue wait and run time for the /metrics endpoint.
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+# {pool name: (worker threads, max waiting tasks)}
+POOL_SIZES = {
+    "initial_sync": (4, 500),
+    "cache_write": (2, 200),
+    "prefetch": (2, 20),
+    "chat": (2, 200),
+}
+
+
+class BoundedPool:
+    """A named thread pool that sheds tasks once too many are waiting"""
+
+    def __init__(self, name, workers, max_queued):
+        self.name = name
+        self.workers = workers
+        self.max_queued = max_queued
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"beatsync-{name}")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "run_seconds_total": 0.0,
+            "run_seconds_max": 0.0,
+        }
+
+    def submit(self, fn, *args, app=None, **kwargs):
+        """Queue fn(*args, **kwargs), inside app's context if given.
+
+        Returns the Future, or None if the task was shed because the pool's
+        queue is full.
+        """
+        with self._lock:
+            if self._queued >= self.max_queued:
+                self._stats["rejected"] += 1
+                print(f"Executor {self.name}: queue full ({self._queued} waiting), dropping {getattr(fn, '__name__', 'task')}")
+                return None
+            self._queued += 1
+            self._stats["submitted"] += 1
+
+        enqueued_at = time.monotonic()
+
+        def run():
+            started_at = time.monotonic()
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+            failed = False
+            try:
+                if app is not None:
+                    with app.app_context():
+                        return fn(*args, **kwargs)
+                return fn(*args, **kwargs)
+            except Exception as e:
+                failed = True
+                print(f"Executor {self.name}: {getattr(fn, '__name__', 'task')} failed: {e}")
+            finally:
+                finished_at = time.monotonic()
+                self._record(started_at - enqueued_at, finished_at - started_at, failed)
+
+        try:
+            return self._executor.submit(run)
+        except RuntimeError as e:
+            # Interpreter shutting down
+            with self._lock:
+                self._queued -= 1
+            print(f"Executor {self.name}: could not submit task: {e}")
+            return None
+
+    def _record(self, wait, run_time, failed):
+        with self._lock:
+            self._running -= 1
+            stats = self._stats
+            stats["failed" if failed else "completed"] += 1
+            stats["wait_seconds_total"] += wait
+            stats["wait_seconds_max"] = max(stats["wait_seconds_max"], wait)
+            stats["run_seconds_total"] += run_time
+            stats["run_seconds_max"] = max(stats["run_seconds_max"], run_time)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                "workers": self.workers,
+                "max_queued": self.max_queued,
+                "queued": self._queued,
+                "running": self._running,
+            })
+        finished = stats["completed"] + stats["failed"]
+        stats["wait_seconds_avg"] = stats["wait_seconds_total"] / finished if finished else 0.0
+        stats["run_seconds_avg"] = stats["run_seconds_total"] / finished if finished else 0.0
+        return stats
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name):
+    """Get the named pool, creating it on first use"""
+    pool = _pools.get(name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                workers, max_queued = POOL_SIZES[name]
+                pool = BoundedPool(name, workers, max_queued)
+                _pools[name] = pool
+    return pool
+
+
+def submit_task(pool_name, fn, *args, app=None, **kwargs):
+    """Run fn in the background on the named pool (None if the task was shed)"""
+    return get_pool(pool_name).submit(fn, *args, app=app, **kwargs)
+
+
+def get_executor_stats():
+    """Stats for every pool that has been used"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {pool.name: pool.stats() for pool in pools}
@@ -0,0 +1,146 @@
+"""
+Host lease for BeatSync Mixer.
+The host record lives in the shared state store as a lease: it expires after
+HOST_LEASE_TTL seconds unless the host's socket heartbeat renews it, and it is
+only ever taken with compare-and-set, so takeover is atomic across workers.
+Each worker answers host lookups from an in-memory copy that is refreshed by
+change notifications pushed through the state store.
+"""
+
+import os
+import time
+import threading
+from backend.state_store import get_state_store
+
+
+HOST_KEY = "host"
+HOST_CHANNEL = "host_changed"
+HOST_LEASE_TTL = int(os.getenv("HOST_LEASE_TTL", "120"))
+
+# Safety net in case a change notification is missed
+HOST_CACHE_SECONDS = 30
+
+_host_cache = {'host': None, 'loaded_at': 0, 'subscribed': False}
+_host_cache_lock = threading.Lock()
+
+
+def _lease_record(user_id, display_name):
+    return {
+        "user_id": user_id,
+        "display_name": display_name,
+        "expires_at": time.time() + HOST_LEASE_TTL
+    }
+
+
+def _cache_host(host):
+    with _host_cache_lock:
+        _host_cache['host'] = host
+        _host_cache['loaded_at'] = time.time()
+
+
+def _ensure_subscribed(store):
+    """Listen for host changes made by other workers (once per process)"""
+    with _host_cache_lock:
+        if _host_cache['subscribed']:
+            return
+        _host_cache['subscribed'] = True
+    try:
+        store.subscribe(HOST_CHANNEL, _cache_host)
+    except Exception as e:
+        print(f"Failed to subscribe to host changes: {e}")
+
+
+def _host_changed(store, host):
+    """Update this worker's copy and push the change to the others"""
+    _cache_host(host)
+    try:
+        store.publish(HOST_CHANNEL, host)
+    except Exception as e:
+        print(f"Failed to publish host change: {e}")
+
+
+def get_current_host():
+    """The current host as {"user_id", "display_name", "expires_at"}, or None"""
+    try:
+        store = get_state_store()
+        _ensure_subscribed(store)
+
+        now = time.time()
+        with _host_cache_lock:
+            host = _host_cache['host']
+            fresh = now - _host_cache['loaded_at'] < HOST_CACHE_SECONDS
+        if fresh:
+            return dict(host) if host and host["expires_at"] > now else None
+
+        host = store.get(HOST_KEY)
+        _cache_host(host)
+        return dict(host) if host else None
+    except Exception as e:
+        print(f"Failed to read current host: {e}")
+        return None
+
+
+def is_current_host(user_id):
+    """Whether user_id holds the host lease; a host session that lost it is no longer host"""
+    host = get_current_host()
+    return bool(host and user_id is not None and host["user_id"] == user_id)
+
+
+def claim_host(user_id, display_name):
+    """Take (or renew) the host lease, returning True on success.
+
+    Succeeds when nobody is hosting, the previous lease has expired, or the
+    lease already belongs to user_id.
+    """
+    store = get_state_store()
+    current = store.get(HOST_KEY)
+    if current and current["user_id"] != user_id:
+        return False
+
+    record = _lease_record(user_id, display_name)
+    if not store.compare_and_set(HOST_KEY, current, record, ttl=HOST_LEASE_TTL):
+        return False
+
+    _host_changed(store, record)
+    return True
+
+
+def renew_host(user_id, display_name):
+    """Heartbeat from the host: extend the lease, re-taking it if it lapsed"""
+    try:
+        return claim_host(user_id, display_name)
+    except Exception as e:
+        print(f"Failed to renew host lease: {e}")
+        return False
+
+
+def update_host(previous_user_id, user_id, display_name):
+    """Refresh the host details (e.g. after the profile loads) if previous_user_id holds the lease"""
+    store = get_state_store()
+    current = store.get(HOST_KEY)
+    if not current or current["user_id"] != previous_user_id:
+        return False
+
+    record = _lease_record(user_id, display_name)
+    if not store.compare_and_set(HOST_KEY, current, record, ttl=HOST_LEASE_TTL):
+        return False
+
+    _host_changed(store, record)
+    return True
+
+
+def clear_host(user_id=None):
+    """Release the host lease - only if user_id holds it, when given"""
+    try:
+        store = get_state_store()
+        if user_id is None:
+            store.delete(HOST_KEY)
+        else:
+            current = store.get(HOST_KEY)
+            if not current or current["user_id"] != user_id:
+                return
+            if not store.compare_and_delete(HOST_KEY, current):
+                return
+        _host_changed(store, None)
+    except Exception as e:
+        print(f"Failed to clear current host: {e}")
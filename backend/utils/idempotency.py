@@ -0,0 +1,123 @@
+"""
+Client operation dedupe store for BeatSync Mixer.
+Remembers the result of recent writes keyed by a client-supplied operation ID
+so socket retries and reconnects replay the original result instead of
+writing again. Uses a bounded in-memory LRU plus Redis keys with a TTL.
+"""
+
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from backend.utils.cache import get_redis_client
+
+
+# How long an operation ID is remembered (seconds)
+OPERATION_TTL = int(os.getenv("OPERATION_DEDUPE_TTL", 300))
+
+# Maximum number of operation IDs kept in process memory
+OPERATION_LRU_SIZE = 4096
+
+PENDING = "__pending__"
+
+_recent_operations = OrderedDict()  # {key: (expires_at, result)}
+_operations_lock = threading.Lock()
+
+
+def _operation_key(scope, operation_id):
+    return f"op:{scope}:{operation_id}"
+
+
+def _remember_locally(key, result):
+    with _operations_lock:
+        _recent_operations[key] = (time.time() + OPERATION_TTL, result)
+        _recent_operations.move_to_end(key)
+        while len(_recent_operations) > OPERATION_LRU_SIZE:
+            _recent_operations.popitem(last=False)
+
+
+def _lookup_locally(key):
+    with _operations_lock:
+        entry = _recent_operations.get(key)
+        if not entry:
+            return None
+        expires_at, result = entry
+        if expires_at < time.time():
+            del _recent_operations[key]
+            return None
+        _recent_operations.move_to_end(key)
+        return result
+
+
+def claim_operation(scope, operation_id, app=None):
+    """Claim an operation ID before applying a write.
+    
+    Returns (claimed, previous_result). When claimed is False the operation was
+    already seen: previous_result holds its stored result, or None if the first
+    attempt is still in flight.
+    """
+    if not operation_id:
+        return True, None
+    
+    key = _operation_key(scope, operation_id)
+    
+    previous = _lookup_locally(key)
+    if previous is not None:
+        return False, None if previous == PENDING else previous
+    
+    client = get_redis_client(app)
+    if client:
+        try:
+            # SET NX makes the claim atomic across workers
+            if client.set(key, PENDING, nx=True, ex=OPERATION_TTL):
+                _remember_locally(key, PENDING)
+                return True, None
+            
+            stored = client.get(key)
+            if stored and stored != PENDING:
+                result = json.loads(stored)
+                _remember_locally(key, result)
+                return False, result
+            return False, None
+        except Exception as e:
+            print(f"Redis operation claim failed for {key}: {e}, using in-memory dedupe only")
+    
+    with _operations_lock:
+        if key in _recent_operations:
+            return False, None
+        _recent_operations[key] = (time.time() + OPERATION_TTL, PENDING)
+    return True, None
+
+
+def complete_operation(scope, operation_id, result, app=None):
+    """Store the result of a claimed operation so replays can return it"""
+    if not operation_id:
+        return
+    
+    key = _operation_key(scope, operation_id)
+    _remember_locally(key, result)
+    
+    client = get_redis_client(app)
+    if client:
+        try:
+            client.set(key, json.dumps(result), ex=OPERATION_TTL)
+        except Exception as e:
+            print(f"Redis operation store failed for {key}: {e}")
+
+
+def release_operation(scope, operation_id, app=None):
+    """Forget a claimed operation whose write failed so the client can retry it"""
+    if not operation_id:
+        return
+    
+    key = _operation_key(scope, operation_id)
+    with _operations_lock:
+        _recent_operations.pop(key, None)
+    
+    client = get_redis_client(app)
+    if client:
+        try:
+            client.delete(key)
+        except Exception as e:
+            print(f"Redis operation release failed for {key}: {e}")
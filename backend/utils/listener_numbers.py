@@ -0,0 +1,178 @@
+"""
+Listener numbering for BeatSync Mixer.
+Hands each connected listener the smallest free number ("Listener 3") in
+O(log n): freed numbers go on a min-heap (in-process) or a sorted set (Redis),
+and new numbers come from a counter once the free-list is empty.
+Every assignment is a lease renewed by the client's socket heartbeat, so
+numbers held by connections that dropped without a disconnect event (a worker
+crash, a lost node) are reclaimed after LISTENER_LEASE_TTL seconds.
+"""
+
+import os
+import time
+import heapq
+import threading
+from backend.state_store import get_state_store, RedisStateStore
+
+
+LISTENER_LEASE_TTL = int(os.getenv("LISTENER_LEASE_TTL", "90"))
+
+# Shared by the Redis scripts: move every expired lease's number to the free-list
+_REAP_EXPIRED = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[4], '-inf', ARGV[2])
+for _, sid in ipairs(expired) do
+  local number = redis.call('HGET', KEYS[3], sid)
+  if number then
+    redis.call('ZADD', KEYS[1], number, number)
+    redis.call('HDEL', KEYS[3], sid)
+  end
+  redis.call('ZREM', KEYS[4], sid)
+end
+"""
+
+# KEYS: free zset, next counter, owners hash, leases zset
+# ARGV: sid, now ms, lease expiry ms
+ASSIGN_SCRIPT = _REAP_EXPIRED + """
+local number = redis.call('HGET', KEYS[3], ARGV[1])
+if not number then
+  local freed = redis.call('ZPOPMIN', KEYS[1])
+  if freed[1] then
+    number = freed[1]
+  else
+    number = redis.call('INCR', KEYS[2])
+  end
+  redis.call('HSET', KEYS[3], ARGV[1], number)
+end
+redis.call('ZADD', KEYS[4], ARGV[3], ARGV[1])
+return tonumber(number)
+"""
+
+# KEYS: free zset, owners hash, leases zset  ARGV: sid
+RELEASE_SCRIPT = """
+local number = redis.call('HGET', KEYS[2], ARGV[1])
+redis.call('ZREM', KEYS[3], ARGV[1])
+if not number then
+  return false
+end
+redis.call('HDEL', KEYS[2], ARGV[1])
+redis.call('ZADD', KEYS[1], number, number)
+return tonumber(number)
+"""
+
+# KEYS: free zset, next counter, owners hash, leases zset
+# ARGV: sid, now ms, lease expiry ms
+RENEW_SCRIPT = _REAP_EXPIRED + """
+if not redis.call('HGET', KEYS[3], ARGV[1]) then
+  return 0
+end
+redis.call('ZADD', KEYS[4], ARGV[3], ARGV[1])
+return 1
+"""
+
+
+class InMemoryListenerNumbers:
+    """Listener numbers for a single worker: a free-list heap plus lease expiries"""
+
+    def __init__(self, ttl=LISTENER_LEASE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._free = []  # min-heap of released numbers
+        self._next = 1
+        self._owners = {}  # {sid: number}
+        self._expires = {}  # {sid: expires_at}
+        self._expiry_heap = []  # (expires_at, sid); stale entries are skipped
+
+    def _free_number(self, sid):
+        number = self._owners.pop(sid, None)
+        self._expires.pop(sid, None)
+        if number is not None:
+            heapq.heappush(self._free, number)
+        return number
+
+    def _reap_expired(self, now):
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, sid = heapq.heappop(self._expiry_heap)
+            if self._expires.get(sid) == expires_at:
+                self._free_number(sid)
+
+    def _extend(self, sid, now):
+        expires_at = now + self.ttl
+        self._expires[sid] = expires_at
+        heapq.heappush(self._expiry_heap, (expires_at, sid))
+
+    def assign(self, sid):
+        now = time.time()
+        with self._lock:
+            self._reap_expired(now)
+            number = self._owners.get(sid)
+            if number is None:
+                if self._free:
+                    number = heapq.heappop(self._free)
+                else:
+                    number = self._next
+                    self._next += 1
+                self._owners[sid] = number
+            self._extend(sid, now)
+            return number
+
+    def release(self, sid):
+        with self._lock:
+            return self._free_number(sid)
+
+    def renew(self, sid):
+        now = time.time()
+        with self._lock:
+            self._reap_expired(now)
+            if sid not in self._owners:
+                return False
+            self._extend(sid, now)
+            return True
+
+
+class RedisListenerNumbers:
+    """Listener numbers shared by every worker; each operation is one Lua script"""
+
+    def __init__(self, client, prefix="beatsync:state:", ttl=LISTENER_LEASE_TTL):
+        self.client = client
+        self.ttl = ttl
+        self.free_key = prefix + "listener_numbers:free"
+        self.next_key = prefix + "listener_numbers:next"
+        self.owners_key = prefix + "listener_numbers:owners"
+        self.leases_key = prefix + "listener_numbers:leases"
+        self._assign = client.register_script(ASSIGN_SCRIPT)
+        self._release = client.register_script(RELEASE_SCRIPT)
+        self._renew = client.register_script(RENEW_SCRIPT)
+
+    def _lease_args(self, sid):
+        now_ms = int(time.time() * 1000)
+        return [sid, now_ms, now_ms + self.ttl * 1000]
+
+    def assign(self, sid):
+        keys = [self.free_key, self.next_key, self.owners_key, self.leases_key]
+        return int(self._assign(keys=keys, args=self._lease_args(sid)))
+
+    def release(self, sid):
+        number = self._release(keys=[self.free_key, self.owners_key, self.leases_key], args=[sid])
+        return int(number) if number is not None else None
+
+    def renew(self, sid):
+        keys = [self.free_key, self.next_key, self.owners_key, self.leases_key]
+        return bool(self._renew(keys=keys, args=self._lease_args(sid)))
+
+
+_listener_numbers = None
+_listener_numbers_lock = threading.Lock()
+
+
+def get_listener_numbers():
+    """Get the process-wide allocator, backed by the same store as the shared state"""
+    global _listener_numbers
+    if _listener_numbers is None:
+        with _listener_numbers_lock:
+            if _listener_numbers is None:
+                store = get_state_store()
+                if isinstance(store, RedisStateStore):
+                    _listener_numbers = RedisListenerNumbers(store.client, store.prefix)
+                else:
+                    _listener_numbers = InMemoryListenerNumbers()
+    return _listener_numbers
@@ -0,0 +1,113 @@
+"""
+Lease locks for BeatSync Mixer.
+A lease is a lock with an expiry, so a crashed worker can't hold it forever.
+Uses Redis SET NX PX across workers, with an in-process fallback when Redis
+isn't available. Every acquisition gets a fencing token: an increasing number,
+never below the current time in milliseconds so tokens from the Redis counter
+and the in-process fallback stay comparable. Stores that accept a token (see
+QueueStore.remove_track) reject writes carrying one older than a token they
+have already seen, so a holder whose lease expired can't overwrite its successor.
+"""
+
+import time
+import threading
+from backend.utils.cache import get_redis_client
+
+
+# Release only if we still hold the lease; a positive hold_ms keeps the key
+# alive that much longer instead of deleting it (used for debounce windows)
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+local hold_ms = tonumber(ARGV[2])
+if hold_ms > 0 then
+    redis.call('PEXPIRE', KEYS[1], hold_ms)
+else
+    redis.call('DEL', KEYS[1])
+end
+return 1
+"""
+
+# KEYS: fence counter  ARGV: now in ms
+NEXT_FENCE_SCRIPT = """
+local token = math.max(tonumber(redis.call('GET', KEYS[1]) or '0') + 1, tonumber(ARGV[1]))
+redis.call('SET', KEYS[1], string.format('%d', token))
+return token
+"""
+
+_local_leases = {}  # {name: (token, expires_at)}
+_local_leases_lock = threading.Lock()
+_local_fence = {"last": 0}
+
+
+def _lease_key(name):
+    return f"lease:{name}"
+
+
+def _fence_key(name):
+    return f"lease:{name}:fence"
+
+
+def acquire_lease(name, ttl_ms, app=None):
+    """Try to take the named lease for ttl_ms milliseconds.
+
+    Returns the fencing token (an int) on success, or None if someone else
+    holds the lease. Never blocks.
+    """
+    now = time.time()
+    client = get_redis_client(app)
+    if client:
+        try:
+            token = int(client.eval(NEXT_FENCE_SCRIPT, 1, _fence_key(name), int(now * 1000)))
+            if client.set(_lease_key(name), token, nx=True, px=ttl_ms):
+                return token
+            return None
+        except Exception as e:
+            print(f"Redis lease acquire failed for {name}: {e}, using in-process lease")
+
+    with _local_leases_lock:
+        held = _local_leases.get(name)
+        if held and held[1] > now:
+            return None
+        token = _local_fence["last"] = max(_local_fence["last"] + 1, int(now * 1000))
+        _local_leases[name] = (token, now + ttl_ms / 1000)
+        return token
+
+
+def lease_is_current(name, token, app=None):
+    """Check that token still holds the named lease (it hasn't expired or been taken over)"""
+    client = get_redis_client(app)
+    if client:
+        try:
+            return client.get(_lease_key(name)) == str(token)
+        except Exception as e:
+            print(f"Redis lease check failed for {name}: {e}, using in-process lease")
+
+    with _local_leases_lock:
+        held = _local_leases.get(name)
+        return bool(held and held[0] == token and held[1] > time.time())
+
+
+def release_lease(name, token, hold_ms=0, app=None):
+    """Release the named lease if token still holds it.
+
+    With hold_ms > 0 the lease is kept for that many more milliseconds instead
+    of being dropped, so nobody can take it again until then.
+    """
+    client = get_redis_client(app)
+    if client:
+        try:
+            return bool(client.eval(RELEASE_SCRIPT, 1, _lease_key(name), token, int(hold_ms)))
+        except Exception as e:
+            print(f"Redis lease release failed for {name}: {e}, using in-process lease")
+
+    with _local_leases_lock:
+        held = _local_leases.get(name)
+        if not held or held[0] != token:
+            return False
+        if hold_ms > 0:
+            _local_leases[name] = (token, time.time() + hold_ms / 1000)
+        else:
+            del _local_leases[name]
+        return True
@@ -0,0 +1,214 @@
+"""
+Presence tracking for BeatSync Mixer.
+Every connected socket is present under its role until it disconnects or
+stops sending heartbeats for PRESENCE_TTL seconds. Counts per role are O(1):
+kept as counters in process memory, or read with ZCARD from one Redis sorted
+set per role (member sid, score last-seen) when the state store is Redis, so
+they cover every worker. Stale sids are expired as part of each update.
+
+Changes are announced with a presence_updated event at most once every
+PRESENCE_BROADCAST_INTERVAL seconds, and only when the counts moved, instead
+of one message per connect or disconnect. With Redis the interval and the
+last announced counts are shared, so one worker announces for all of them.
+"""
+
+import os
+import json
+import time
+import heapq
+import threading
+from backend.state_store import get_state_store, RedisStateStore
+from backend.utils.serialization import encode_payload
+
+
+PRESENCE_TTL = int(os.getenv("PRESENCE_TTL", "90"))
+PRESENCE_BROADCAST_INTERVAL = float(os.getenv("PRESENCE_BROADCAST_INTERVAL", "2"))
+PRESENCE_ROLES = ("host", "listener", "guest")
+
+# claim_broadcast() results
+BROADCAST_UNCHANGED = 0
+BROADCAST_CLAIMED = 1
+BROADCAST_THROTTLED = -1
+
+# KEYS: last announced counts, broadcast throttle  ARGV: counts JSON, interval ms, counts ttl ms
+CLAIM_BROADCAST_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return 0
+end
+if not redis.call('SET', KEYS[2], '1', 'NX', 'PX', ARGV[2]) then
+  return -1
+end
+redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[3])
+return 1
+"""
+
+
+class InMemoryPresence:
+    """Presence for a single worker: per-role counters plus an expiry heap"""
+
+    def __init__(self, ttl=PRESENCE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._members = {}  # {sid: (role, expires_at)}
+        self._counts = {role: 0 for role in PRESENCE_ROLES}
+        self._expiry_heap = []  # (expires_at, sid); stale entries are skipped
+        self._last_broadcast = None
+
+    def _remove(self, sid):
+        member = self._members.pop(sid, None)
+        if member is not None:
+            self._counts[member[0]] -= 1
+        return member is not None
+
+    def _reap_expired(self, now):
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, sid = heapq.heappop(self._expiry_heap)
+            member = self._members.get(sid)
+            if member is not None and member[1] == expires_at:
+                self._remove(sid)
+
+    def _set(self, sid, role, now):
+        expires_at = now + self.ttl
+        self._members[sid] = (role, expires_at)
+        heapq.heappush(self._expiry_heap, (expires_at, sid))
+
+    def join(self, sid, role):
+        now = time.time()
+        with self._lock:
+            self._reap_expired(now)
+            self._remove(sid)
+            self._counts[role] = self._counts.get(role, 0) + 1
+            self._set(sid, role, now)
+
+    def touch(self, sid, role):
+        """Refresh a heartbeat; False if the sid had already expired"""
+        now = time.time()
+        with self._lock:
+            self._reap_expired(now)
+            if sid not in self._members:
+                return False
+            self._set(sid, self._members[sid][0], now)
+            return True
+
+    def leave(self, sid, role):
+        with self._lock:
+            return self._remove(sid)
+
+    def counts(self):
+        with self._lock:
+            self._reap_expired(time.time())
+            counts = dict(self._counts)
+        counts["total"] = sum(counts.values())
+        return counts
+
+    def claim_broadcast(self, counts):
+        """Whether these counts still need announcing; the caller already throttles"""
+        with self._lock:
+            if counts == self._last_broadcast:
+                return BROADCAST_UNCHANGED
+            self._last_broadcast = counts
+            return BROADCAST_CLAIMED
+
+
+class RedisPresence:
+    """Presence shared by every worker: one sorted set of sids by last-seen per role"""
+
+    def __init__(self, client, prefix="beatsync:state:", ttl=PRESENCE_TTL):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix + "presence:"
+        self._claim_broadcast = client.register_script(CLAIM_BROADCAST_SCRIPT)
+
+    def _key(self, role):
+        return self.prefix + role
+
+    def join(self, sid, role):
+        pipe = self.client.pipeline()
+        for other in PRESENCE_ROLES:
+            if other != role:
+                pipe.zrem(self._key(other), sid)
+        pipe.zadd(self._key(role), {sid: time.time()})
+        pipe.execute()
+
+    def touch(self, sid, role):
+        # XX: only refresh a sid that hasn't been expired; CH counts the update
+        return bool(self.client.zadd(self._key(role), {sid: time.time()}, xx=True, ch=True))
+
+    def leave(self, sid, role):
+        return bool(self.client.zrem(self._key(role), sid))
+
+    def counts(self):
+        cutoff = time.time() - self.ttl
+        pipe = self.client.pipeline()
+        for role in PRESENCE_ROLES:
+            pipe.zremrangebyscore(self._key(role), "-inf", cutoff)
+            pipe.zcard(self._key(role))
+        results = pipe.execute()
+        counts = {role: int(results[index * 2 + 1]) for index, role in enumerate(PRESENCE_ROLES)}
+        counts["total"] = sum(counts.values())
+        return counts
+
+    def claim_broadcast(self, counts):
+        """Claim the cluster-wide broadcast window for these counts.
+
+        Unchanged if they match the counts last announced by any worker,
+        throttled if another worker announced within the interval.
+        """
+        return int(self._claim_broadcast(
+            keys=[self.prefix + "last_broadcast", self.prefix + "broadcast_throttle"],
+            args=[
+                json.dumps(counts, sort_keys=True),
+                max(1, int(PRESENCE_BROADCAST_INTERVAL * 1000)),
+                self.ttl * 1000,
+            ],
+        ))
+
+
+_presence = None
+_presence_lock = threading.Lock()
+
+
+def get_presence():
+    """Get the process-wide presence tracker, backed by the same store as the shared state"""
+    global _presence
+    if _presence is None:
+        with _presence_lock:
+            if _presence is None:
+                store = get_state_store()
+                if isinstance(store, RedisStateStore):
+                    _presence = RedisPresence(store.client, store.prefix)
+                else:
+                    _presence = InMemoryPresence()
+    return _presence
+
+
+_broadcast_lock = threading.Lock()
+_broadcast_pending = False
+
+
+def schedule_presence_broadcast(socketio):
+    """Announce the current counts within PRESENCE_BROADCAST_INTERVAL (one pending send at a time)"""
+    global _broadcast_pending
+    with _broadcast_lock:
+        if _broadcast_pending:
+            return
+        _broadcast_pending = True
+    socketio.start_background_task(_broadcast_presence, socketio)
+
+
+def _broadcast_presence(socketio):
+    global _broadcast_pending
+    socketio.sleep(PRESENCE_BROADCAST_INTERVAL)
+    with _broadcast_lock:
+        _broadcast_pending = False
+    try:
+        presence = get_presence()
+        counts = presence.counts()
+        claim = presence.claim_broadcast(counts)
+        if claim == BROADCAST_THROTTLED:
+            # Another worker just announced; check again once its window passes
+            schedule_presence_broadcast(socketio)
+        elif claim == BROADCAST_CLAIMED:
+            socketio.emit("presence_updated", encode_payload(counts))
+    except Exception as e:
+        print(f"Failed to broadcast presence: {e}")
@@ -0,0 +1,158 @@
+"""
+Per-user rate limiting for BeatSync Mixer's socket events.
+Each user (or connection, for anonymous clients) gets a token bucket per kind
+of event: a bucket holds up to `burst` tokens, refills at `rate` tokens per
+second, and every event spends one. An event that finds the bucket empty is
+rejected before it reaches the database or a broadcast. Buckets live in Redis
+when the shared state store does, so the limit holds across workers, and in
+process memory otherwise.
+
+Limits are "<events per second>,<burst>" strings, e.g. RATE_LIMIT_CHAT=1,5.
+"""
+
+import os
+import time
+import threading
+from backend.state_store import get_state_store, RedisStateStore
+
+
+def _parse_limit(name, default):
+    value = os.getenv(name, default)
+    try:
+        rate, burst = (float(part) for part in value.split(","))
+        if rate > 0 and burst >= 1:
+            return rate, burst
+    except ValueError:
+        pass
+    print(f"Invalid {name} '{value}', using {default}")
+    rate, burst = (float(part) for part in default.split(","))
+    return rate, burst
+
+
+# {limit name: (tokens per second, burst)}
+RATE_LIMITS = {
+    "chat": _parse_limit("RATE_LIMIT_CHAT", "1,5"),
+    "vote": _parse_limit("RATE_LIMIT_VOTE", "5,10"),
+    "queue_add": _parse_limit("RATE_LIMIT_QUEUE_ADD", "1,5"),
+}
+
+# KEYS: bucket hash  ARGV: rate per second, burst, now ms
+TOKEN_BUCKET_SCRIPT = """
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local tokens = tonumber(bucket[1])
+local updated = tonumber(bucket[2])
+if tokens == nil then
+  tokens = burst
+  updated = now
+end
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate / 1000)
+local allowed = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return allowed
+"""
+
+_stats_lock = threading.Lock()
+_rejected = {name: 0 for name in RATE_LIMITS}
+
+
+class InMemoryRateLimiter:
+    """Token buckets for a single worker"""
+
+    PRUNE_EVERY = 1000  # checks between sweeps of idle (full) buckets
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}  # {(limit name, identity): [tokens, updated]}
+        self._checks = 0
+
+    def allow(self, name, identity):
+        rate, burst = RATE_LIMITS[name]
+        now = time.monotonic()
+        key = (name, identity)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [burst, now]
+            else:
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            allowed = bucket[0] >= 1
+            if allowed:
+                bucket[0] -= 1
+
+            self._checks += 1
+            if self._checks >= self.PRUNE_EVERY:
+                self._checks = 0
+                self._prune(now)
+            return allowed
+
+    def _prune(self, now):
+        # A bucket idle long enough to have refilled is the same as no bucket
+        for key, (tokens, updated) in list(self._buckets.items()):
+            rate, burst = RATE_LIMITS[key[0]]
+            if tokens + (now - updated) * rate >= burst:
+                del self._buckets[key]
+
+
+class RedisRateLimiter:
+    """Token buckets shared by every worker; each check is one Lua script call"""
+
+    def __init__(self, client, prefix="beatsync:state:"):
+        self.client = client
+        self.prefix = prefix + "rate:"
+        self._check = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def allow(self, name, identity):
+        rate, burst = RATE_LIMITS[name]
+        now_ms = int(time.time() * 1000)
+        return bool(self._check(keys=[f"{self.prefix}{name}:{identity}"], args=[rate, burst, now_ms]))
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Get the process-wide rate limiter, backed by the same store as the shared state"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                store = get_state_store()
+                if isinstance(store, RedisStateStore):
+                    _rate_limiter = RedisRateLimiter(store.client, store.prefix)
+                else:
+                    _rate_limiter = InMemoryRateLimiter()
+    return _rate_limiter
+
+
+def allow_event(name, identity):
+    """Whether `identity` may send another `name` event now; rejections are counted"""
+    try:
+        allowed = get_rate_limiter().allow(name, identity)
+    except Exception as e:
+        # Limiter unavailable (Redis down): let the event through
+        print(f"Rate limit check failed for {name}: {e}")
+        return True
+    if not allowed:
+        with _stats_lock:
+            _rejected[name] += 1
+    return allowed
+
+
+def get_rate_limit_stats():
+    """Configured limits and rejections so far in this process"""
+    with _stats_lock:
+        rejected = dict(_rejected)
+    return {
+        name: {"rate_per_second": rate, "burst": burst, "rejected": rejected[name]}
+        for name, (rate, burst) in RATE_LIMITS.items()
+    }
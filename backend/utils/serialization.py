@@ -0,0 +1,72 @@
+"""
+JSON encoding for Socket.IO packets in BeatSync Mixer.
+Socket.IO encodes every packet with this module (passed as SocketIO(json=...)).
+It uses orjson when it is installed and the standard library otherwise, and
+it lets a caller encode a payload once with encode_payload() and reuse the
+text: an EncodedJSON argument is spliced into the packet as-is instead of
+being serialized again by every worker that relays it.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+
+class EncodedJSON(str):
+    """Already-serialized JSON text, sent to clients as the value it encodes"""
+
+
+def _dumps(obj):
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj).decode()
+        except TypeError:
+            # Types orjson refuses (e.g. huge ints, non-str keys) - use the stdlib
+            pass
+    return json.dumps(obj, separators=(',', ':'))
+
+
+def _contains_encoded(obj):
+    if isinstance(obj, EncodedJSON):
+        return True
+    if isinstance(obj, (list, tuple)):
+        return any(_contains_encoded(item) for item in obj)
+    if isinstance(obj, dict):
+        return any(_contains_encoded(value) for value in obj.values())
+    return False
+
+
+def _splice(obj):
+    if isinstance(obj, EncodedJSON):
+        return str(obj)
+    if not _contains_encoded(obj):
+        return _dumps(obj)
+    if isinstance(obj, dict):
+        return "{" + ",".join(_dumps(str(key)) + ":" + _splice(value) for key, value in obj.items()) + "}"
+    return "[" + ",".join(_splice(item) for item in obj) + "]"
+
+
+def dumps(obj, **kwargs):
+    """Serialize obj, splicing in EncodedJSON values verbatim at any depth.
+
+    Packet arguments are a list of them; a message queue publishes the
+    arguments nested inside its own {"method": "emit", "data": [...]} message.
+    """
+    return _splice(obj)
+
+
+def loads(text, **kwargs):
+    if orjson is not None:
+        # orjson only takes exact str/bytes, not EncodedJSON
+        return orjson.loads(str(text) if isinstance(text, str) else text)
+    return json.loads(text)
+
+
+def encode_payload(data):
+    """Serialize data once for sending to any number of clients"""
+    if isinstance(data, EncodedJSON):
+        return data
+    return EncodedJSON(_dumps(data))
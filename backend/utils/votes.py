@@ -0,0 +1,101 @@
+"""
+Vote recording and counting helpers for BeatSync Mixer.
+Supports the original unlimited mode (one row per click in `votes`) and a
+ledger mode (one upserted row per user and track in `vote_ledger`).
+"""
+
+import os
+from datetime import datetime, timezone
+from sqlalchemy import func
+from backend.models.models import Vote, VoteLedger, dialect_insert
+
+
+# "unlimited" keeps every click as a vote, "ledger" keeps one current vote per user and track
+VOTE_MODE = os.getenv("VOTE_MODE", "unlimited").lower()
+VOTE_MODES = ("unlimited", "ledger")
+
+if VOTE_MODE not in VOTE_MODES:
+    print(f"Unknown VOTE_MODE '{VOTE_MODE}', falling back to 'unlimited'")
+    VOTE_MODE = "unlimited"
+
+
+def get_vote_model():
+    """Model whose rows are counted for the active vote mode"""
+    return VoteLedger if VOTE_MODE == "ledger" else Vote
+
+
+def count_votes(db, track_uris=None):
+    """Get {track_uri: (up_votes, down_votes)} with one grouped query"""
+    model = get_vote_model()
+    query = db.query(model.track_uri, model.vote_type, func.count(model.id))
+    if track_uris is not None:
+        query = query.filter(model.track_uri.in_(list(track_uris)))
+    
+    counts = {}
+    for track_uri, vote_type, count in query.group_by(model.track_uri, model.vote_type).all():
+        up_votes, down_votes = counts.get(track_uri, (0, 0))
+        if vote_type == "up":
+            up_votes = count
+        elif vote_type == "down":
+            down_votes = count
+        counts[track_uri] = (up_votes, down_votes)
+    return counts
+
+
+def get_track_votes(db, track_uri):
+    """Get (up_votes, down_votes) for a single track"""
+    return count_votes(db, [track_uri]).get(track_uri, (0, 0))
+
+
+def cast_vote(db, track_uri, user_id, vote_type):
+    """Record a vote and return the track's updated (up_votes, down_votes)"""
+    if VOTE_MODE != "ledger":
+        db.add(Vote(track_uri=track_uri, vote_type=vote_type, user_id=user_id))
+        db.flush()
+        return get_track_votes(db, track_uri)
+    
+    now = datetime.now(timezone.utc)
+    stmt = dialect_insert(VoteLedger)
+    if stmt is not None:
+        # Repeated clicks update the user's existing row instead of adding new ones
+        stmt = stmt.values(track_uri=track_uri, user_id=user_id, vote_type=vote_type, updated_at=now)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "track_uri"],
+            set_={"vote_type": vote_type, "updated_at": now}
+        )
+        db.execute(stmt)
+    else:
+        entry = db.query(VoteLedger).filter_by(track_uri=track_uri, user_id=user_id).first()
+        if entry:
+            entry.vote_type = vote_type
+            entry.updated_at = now
+        else:
+            db.add(VoteLedger(track_uri=track_uri, user_id=user_id, vote_type=vote_type, updated_at=now))
+        db.flush()
+    
+    return get_track_votes(db, track_uri)
+
+
+def retract_vote(db, track_uri, user_id):
+    """Remove a user's votes on a track and return its updated (up_votes, down_votes)"""
+    model = get_vote_model()
+    if VOTE_MODE == "ledger":
+        db.query(model).filter_by(track_uri=track_uri, user_id=user_id).delete()
+    else:
+        # Unlimited mode has no single current vote, so retract the most recent click
+        latest = db.query(model).filter_by(track_uri=track_uri, user_id=user_id).order_by(model.id.desc()).first()
+        if latest:
+            db.delete(latest)
+    db.flush()
+    return get_track_votes(db, track_uri)
+
+
+def delete_votes(db, track_uri=None):
+    """Delete votes for one track (or every track) from both vote tables"""
+    removed = 0
+    for model in (Vote, VoteLedger):
+        query = db.query(model)
+        if track_uri is not None:
+            query = query.filter(model.track_uri == track_uri)
+        removed += query.delete(synchronize_session=False)
+    return removed
@@ -0,0 +1,213 @@
+"""
+Outbound backpressure for BeatSync Mixer's Socket.IO clients.
+Engine.IO keeps one outbound queue per connection, drained when the client
+polls (or by the WebSocket writer). A client on a bad connection stops
+draining it while vote storms keep broadcasting, so each queue is bounded:
+- Past OUTBOUND_HIGH_WATER queued packets, a state event replaces any older
+  event for the same key still waiting in that client's queue (vote counts per
+  track, playback state), since only the latest value matters.
+- Queue, vote and playback events (default namespace) overtake chat packets
+  (/chat namespace) still waiting in the queue, so a chat flood never delays
+  playback_started or track_removed.
+- At OUTBOUND_MAX_QUEUE packets the client is a persistent laggard: its queued
+  events are dropped and replaced by a single "resync" event, and the client
+  asks for a fresh initial_state instead of working through the backlog.
+Memory per connection therefore never exceeds OUTBOUND_MAX_QUEUE packets,
+and broadcast packets are shared between clients rather than copied.
+"""
+
+import os
+import threading
+from engineio import packet as eio_packet
+from backend.utils.serialization import loads
+
+
+OUTBOUND_HIGH_WATER = int(os.getenv("OUTBOUND_HIGH_WATER", "50"))
+OUTBOUND_MAX_QUEUE = int(os.getenv("OUTBOUND_MAX_QUEUE", "200"))
+
+# {event: (state group, payload field that identifies the item)}; a newer
+# event in the same group with the same field value supersedes an older one
+COLLAPSIBLE_EVENTS = {
+    "vote_updated": ("votes", "track_uri"),
+    "playback_started": ("playback", None),
+    "playback_paused": ("playback", None),
+}
+
+RESYNC_EVENT = "resync"
+
+# Socket.IO EVENT packets in the default namespace look like 2["event",...]
+_EVENT_PREFIX = '2["'
+
+# Events in these namespaces (2/chat,["event",...]) yield to default-namespace events
+LOW_PRIORITY_PREFIXES = ('2/chat,',)
+
+_stats_lock = threading.Lock()
+_stats = {"collapsed": 0, "resyncs": 0, "dropped": 0}
+
+
+def _count(stat, amount=1):
+    with _stats_lock:
+        _stats[stat] += amount
+
+
+def _is_event(pkt):
+    return (pkt is not None and pkt.packet_type == eio_packet.MESSAGE
+            and isinstance(pkt.data, str) and pkt.data.startswith("2"))
+
+
+def _collapse_key(pkt):
+    """(group, item) for a collapsible event packet, else None.
+
+    Broadcast packets are shared by every recipient, so the key is worked out
+    once per packet and kept on it.
+    """
+    try:
+        return pkt.collapse_key
+    except AttributeError:
+        pass
+    key = None
+    if _is_event(pkt) and pkt.data.startswith(_EVENT_PREFIX):
+        event = pkt.data[len(_EVENT_PREFIX):pkt.data.find('"', len(_EVENT_PREFIX))]
+        if event in COLLAPSIBLE_EVENTS:
+            group, field = COLLAPSIBLE_EVENTS[event]
+            item = None
+            if field:
+                try:
+                    args = loads(pkt.data[1:])
+                    item = args[1].get(field) if len(args) > 1 and isinstance(args[1], dict) else None
+                except Exception:
+                    item = None
+            key = (group, item)
+    pkt.collapse_key = key
+    return key
+
+
+def _is_low_priority(pkt):
+    return _is_event(pkt) and pkt.data.startswith(LOW_PRIORITY_PREFIXES)
+
+
+def _is_resync(pkt):
+    return _is_event(pkt) and pkt.data.startswith(_EVENT_PREFIX + RESYNC_EVENT + '"')
+
+
+def make_resync_packet():
+    return eio_packet.Packet(eio_packet.MESSAGE, '2["%s",{}]' % RESYNC_EVENT)
+
+
+class OutboundQueueMixin:
+    """Bounds an Engine.IO socket queue; mixed into the async mode's queue class.
+
+    _put runs for every packet the socket sends (under the queue's mutex for
+    threading queues; eventlet doesn't switch green threads inside it). It may
+    remove packets from the deque, keeping the unfinished task count that
+    Socket.close() joins on in step.
+    """
+
+    collapsed = 0
+    resyncs = 0
+
+    def _put(self, item):
+        removed = 0
+        discard = False
+        queued = len(self.queue)
+        if queued >= OUTBOUND_MAX_QUEUE and _is_event(item):
+            removed = self._drop_events()
+            _count("dropped", removed + 1)
+            if any(_is_resync(pkt) for pkt in self.queue):
+                # Already told to resync; this event would be thrown away too
+                discard = True
+            else:
+                item = make_resync_packet()
+                self.resyncs += 1
+                _count("resyncs")
+        elif queued >= OUTBOUND_HIGH_WATER:
+            key = _collapse_key(item)
+            if key is not None:
+                removed = self._remove_key(key)
+                if removed:
+                    self.collapsed += removed
+                    _count("collapsed", removed)
+
+        if removed:
+            self.unfinished_tasks -= removed
+        super()._put(item)
+        if discard:
+            # Undo the append; whichever side counts the new task (eventlet in
+            # _put, the stdlib right after it) is balanced by this decrement
+            self.queue.pop()
+            self.unfinished_tasks -= 1
+        elif _is_event(item) and not _is_low_priority(item):
+            self._overtake_low_priority()
+
+    def _overtake_low_priority(self):
+        """Move the packet just queued ahead of the chat packets queued before it"""
+        queue = self.queue
+        position = len(queue) - 1
+        while position > 0 and _is_low_priority(queue[position - 1]):
+            position -= 1
+        if position < len(queue) - 1:
+            queue.insert(position, queue.pop())
+
+    def _drop_events(self):
+        kept = [pkt for pkt in self.queue if not _is_event(pkt) or _is_resync(pkt)]
+        removed = len(self.queue) - len(kept)
+        self.queue.clear()
+        self.queue.extend(kept)
+        return removed
+
+    def _remove_key(self, key):
+        kept = [pkt for pkt in self.queue if _collapse_key(pkt) != key]
+        removed = len(self.queue) - len(kept)
+        if removed:
+            self.queue.clear()
+            self.queue.extend(kept)
+        return removed
+
+
+_queue_classes = {}
+
+
+def _outbound_queue_class(base):
+    cls = _queue_classes.get(base)
+    if cls is None:
+        cls = type("Outbound" + base.__name__, (OutboundQueueMixin, base), {})
+        _queue_classes[base] = cls
+    return cls
+
+
+def install_backpressure(socketio):
+    """Give every Engine.IO connection of this server a bounded outbound queue"""
+    eio = socketio.server.eio
+    base = eio._async["queue"]
+    queue_class = _outbound_queue_class(base)
+
+    def create_queue(*args, **kwargs):
+        return queue_class(*args, **kwargs)
+
+    # Only the server's sockets create queues through this method
+    eio.create_queue = create_queue
+    print(f"Outbound backpressure enabled (high water {OUTBOUND_HIGH_WATER}, max queue {OUTBOUND_MAX_QUEUE} packets)")
+
+
+def get_backpressure_stats(socketio):
+    """Outbound queue depths for this process's connections, plus collapse/resync totals"""
+    depths = []
+    resynced = 0
+    for socket in list(socketio.server.eio.sockets.values()):
+        try:
+            depths.append(socket.queue.qsize())
+            resynced += 1 if getattr(socket.queue, "resyncs", 0) else 0
+        except Exception:
+            continue
+    with _stats_lock:
+        stats = dict(_stats)
+    stats.update({
+        "high_water": OUTBOUND_HIGH_WATER,
+        "max_queue": OUTBOUND_MAX_QUEUE,
+        "connections": len(depths),
+        "above_high_water": sum(1 for depth in depths if depth >= OUTBOUND_HIGH_WATER),
+        "deepest": max(depths) if depths else 0,
+        "queued_total": sum(depths),
+        "resynced_connections": resynced,
+    })
+    return stats
@@ -0,0 +1,155 @@
+"""
+Sequenced broadcasts for BeatSync Mixer.
+Every state-changing broadcast (queue, votes, chat, playback) is stamped with
+a global sequence number and kept in a bounded log. A client that reconnects
+sends the last sequence it saw and gets only the events it missed; if the
+gap has already rolled out of the log it gets a full initial_state instead.
+The log lives in Redis when the shared state store does, so sequence numbers
+are global across workers, and in process memory otherwise.
+Each payload is serialized once: the same JSON text is logged, published to
+the other workers and spliced into the packet every client receives.
+"""
+
+import os
+import threading
+from collections import deque
+from backend.state_store import get_state_store, RedisStateStore
+from backend.utils.serialization import EncodedJSON, encode_payload, loads
+
+
+BROADCAST_LOG_SIZE = int(os.getenv("BROADCAST_LOG_SIZE", "500"))
+
+# Chat traffic has its own namespace, joined only by clients with chat open
+CHAT_NAMESPACE = "/chat"
+
+# KEYS: sequence counter, log zset  ARGV: event, payload JSON, log size
+APPEND_SCRIPT = """
+local seq = redis.call('INCR', KEYS[1])
+redis.call('ZADD', KEYS[2], seq, seq .. ':' .. ARGV[1] .. ':' .. ARGV[2])
+redis.call('ZREMRANGEBYRANK', KEYS[2], 0, -(tonumber(ARGV[3]) + 1))
+return seq
+"""
+
+
+def with_seq(body, seq):
+    """Add "seq" to an encoded JSON object without re-serializing it"""
+    if body == "{}":
+        return EncodedJSON('{"seq":%d}' % seq)
+    return EncodedJSON('{"seq":%d,%s' % (seq, body[1:]))
+
+
+def _entry(seq, event, body):
+    return {"seq": seq, "event": event, "data": loads(with_seq(body, seq))}
+
+
+class InMemoryBroadcastLog:
+    """Sequence counter and ring buffer for a single worker"""
+
+    def __init__(self, size=BROADCAST_LOG_SIZE):
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._entries = deque(maxlen=size)
+
+    def append(self, event, body):
+        with self._lock:
+            self._seq += 1
+            self._entries.append((self._seq, event, body))
+            return self._seq
+
+    def current_seq(self):
+        with self._lock:
+            return self._seq
+
+    def since(self, last_seq):
+        with self._lock:
+            entries = [entry for entry in self._entries if entry[0] > last_seq]
+            current = self._seq
+        entries = _complete_or_none(entries, last_seq, current)
+        return [_entry(*entry) for entry in entries] if entries is not None else None
+
+
+class RedisBroadcastLog:
+    """Sequence counter and ring buffer shared by every worker"""
+
+    def __init__(self, client, prefix="beatsync:state:", size=BROADCAST_LOG_SIZE):
+        self.client = client
+        self.size = size
+        self.seq_key = prefix + "broadcast:seq"
+        self.log_key = prefix + "broadcast:log"
+        self._append = client.register_script(APPEND_SCRIPT)
+
+    def append(self, event, body):
+        return int(self._append(keys=[self.seq_key, self.log_key], args=[event, body, self.size]))
+
+    def current_seq(self):
+        return int(self.client.get(self.seq_key) or 0)
+
+    def since(self, last_seq):
+        current = self.current_seq()
+        entries = []
+        for raw in self.client.zrangebyscore(self.log_key, f"({last_seq}", "+inf"):
+            raw = raw.decode() if isinstance(raw, bytes) else raw
+            seq, event, body = raw.split(":", 2)
+            entries.append((int(seq), event, body))
+        entries = _complete_or_none(entries, last_seq, current)
+        return [_entry(*entry) for entry in entries] if entries is not None else None
+
+
+def _complete_or_none(entries, last_seq, current):
+    """(seq, event, body) entries if they cover every sequence in (last_seq, current], else None"""
+    if last_seq > current:
+        # The sequence was reset (e.g. in-process log after a restart)
+        return None
+    entries = [entry for entry in entries if entry[0] <= current]
+    if len(entries) != current - last_seq:
+        return None
+    return entries
+
+
+_broadcast_log = None
+_broadcast_log_lock = threading.Lock()
+
+
+def get_broadcast_log():
+    """Get the process-wide broadcast log, backed by the same store as the shared state"""
+    global _broadcast_log
+    if _broadcast_log is None:
+        with _broadcast_log_lock:
+            if _broadcast_log is None:
+                store = get_state_store()
+                if isinstance(store, RedisStateStore):
+                    _broadcast_log = RedisBroadcastLog(store.client, store.prefix)
+                else:
+                    _broadcast_log = InMemoryBroadcastLog()
+    return _broadcast_log
+
+
+def broadcast(event, data=None, app=None, namespace=None):
+    """Emit event to every client, stamped with the next sequence number.
+
+    Events for another namespace (chat) go to that namespace's clients
+    unsequenced; those clients reload their history when they reconnect.
+    Returns the sequence number, or None if the event wasn't sequenced or
+    couldn't be sent.
+    """
+    if app is None:
+        from flask import current_app
+        app = current_app
+    if not hasattr(app, 'socketio'):
+        return None
+
+    body = encode_payload(data or {})
+    if namespace not in (None, "/"):
+        app.socketio.emit(event, body, namespace=namespace)
+        return None
+
+    try:
+        seq = get_broadcast_log().append(event, body)
+        payload = with_seq(body, seq)
+    except Exception as e:
+        # Still deliver the event; the client just can't replay it later
+        print(f"Failed to log broadcast {event}: {e}")
+        seq, payload = None, body
+
+    app.socketio.emit(event, payload)
+    return seq
@@ -0,0 +1,197 @@
+"""
+Per-connection identity for BeatSync Mixer's Socket.IO handlers.
+The Flask session (filesystem or Redis, via Flask-Session) is read once when
+a client connects; the role, user_id and display_name it holds are kept here
+by sid for the rest of the connection. Flask opens the session for every
+Socket.IO event it runs, so the app's session interface is also wrapped: once
+a connection's identity is cached, its events get a session that is only
+loaded from the store if a handler actually reads it. Queue, vote and chat
+events therefore do no session store I/O.
+
+The cache is per process. When an HTTP route signs a user out or changes
+their role, invalidate_identity() drops the cached identities of that
+browser session (and user) in this process, so their next event reads the
+session again, and tells their open pages, on any worker, to reload and
+reconnect with the new identity. Both happen once the response is closed,
+after Flask has saved the changed session.
+"""
+
+import threading
+from flask import session, request, current_app, g, after_this_request
+from flask_socketio import join_room
+from werkzeug.local import LocalProxy
+
+
+SESSION_CHANGED_EVENT = "session_changed"
+
+# Set on a connection's WSGI environ (shared by all its events) once its identity is cached
+IDENTITY_CACHED_KEY = "beatsync.identity_cached"
+
+_lock = threading.Lock()
+_identities = {}  # {sid: {"role", "user_id", "display_name"}}
+_sid_rooms = {}  # {sid: (room, ...)} user and session rooms a cached identity is indexed under
+_room_sids = {}  # {room: {sid, ...}}
+
+
+def user_room(user_id):
+    """Room holding every default-namespace connection of one user"""
+    return f"user:{user_id}"
+
+
+def session_room(session_id):
+    """Room holding every default-namespace connection of one browser session"""
+    return f"session:{session_id}"
+
+
+def _store(sid, identity, rooms):
+    with _lock:
+        _discard(sid)
+        _identities[sid] = identity
+        _sid_rooms[sid] = rooms
+        for room in rooms:
+            _room_sids.setdefault(room, set()).add(sid)
+
+
+def _discard(sid):
+    identity = _identities.pop(sid, None)
+    for room in _sid_rooms.pop(sid, ()):
+        sids = _room_sids.get(room)
+        if sids is not None:
+            sids.discard(sid)
+            if not sids:
+                del _room_sids[room]
+    return identity
+
+
+def load_identity():
+    """Read this connection's identity from the Flask session and cache it"""
+    identity = {
+        "role": session.get("role"),
+        "user_id": session.get("user_id"),
+        "display_name": session.get("display_name"),
+    }
+    # Guests without a user_id are still reachable through their session id
+    rooms = []
+    if identity["user_id"]:
+        rooms.append(user_room(identity["user_id"]))
+    if getattr(session, "sid", None):
+        rooms.append(session_room(session.sid))
+    _store(request.sid, identity, tuple(rooms))
+    request.environ[IDENTITY_CACHED_KEY] = True
+    if request.namespace == "/":
+        for room in rooms:
+            join_room(room)
+    return identity
+
+
+def current_identity():
+    """This connection's cached identity; the session is only read if it isn't cached"""
+    with _lock:
+        identity = _identities.get(request.sid)
+    if identity is None:
+        identity = load_identity()
+    return identity
+
+
+def update_identity(**changes):
+    """Change fields of this connection's identity (e.g. a newly assigned display name)"""
+    with _lock:
+        identity = _identities.get(request.sid)
+        if identity is not None:
+            identity.update(changes)
+
+
+def forget_identity(sid=None):
+    """Drop a connection's identity when it disconnects"""
+    with _lock:
+        return _discard(sid or request.sid)
+
+
+def invalidate_identity(user_id=None):
+    """Drop the cached identities of this request's session, and of user_id if
+    given (e.g. the account being logged into), and ask their pages to reload.
+
+    Call it before changing or clearing the session. The work is deferred to
+    when the response is closed, after the session has been saved, so sockets
+    can't re-read the old session and pages don't reload before the new one
+    exists."""
+    rooms = g.get("invalidated_rooms")
+    if rooms is None:
+        rooms = g.invalidated_rooms = set()
+        socketio = getattr(current_app, "socketio", None)
+
+        @after_this_request
+        def notify_after_close(response):
+            response.call_on_close(lambda: _invalidate_rooms(socketio, rooms))
+            return response
+
+    for uid in (session.get("user_id"), user_id):
+        if uid:
+            rooms.add(user_room(uid))
+    if getattr(session, "sid", None):
+        rooms.add(session_room(session.sid))
+
+
+def _invalidate_rooms(socketio, rooms):
+    with _lock:
+        for room in rooms:
+            for sid in list(_room_sids.get(room, ())):
+                _discard(sid)
+    if socketio is None or not rooms:
+        return
+    try:
+        # One emit to all the rooms, so a page in several of them reloads once
+        socketio.emit(SESSION_CHANGED_EVENT, {}, to=sorted(rooms))
+    except Exception as e:
+        print(f"Failed to notify sockets of session change in {sorted(rooms)}: {e}")
+
+
+class DeferredSession(LocalProxy):
+    """One Socket.IO event's session, loaded from the store on first use"""
+
+    __slots__ = ("_opened",)
+
+    def __init__(self, load):
+        opened = []
+
+        def get():
+            if not opened:
+                opened.append(load())
+            return opened[0]
+
+        super().__init__(get)
+        object.__setattr__(self, "_opened", opened)
+
+    @property
+    def modified(self):
+        # Flask-SocketIO checks this after every event to decide whether to
+        # save the session; an unopened session has nothing to save
+        opened = object.__getattribute__(self, "_opened")
+        return bool(opened) and getattr(opened[0], "modified", True)
+
+
+class DeferredSocketSessionInterface:
+    """Wraps the app's session interface; Socket.IO events of a connection with
+    a cached identity get a session that is only opened on first use"""
+
+    def __init__(self, base):
+        self.base = base
+
+    def __getattr__(self, name):
+        return getattr(self.base, name)
+
+    def open_session(self, app, request):
+        if not request.environ.get(IDENTITY_CACHED_KEY):
+            return self.base.open_session(app, request)
+
+        def load():
+            session = self.base.open_session(app, request)
+            return session if session is not None else self.base.make_null_session(app)
+
+        return DeferredSession(load)
+
+
+def install_session_deferral(app):
+    """Stop Socket.IO events from loading the Flask session they don't use"""
+    if not isinstance(app.session_interface, DeferredSocketSessionInterface):
+        app.session_interface = DeferredSocketSessionInterface(app.session_interface)
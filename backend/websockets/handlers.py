@@ -1,41 +1,115 @@
 """
 Socket.IO event handlers for BeatSync Mixer.
 Handles real-time communication for queue, voting, and chat.
+Queue, voting and playback events use the default namespace; chat has its
+own /chat namespace, which clients join only while their chat box is open,
+and its handlers run on their own pool so a chat flood can't hold up the queue.
 """
 
+import os
 from datetime import datetime, timezone
 from flask import session, request
 from flask_socketio import SocketIO, emit
-from backend.models.models import get_db, QueueItem, Vote, ChatMessage
-from backend.utils.cache import get_currently_playing, get_queue_snapshot, update_queue_snapshot
+from backend.models.models import get_db, ChatMessage
+from backend.queue_store import get_queue_store
+from backend.utils.host import renew_host, get_current_host, is_current_host
+from backend.utils.listener_numbers import get_listener_numbers
+from backend.utils.executor import submit_task
+from backend.utils.rate_limit import allow_event
+from backend.utils.presence import get_presence, schedule_presence_broadcast
+from backend.utils import serialization
+from backend.utils.serialization import encode_payload
+from backend.utils.chat_history import get_chat_buffer, load_history_page, CHAT_HISTORY_LIMIT
+from backend.utils.chat_writer import get_chat_writer, next_chat_id
+from backend.websockets.broadcast import broadcast, get_broadcast_log, CHAT_NAMESPACE
+from backend.websockets.backpressure import install_backpressure
+from backend.websockets.context import load_identity, current_identity, update_identity, forget_identity, install_session_deferral
+from backend.utils.votes import VOTE_MODE
+from backend.utils.idempotency import claim_operation, complete_operation, release_operation
+from backend.utils.cache import get_initial_state_payload, record_queue_change
+
 
 
 # SocketIO instance will be imported from app factory
 socketio = None
 
-# Track active listeners for numbering
-active_listeners = {}  # {session_id: listener_number}
-next_listener_number = 1
+# "polling" (default): HTTP long-polling only, on threads - the most forgiving
+# behind proxies. "websocket": eventlet green threads with WebSocket upgrades,
+# for many listeners (run under the eventlet gunicorn worker, as in the Procfile)
+SOCKETIO_MODE = os.getenv("SOCKETIO_MODE", "polling").lower()
+
+
+def get_socketio_message_queue():
+    """Message queue URL that links the Socket.IO servers of several processes.
+    
+    SOCKETIO_MESSAGE_QUEUE takes any URL Flask-SocketIO supports (redis://,
+    rediss://, amqp://, kafka://), or "redis" to reuse REDIS_URL. Unset means a
+    single process with no message queue.
+    """
+    message_queue = os.getenv("SOCKETIO_MESSAGE_QUEUE", "").strip()
+    if not message_queue:
+        return None
+    if message_queue.lower() == "redis":
+        from backend.utils.config import get_redis_url
+        return get_redis_url()
+    return message_queue
+
+
+def get_socketio_transport_options(mode=None):
+    """Async mode and transport settings for a SOCKETIO_MODE"""
+    mode = (mode or SOCKETIO_MODE).lower()
+    if mode == "websocket":
+        return {
+            "async_mode": "eventlet",
+            "allow_upgrades": True,
+            "transports": ["polling", "websocket"]
+        }
+    if mode != "polling":
+        print(f"Unknown SOCKETIO_MODE '{mode}', using polling")
+    return {
+        "async_mode": "threading",  # Use threading mode for better Heroku compatibility
+        "allow_upgrades": False,  # Disable websocket upgrades for Heroku stability
+        "transports": ["polling"]  # Use only polling transport for better reliability
+    }
 
 
 def init_socketio(app):
     """Initialize Socket.IO with the Flask app"""
     global socketio
+    
+    # With a message queue every process relays broadcasts (including REST route
+    # emits via current_app.socketio) to its own clients
+    message_queue = get_socketio_message_queue()
+    if message_queue:
+        print(f"Socket.IO message queue enabled ({message_queue.split('://')[0]})")
+    
+    transport_options = get_socketio_transport_options()
+    print(f"Socket.IO {SOCKETIO_MODE} mode ({transport_options['async_mode']}, transports: {', '.join(transport_options['transports'])})")
+    
     socketio = SocketIO(
         app, 
         cors_allowed_origins="*", 
         ping_timeout=120,  # Increased timeout for slower connections
         ping_interval=30,  # More frequent pings
         max_http_buffer_size=16384,
-        allow_upgrades=False,  # Disable websocket upgrades for Heroku stability
-        transports=['polling'],  # Use only polling transport for better reliability
         manage_session=False,  # Let Flask handle sessions
         cookie=False,  # Disable Socket.IO's own cookies to rely on Flask session
         engineio_logger=False,  # Disable verbose logging
         logger=False,  # Disable verbose logging
-        async_mode='threading'  # Use threading mode for better Heroku compatibility
+        message_queue=message_queue,
+        channel=os.getenv("SOCKETIO_CHANNEL", "beatsync-socketio"),
+        json=serialization,  # orjson when available, and pre-encoded payloads pass through
+        # Compression is left to Engine.IO's defaults: long-poll responses of
+        # 1 KB or more are gzipped, WebSocket frames use permessage-deflate
+        **transport_options
     )
     
+    # Bound each client's outbound queue so slow consumers can't pile up a backlog
+    install_backpressure(socketio)
+    
+    # Events read the identity cached at connect instead of loading the session
+    install_session_deferral(app)
+    
     # Register event handlers
     register_handlers()
     
@@ -43,29 +117,18 @@ def init_socketio(app):
 
 
 def assign_listener_number(session_id):
-    """Assign a listener number to a new listener"""
-    global next_listener_number, active_listeners
-    
-    # Find the smallest available number
-    used_numbers = set(active_listeners.values())
-    listener_number = 1
-    while listener_number in used_numbers:
-        listener_number += 1
-    
-    active_listeners[session_id] = listener_number
+    """Assign the smallest free listener number to a new listener"""
+    listener_number = get_listener_numbers().assign(session_id)
     print(f"Assigned listener number {listener_number} to session {session_id}")
     return listener_number
 
 
 def release_listener_number(session_id):
     """Release a listener number when a listener disconnects"""
-    global active_listeners
-    
-    if session_id in active_listeners:
-        listener_number = active_listeners.pop(session_id)
+    listener_number = get_listener_numbers().release(session_id)
+    if listener_number is not None:
         print(f"Released listener number {listener_number} from session {session_id}")
-        return listener_number
-    return None
+    return listener_number
 
 
 def get_listener_display_name(listener_number):
@@ -73,6 +136,25 @@ def get_listener_display_name(listener_number):
     return f"Listener {listener_number}"
 
 
+def over_rate_limit(limit_name):
+    """Spend one of this client's tokens for limit_name; True if it has none left"""
+    return not allow_event(limit_name, current_identity()["user_id"] or request.sid)
+
+
+def demote_lost_host(identity):
+    """After a failed lease renewal: if another user holds the lease, make this
+    session a listener and tell the client. Returns True if it was demoted."""
+    host = get_current_host()
+    if not host or host["user_id"] == identity["user_id"]:
+        # Nobody else is hosting (the renewal failed for another reason)
+        return False
+    print(f"[HOST] Host lease taken by {host['user_id']}, demoting {identity['user_id']} to listener")
+    session["role"] = "listener"
+    update_identity(role="listener")
+    emit("host_lost", {"message": f"{host['display_name']} is hosting now. You've joined as a listener."})
+    return True
+
+
 def register_handlers():
     """Register all Socket.IO event handlers"""
     
@@ -80,9 +162,11 @@ def register_handlers():
     def handle_connect(auth):
         """Handle client connection"""
         try:
-            user_role = session.get("role")
-            user_id = session.get("user_id", "unknown")
-            display_name = session.get("display_name", "Unknown")
+            # The only session read for this connection; events use the cached identity
+            identity = load_identity()
+            user_role = identity["role"]
+            user_id = identity["user_id"] or "unknown"
+            display_name = identity["display_name"] or "Unknown"
             
             if not user_role or user_role not in ["host", "listener", "guest"]:
                 emit("error", {"message": "Authentication required"})
@@ -96,24 +180,40 @@ def register_handlers():
                 display_name = get_listener_display_name(listener_number)
                 session["listener_number"] = listener_number
                 session["display_name"] = display_name
+                update_identity(display_name=display_name)
                 print(f"[CONNECTION] Assigned listener number {listener_number} to sid {request.sid}")
                 
                 # Notify the client of their new display name
                 emit("display_name_updated", {"display_name": display_name})
             
-            emit("connected", {"role": user_role, "message": "Connected successfully"})
+            # A reconnecting host picks its lease back up, unless someone else took it meanwhile
+            if user_role == "host" and not renew_host(user_id, display_name) and demote_lost_host(identity):
+                user_role = "listener"
+            
+            get_presence().join(request.sid, user_role)
+            schedule_presence_broadcast(socketio)
+            
+            emit("connected", {"role": user_role, "message": "Connected successfully", "presence": get_presence().counts()})
             
         except Exception as e:
             print(f"Connection error: {e}")
             emit("error", {"message": "Connection failed"})
         
-        # Send initial data in smaller chunks to avoid timeouts
+        # Send initial data in the background so the connect handler returns quickly
         try:
-            import threading
             from flask import current_app
-            # Pass the app context and user role to the background thread
+            # A reconnecting client sends the last broadcast sequence it saw
+            last_seq = auth.get("last_seq") if isinstance(auth, dict) else None
+            try:
+                last_seq = int(last_seq) if last_seq is not None else None
+            except (TypeError, ValueError):
+                last_seq = None
+            
+            # Pass the app context and user role to the pool task
             app = current_app._get_current_object()
-            threading.Thread(target=send_initial_data_async, args=(request.sid, app, user_role), daemon=True).start()
+            if not submit_task("initial_sync", send_initial_data_async, request.sid, app, user_role, last_seq):
+                # Pool is saturated (reconnect storm) - let the client pull the queue over HTTP instead
+                emit("queue_updated", {})
             
         except Exception as e:
             print(f"Error starting initial data thread: {e}")
@@ -123,11 +223,16 @@ def register_handlers():
     @socketio.on("disconnect")
     def handle_disconnect(reason=None):
         """Handle client disconnection"""
-        user_name = session.get("display_name", "Unknown")
-        user_id = session.get("user_id", "unknown")
-        user_role = session.get("role", "unknown")
+        identity = forget_identity() or {}
+        user_name = identity.get("display_name") or "Unknown"
+        user_id = identity.get("user_id") or "unknown"
+        user_role = identity.get("role") or "unknown"
         print(f"[DISCONNECTION] User disconnected: {user_name} (user_id: {user_id}, role: {user_role}, sid: {request.sid}, reason: {reason})")
         
+        if user_role in ["host", "listener", "guest"]:
+            get_presence().leave(request.sid, user_role)
+            schedule_presence_broadcast(socketio)
+        
         # Release listener number on disconnect for listeners
         if user_role == "listener":
             released_number = release_listener_number(request.sid)
@@ -135,6 +240,46 @@ def register_handlers():
                 print(f"[DISCONNECTION] Released listener number {released_number}")
 
 
+    @socketio.on("heartbeat")
+    def handle_heartbeat():
+        """Periodic keep-alive from the client; renews presence and the host lease or listener number"""
+        identity = current_identity()
+        user_role = identity["role"]
+        if user_role not in ["host", "listener", "guest"]:
+            return
+        
+        # Re-join if this sid was expired; the broadcast only goes out if counts changed
+        presence = get_presence()
+        if not presence.touch(request.sid, user_role):
+            presence.join(request.sid, user_role)
+        schedule_presence_broadcast(socketio)
+        
+        if user_role == "host":
+            if not renew_host(identity["user_id"], identity["display_name"] or "Unknown") and demote_lost_host(identity):
+                presence.leave(request.sid, "host")
+                presence.join(request.sid, "listener")
+        
+        elif user_role == "listener" and not get_listener_numbers().renew(request.sid):
+            # The number lapsed (missed heartbeats) and may belong to someone else now
+            listener_number = assign_listener_number(request.sid)
+            display_name = get_listener_display_name(listener_number)
+            # Rare enough to write through to the session, which HTTP routes read
+            session["listener_number"] = listener_number
+            session["display_name"] = display_name
+            update_identity(display_name=display_name)
+            print(f"[HEARTBEAT] Reassigned listener number {listener_number} to sid {request.sid}")
+            emit("display_name_updated", {"display_name": display_name})
+
+
+    @socketio.on("sync_state")
+    def handle_sync_state():
+        """Send a full initial_state to a client whose outbound backlog was dropped (see resync)"""
+        from flask import current_app
+        app = current_app._get_current_object()
+        if not submit_task("initial_sync", send_initial_data_async, request.sid, app, current_identity()["role"]):
+            emit("queue_updated", {})
+
+
     @socketio.on_error_default
     def default_error_handler(e):
         """Default error handler for all events"""
@@ -147,67 +292,142 @@ def register_handlers():
     @socketio.on("queue_add")
     def handle_queue_add(data):
         """Add track to queue - Host and Listener allowed"""
+        if not isinstance(data, dict):
+            emit("error", {"message": "Missing track information"})
+            return
+        
+        identity = current_identity()
+        operation_scope = f"queue_add:{identity['user_id'] or 'anonymous'}"
+        operation_id = data.get("client_op_id")
+        operation_claimed = False
+        
         try:
             # Check if user is authenticated (has any role)
-            if not session.get("role"):
+            if not identity["role"]:
                 emit("error", {"message": "You must be logged in to add tracks"})
                 return
             
+            if over_rate_limit("queue_add"):
+                emit("error", {"message": "You're adding tracks too fast, please slow down"})
+                return
+            
             track_uri = data.get("track_uri")
-            track_name = data.get("track_name") if data else None
+            track_name = data.get("track_name")
             
-            if not track_uri or not track_name:
+            if not isinstance(track_uri, str) or not isinstance(track_name, str) or not track_uri or not track_name.strip():
                 emit("error", {"message": "Missing track information"})
                 return
             
-            with get_db() as db:
-                # Add track to queue
-                queue_item = QueueItem(track_uri=track_uri, track_name=track_name.strip())
-                db.add(queue_item)
-                
-                # Update queue snapshot in cache after adding new item
-                update_queue_snapshot()
-                
-                # Broadcast to all connected users
-                socketio.emit(
-                    "queue_updated",
-                    {
-                        "track_uri": track_uri,
-                        "track_name": track_name.strip(),
-                        "timestamp": queue_item.timestamp.isoformat() if queue_item.timestamp else None
-                    }
-                )
-                
-                emit("queue_add_success", {
-                    "message": f"Added '{track_name}' to queue",
-                    "track_uri": track_uri
-                })
+            # A retried/replayed add returns the original result without touching the DB
+            operation_claimed, previous_result = claim_operation(operation_scope, operation_id)
+            if not operation_claimed:
+                print(f"Replayed queue_add {operation_id} ignored")
+                emit("queue_add_success", {**(previous_result or {"track_uri": track_uri}), "replayed": True})
+                return
+            
+            # Add track to queue; the store turns a duplicate into a no-op
+            inserted = get_queue_store().add_track(track_uri, track_name.strip())
+            
+            if not inserted:
+                release_operation(operation_scope, operation_id)
+                operation_claimed = False
+                emit("error", {"message": "Track is already in the queue"})
+                return
+            
+            timestamp = inserted["timestamp"]
+            track_data = {
+                "track_uri": track_uri,
+                "track_name": track_name.strip(),
+                "timestamp": timestamp
+            }
+            
+            # Bump the queue version and refresh the snapshot now that the add is committed
+            record_queue_change("add", track_data)
+            
+            # Broadcast to all connected users
+            broadcast("queue_updated", track_data)
+            
+            result = {
+                "message": f"Added '{track_name}' to queue",
+                "track_uri": track_uri
+            }
+            complete_operation(operation_scope, operation_id, result)
+            emit("queue_add_success", result)
                 
         except Exception as e:
             print(f"Error in queue_add: {e}")
+            if operation_claimed:
+                release_operation(operation_scope, operation_id)
             emit("error", {"message": "Failed to add track to queue"})
 
 
+    @socketio.on("queue_add_bulk")
+    def handle_queue_add_bulk(data):
+        """Add a list of tracks or a whole playlist to the queue - Host and Listener allowed"""
+        try:
+            identity = current_identity()
+            if not identity["role"]:
+                emit("error", {"message": "You must be logged in to add tracks"})
+                return
+            
+            if over_rate_limit("queue_add"):
+                emit("error", {"message": "You're adding tracks too fast, please slow down"})
+                return
+            
+            from backend.routes.queue import bulk_enqueue_request
+            result, status = bulk_enqueue_request(data, identity)
+            
+            if status != 200:
+                emit("error", {"message": result["error"]})
+                return
+            
+            emit("queue_add_bulk_success", {
+                "message": result["message"],
+                "added": result["added"],
+                "skipped": result["skipped"],
+                "truncated": result["truncated"]
+            })
+            
+        except Exception as e:
+            print(f"Error in queue_add_bulk: {e}")
+            emit("error", {"message": "Failed to add tracks to queue"})
+
+
     @socketio.on("vote_add")
     def handle_vote_add(data):
         """Handle voting on tracks - Available to all authenticated users"""
         import uuid
         vote_event_id = str(uuid.uuid4())[:8]  # Short unique ID for this vote event
+        if not isinstance(data, dict):
+            emit("error", {"message": "Invalid vote", "client_vote_id": "unknown"})
+            return
+        
         client_vote_id = data.get("client_vote_id", "unknown")
+        identity = current_identity()
+        operation_scope = f"vote:{identity['user_id'] or 'anonymous'}"
+        operation_id = data.get("client_vote_id")
+        operation_claimed = False
         
         try:
             # Check if user is authenticated (has any role)
-            if not session.get("role"):
+            if not identity["role"]:
                 emit("error", {
                     "message": "You must be logged in to vote",
                     "client_vote_id": client_vote_id
                 })
                 return
             
+            if over_rate_limit("vote"):
+                emit("error", {
+                    "message": "You're voting too fast, please slow down",
+                    "client_vote_id": client_vote_id
+                })
+                return
+            
             track_uri = data.get("track_uri")
             vote_type = data.get("vote")  # 'up' or 'down'
-            user_id = session.get("user_id", "anonymous")  # Use session user_id
-            role = session.get("role", "unknown")
+            user_id = identity["user_id"] or "anonymous"
+            role = identity["role"]
             
             if vote_type not in ["up", "down"]:
                 emit("error", {
@@ -224,51 +444,56 @@ def register_handlers():
                 return
 
             print(f"[VOTE {vote_event_id}] START: client_id={client_vote_id}, user_id={user_id}, role={role}, track_uri={track_uri}, vote_type={vote_type}")
-            print(f"[VOTE {vote_event_id}] Session ID: {session.get('_permanent', 'no-session')}")
             print(f"[VOTE {vote_event_id}] Request SID: {request.sid}")
 
-            with get_db() as db:
-                # Use a single transaction to add the vote
-                try:
-                    # Always add a new vote (allow multiple votes from same user)
-                    print(f"[VOTE {vote_event_id}] ADDING: User {user_id} voting {vote_type}")
-                    vote = Vote(track_uri=track_uri, vote_type=vote_type, user_id=user_id)
-                    db.add(vote)
-                    
-                    # Flush to apply changes before counting
-                    db.flush()
-                    
-                    # Calculate updated vote counts for this track (single query per type)
-                    up_votes_after = (
-                        db.query(Vote).filter(Vote.track_uri == track_uri, Vote.vote_type == "up").count()
-                    )
-                    down_votes_after = (
-                        db.query(Vote).filter(Vote.track_uri == track_uri, Vote.vote_type == "down").count()
-                    )
-                    
-                    print(f"[VOTE {vote_event_id}] FINAL: {up_votes_after} up, {down_votes_after} down")
-                    print(f"[VOTE {vote_event_id}] SENDING: track_uri={track_uri}, up_votes={up_votes_after}, down_votes={down_votes_after}")
-                    
-                    # Update queue snapshot in cache after vote changes
-                    update_queue_snapshot()
-                    
-                    print(f"[VOTE {vote_event_id}] SUCCESS: Added {vote_type} vote from {user_id}")
-                    
-                    # Broadcast updated vote counts to all connected clients
-                    socketio.emit(
-                        "vote_updated", 
-                        {"track_uri": track_uri, "up_votes": up_votes_after, "down_votes": down_votes_after}
-                    )
-                    
-                    # Send success response to the voting client
-                    emit("vote_success", {"client_vote_id": client_vote_id})
+            # A retried/replayed vote returns the original result without touching the DB
+            operation_claimed, previous_result = claim_operation(operation_scope, operation_id)
+            if not operation_claimed:
+                print(f"[VOTE {vote_event_id}] REPLAY: client_id={client_vote_id} was already applied")
+                emit("vote_success", {"client_vote_id": client_vote_id, "replayed": True, **(previous_result or {})})
+                return
 
-                except Exception as db_error:
-                    print(f"[VOTE {vote_event_id}] DB ERROR: {db_error}")
-                    raise db_error
+            try:
+                # Unlimited mode adds a new vote per click, ledger mode upserts the user's vote
+                print(f"[VOTE {vote_event_id}] ADDING: User {user_id} voting {vote_type} ({VOTE_MODE} mode)")
+                counts = get_queue_store().cast_vote(track_uri, user_id, vote_type)
+                if counts is None:
+                    print(f"[VOTE {vote_event_id}] NOT QUEUED: {track_uri}")
+                    release_operation(operation_scope, operation_id)
+                    operation_claimed = False
+                    emit("error", {
+                        "message": "That track is no longer in the queue",
+                        "client_vote_id": client_vote_id
+                    })
+                    return
+                up_votes_after, down_votes_after = counts
+                
+                print(f"[VOTE {vote_event_id}] FINAL: {up_votes_after} up, {down_votes_after} down")
+
+            except Exception as db_error:
+                print(f"[VOTE {vote_event_id}] STORE ERROR: {db_error}")
+                raise db_error
+            
+            vote_data = {"track_uri": track_uri, "up_votes": up_votes_after, "down_votes": down_votes_after}
+            print(f"[VOTE {vote_event_id}] SENDING: track_uri={track_uri}, up_votes={up_votes_after}, down_votes={down_votes_after}")
+            
+            complete_operation(operation_scope, operation_id, vote_data)
+            
+            # Bump the queue version and refresh the snapshot now that the vote is committed
+            record_queue_change("vote", vote_data)
+            
+            print(f"[VOTE {vote_event_id}] SUCCESS: Added {vote_type} vote from {user_id}")
+            
+            # Broadcast updated vote counts to all connected clients
+            broadcast("vote_updated", vote_data)
+            
+            # Send success response to the voting client
+            emit("vote_success", {"client_vote_id": client_vote_id})
                 
         except Exception as e:
             print(f"[VOTE {vote_event_id}] ERROR: {e}")
+            if operation_claimed:
+                release_operation(operation_scope, operation_id)
             import traceback
             traceback.print_exc()
             emit("error", {
@@ -277,137 +502,202 @@ def register_handlers():
             })
 
 
-    @socketio.on("chat_message")
+    @socketio.on("vote_retract")
+    def handle_vote_retract(data):
+        """Retract the current user's vote on a track"""
+        if not isinstance(data, dict):
+            emit("error", {"message": "Invalid vote", "client_vote_id": "unknown"})
+            return
+        
+        client_vote_id = data.get("client_vote_id", "unknown")
+        
+        try:
+            identity = current_identity()
+            if not identity["role"]:
+                emit("error", {
+                    "message": "You must be logged in to vote",
+                    "client_vote_id": client_vote_id
+                })
+                return
+            
+            if over_rate_limit("vote"):
+                emit("error", {
+                    "message": "You're voting too fast, please slow down",
+                    "client_vote_id": client_vote_id
+                })
+                return
+            
+            track_uri = data.get("track_uri")
+            user_id = identity["user_id"] or "anonymous"
+            
+            if not track_uri:
+                emit("error", {
+                    "message": "Invalid track URI",
+                    "client_vote_id": client_vote_id
+                })
+                return
+            
+            counts = get_queue_store().retract_vote(track_uri, user_id)
+            if counts is None:
+                emit("error", {
+                    "message": "That track is no longer in the queue",
+                    "client_vote_id": client_vote_id
+                })
+                return
+            up_votes_after, down_votes_after = counts
+            
+            vote_data = {"track_uri": track_uri, "up_votes": up_votes_after, "down_votes": down_votes_after}
+            record_queue_change("vote", vote_data)
+            
+            broadcast("vote_updated", vote_data)
+            emit("vote_success", {"client_vote_id": client_vote_id})
+            
+        except Exception as e:
+            print(f"Error in vote_retract: {e}")
+            emit("error", {
+                "message": "Failed to retract vote",
+                "client_vote_id": client_vote_id
+            })
+
+
+    @socketio.on("connect", namespace=CHAT_NAMESPACE)
+    def handle_chat_connect(auth=None):
+        """Join chat; only signed-in users may"""
+        if load_identity()["role"] not in ["host", "listener", "guest"]:
+            # Refused connections never get a disconnect event
+            forget_identity()
+            return False
+
+
+    @socketio.on("chat_message", namespace=CHAT_NAMESPACE)
     def handle_chat_message(data):
         """Handle chat messages - Available to all authenticated users"""
+        if not isinstance(data, dict):
+            emit("error", {"message": "Message cannot be empty"})
+            return
+        
         try:
-            if not session.get("role"):
+            identity = current_identity()
+            if not identity["role"]:
                 emit("error", {"message": "You must be logged in to chat"})
                 return
             
-            # Try session first, then frontend data, then fallback
-            user = session.get("display_name") or data.get("user", "Anonymous")
+            if over_rate_limit("chat"):
+                emit("error", {"message": "You're sending messages too fast, please slow down"})
+                return
+            
+            # Try the connection's identity first, then frontend data, then fallback
+            user = identity["display_name"] or data.get("user", "Anonymous")
             message = data.get("message", "")
             
-            if not message.strip():
+            if not isinstance(message, str) or not message.strip():
                 emit("error", {"message": "Message cannot be empty"})
                 return
             
-            with get_db() as db:
-                chat_msg = ChatMessage(user=user, message=message.strip())
-                db.add(chat_msg)
-                
-                response_data = {
-                    "user": chat_msg.user,
-                    "message": chat_msg.message,
-                    "timestamp": chat_msg.timestamp.replace(tzinfo=timezone.utc).isoformat() if chat_msg.timestamp else None,
-                }
-                
-                socketio.emit("chat_message", response_data)
+            from flask import current_app
+            app = current_app._get_current_object()
+            if not submit_task("chat", save_chat_message, user, message.strip(), app=app):
+                emit("error", {"message": "Chat is busy, please try again"})
                 
         except Exception as e:
             print(f"Error in chat_message: {e}")
             emit("error", {"message": "Failed to send message"})
 
 
-    @socketio.on("load_chat_history")
+    @socketio.on("load_chat_history", namespace=CHAT_NAMESPACE)
     def handle_load_chat_history():
         """Load recent chat messages for a user"""
-        try:
-            with get_db() as db:
-                # Get last 50 messages
-                recent_messages = db.query(ChatMessage).order_by(ChatMessage.timestamp.desc()).limit(50).all()
-                
-                # Reverse to show oldest first
-                recent_messages.reverse()
-                
-                messages_data = [
-                    {
-                        "user": msg.user,
-                        "message": msg.message,
-                        "timestamp": msg.timestamp.replace(tzinfo=timezone.utc).isoformat() if msg.timestamp else None,
-                    }
-                    for msg in recent_messages
-                ]
-                
-                emit("chat_history", {"messages": messages_data})
-                
-        except Exception as e:
-            print(f"Error loading chat history: {e}")
+        from flask import current_app
+        app = current_app._get_current_object()
+        if not submit_task("chat", send_chat_history, request.sid, app=app):
             emit("error", {"message": "Failed to load chat history"})
 
 
-def send_initial_data_async(client_sid, app, user_role):
-    """Send initial data asynchronously to avoid blocking the connection"""
+    @socketio.on("load_chat_page", namespace=CHAT_NAMESPACE)
+    def handle_load_chat_page(data=None):
+        """Load the page of chat history before the oldest message the client has"""
+        data = data or {}
+        if not isinstance(data, dict):
+            emit("error", {"message": "Invalid chat history cursor"})
+            return
+        
+        try:
+            before_id = int(data["before_id"]) if data.get("before_id") is not None else None
+            limit = int(data.get("limit") or CHAT_HISTORY_LIMIT)
+        except (TypeError, ValueError):
+            emit("error", {"message": "Invalid chat history cursor"})
+            return
+        
+        from flask import current_app
+        app = current_app._get_current_object()
+        if not submit_task("chat", send_chat_page, request.sid, before_id, data.get("before_timestamp"), limit, app=app):
+            emit("error", {"message": "Failed to load older messages"})
+
+
+def send_chat_page(client_sid, before_id, before_timestamp, limit):
+    """Send one client a page of older chat history (chat pool)"""
+    try:
+        page = load_history_page(before_id, before_timestamp, limit)
+        socketio.emit("chat_page", page, room=client_sid, namespace=CHAT_NAMESPACE)
+        
+    except Exception as e:
+        print(f"Error loading chat history page: {e}")
+        socketio.emit("error", {"message": "Failed to load older messages"}, room=client_sid, namespace=CHAT_NAMESPACE)
+
+
+def save_chat_message(user, message):
+    """Send a chat message to everyone in the chat namespace, then queue it for the database (chat pool)"""
+    try:
+        timestamp = datetime.now(timezone.utc)
+        # The id is allocated now; the write-behind batch saves the row under it
+        message_id = next_chat_id()
+        encoded = encode_payload({
+            "id": message_id,
+            "user": user,
+            "message": message,
+            "timestamp": timestamp.isoformat(),
+        })
+        
+        # Encoded once for the recent-history buffer and the broadcast
+        get_chat_buffer().append(encoded)
+        broadcast("chat_message", encoded, namespace=CHAT_NAMESPACE)
+        get_chat_writer().add(message_id, user, message, timestamp)
+        
+    except Exception as e:
+        print(f"Error in chat_message: {e}")
+
+
+def send_chat_history(client_sid):
+    """Send one client the recent chat messages from the buffer (chat pool)"""
+    try:
+        socketio.emit("chat_history", get_chat_buffer().recent_payload(CHAT_HISTORY_LIMIT),
+                      room=client_sid, namespace=CHAT_NAMESPACE)
+        
+    except Exception as e:
+        print(f"Error loading chat history: {e}")
+        socketio.emit("error", {"message": "Failed to load chat history"}, room=client_sid, namespace=CHAT_NAMESPACE)
+
+
+def send_initial_data_async(client_sid, app, user_role, last_seq=None):
+    """Send a reconnecting client the broadcasts it missed, or anyone else the
+    initial state (currently playing + queue) as one event"""
     with app.app_context():
         try:
-            # Send currently playing track first if exists
-            currently_playing = get_currently_playing(app)
-            if currently_playing:
-                print(f"Sending currently playing track to {client_sid}: {currently_playing['track_name']}")
-                if currently_playing.get('is_playing', False):
-                    socketio.emit(
-                        "playback_started",
-                        {
-                            "track_uri": currently_playing['track_uri'],
-                            "track_name": currently_playing['track_name'],
-                            "device_id": currently_playing.get('device_id'),
-                            "is_playing": True
-                        },
-                        room=client_sid
-                    )
-                else:
-                    socketio.emit(
-                        "playback_paused",
-                        {
-                            "track_uri": currently_playing['track_uri'],
-                            "track_name": currently_playing['track_name'],
-                            "device_id": currently_playing.get('device_id'),
-                            "is_playing": False
-                        },
-                        room=client_sid
-                    )
-            
-            # Try to get queue from cache first, if not available, build it from database
-            queue_data = get_queue_snapshot(app)
-            if not queue_data:
-                print(f"No queue snapshot in cache, building from database for {client_sid}")
-                queue_data = update_queue_snapshot(app)
-            
-            # For listeners, filter out the currently playing track from the queue
-            if user_role == "listener" and currently_playing:
-                currently_playing_uri = currently_playing['track_uri']
-                queue_data = [item for item in queue_data if item['track_uri'] != currently_playing_uri]
-                print(f"Filtered out currently playing track for listener. Queue has {len(queue_data)} remaining items")
-            
-            print(f"Sending {len(queue_data)} queue items to {client_sid} (role: {user_role})")
-            
-            # Send queue items and vote counts
-            for item in queue_data:
-                # Send queue item
-                socketio.emit(
-                    "queue_updated",
-                    {
-                        "track_uri": item['track_uri'],
-                        "track_name": item['track_name'],
-                        "timestamp": item['timestamp'],
-                    },
-                    room=client_sid
-                )
-                
-                # Send vote counts if there are any votes
-                up_votes = item.get('up_votes', 0)
-                down_votes = item.get('down_votes', 0)
-                if up_votes > 0 or down_votes > 0:
-                    socketio.emit(
-                        "vote_updated",
-                        {
-                            "track_uri": item['track_uri'],
-                            "up_votes": up_votes,
-                            "down_votes": down_votes
-                        },
-                        room=client_sid
-                    )
+            # Replay only works while the log still holds every event after last_seq
+            if last_seq is not None:
+                events = get_broadcast_log().since(last_seq)
+                if events is not None:
+                    print(f"Replaying {len(events)} missed events to {client_sid} (after seq {last_seq})")
+                    socketio.emit("replay", {"events": events}, room=client_sid)
+                    return
+                print(f"Seq {last_seq} no longer in the broadcast log, sending full state to {client_sid}")
+            
+            # Listeners don't see the currently playing track in their queue
+            payload = get_initial_state_payload(app, hide_currently_playing=(user_role == "listener"))
+            print(f"Sending initial state to {client_sid} (role: {user_role})")
+            
+            # The payload is already encoded, shared with every other client at this version
+            socketio.emit("initial_state", payload, room=client_sid)
                     
         except Exception as e:
             print(f"Error sending initial data: {e}")
@@ -418,46 +708,35 @@ def send_initial_data_async(client_sid, app, user_role):
     def handle_restart_session():
         """Handle restart session request via socket - Only available to hosts"""
         try:
-            if session.get("role") != "host":
+            identity = current_identity()
+            if identity["role"] != "host" or not is_current_host(identity["user_id"]):
                 emit("error", {"message": "Only hosts can restart sessions"})
                 return
                 
-            import os
-            from backend.models.models import Vote, QueueItem, ChatMessage
+            # Release the host lease
+            from backend.utils.host import clear_host
+            clear_host()
             
-            # Remove host file
-            host_file = 'current_host.txt'
-            if os.path.exists(host_file):
-                os.remove(host_file)
+            # Clear the queue and its votes
+            get_queue_store().clear()
             
-            # Clear the queue, votes, chat, and currently playing
+            # Clear the chat, including messages not yet written
+            get_chat_writer().discard_pending()
             with get_db() as db:
-                # Clear all votes
-                votes_deleted = db.query(Vote).delete()
-                
-                # Clear all queue items
-                queue_deleted = db.query(QueueItem).delete()
-                
                 # Clear all chat messages
                 chat_deleted = db.query(ChatMessage).delete()
                 
                 db.commit()
+            get_chat_buffer().clear()
             
-            # Clear all cached data
-            try:
-                from flask import current_app
-                cache = current_app.cache
-                cache.clear()
-                
-                # Also clear in-memory cache
-                from backend.utils.cache import clear_in_memory_cache
-                clear_in_memory_cache()
-                
-            except Exception as e:
-                pass  # Silently handle cache clearing errors
+            record_queue_change("clear")
+            
+            # Clear cached playlists and the host token, in memory on every worker and in Redis
+            from backend.utils.cache import invalidate_playlist_cache
+            invalidate_playlist_cache()
             
             # Emit session restart to all clients
-            socketio.emit("session_restarted", {
+            broadcast("session_restarted", {
                 "message": "Session has been restarted. Please refresh your page.",
                 "timestamp": datetime.now(timezone.utc).isoformat()
             })
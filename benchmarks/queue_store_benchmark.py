@@ -0,0 +1,109 @@
+"""
+Queue store benchmark for BeatSync Mixer.
+Compares add / vote / next-track throughput of the SQL, in-memory and Redis queue stores.
+
+Usage:
+    python benchmarks/queue_store_benchmark.py [--tracks 200] [--votes 2000] [--reads 500] [--backends sql,memory,redis]
+
+The SQL backend uses DATABASE_URL (defaults to the local SQLite file) and the Redis
+backend uses REDIS_URL; a backend that can't be reached is skipped.
+Every run clears the store it measured, so don't point this at a live party.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models.models import init_db
+from backend.queue_store import SQLQueueStore, InMemoryQueueStore, RedisQueueStore
+
+
+def build_store(backend):
+    """Create the store for a backend name, or None if it isn't reachable"""
+    if backend == "memory":
+        return InMemoryQueueStore()
+    if backend == "sql":
+        init_db()
+        return SQLQueueStore()
+    if backend == "redis":
+        from backend.utils.config import create_manual_redis_client
+        client = create_manual_redis_client()
+        try:
+            if client and client.ping():
+                return RedisQueueStore(client, prefix="beatsync:bench:")
+        except Exception as e:
+            print(f"Redis unavailable: {e}")
+        return None
+    raise ValueError(f"Unknown backend: {backend}")
+
+
+def timed(label, count, func):
+    """Run func, print its throughput and return ops/sec"""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed else float("inf")
+    print(f"  {label:<12} {count:>6} ops in {elapsed:7.3f}s  ->  {rate:10.1f} ops/sec")
+    return rate
+
+
+def run_benchmark(store, track_count, vote_count, read_count):
+    tracks = [
+        {"track_uri": f"spotify:track:bench{i:05d}", "track_name": f"Benchmark Track {i} - Artist"}
+        for i in range(track_count)
+    ]
+    rng = random.Random(42)
+    votes = [
+        (rng.choice(tracks)["track_uri"], f"user{rng.randrange(50)}", rng.choice(("up", "up", "down")))
+        for _ in range(vote_count)
+    ]
+
+    store.clear()
+    results = {}
+    try:
+        results["add"] = timed("add", track_count, lambda: [
+            store.add_track(track["track_uri"], track["track_name"]) for track in tracks
+        ])
+        results["vote"] = timed("vote", vote_count, lambda: [
+            store.cast_vote(track_uri, user_id, vote_type) for track_uri, user_id, vote_type in votes
+        ])
+        results["next_track"] = timed("next-track", read_count, lambda: [
+            store.get_next_track() for _ in range(read_count)
+        ])
+        results["get_items"] = timed("get-items", read_count, lambda: [
+            store.get_items() for _ in range(read_count)
+        ])
+    finally:
+        store.clear()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the queue store backends")
+    parser.add_argument("--tracks", type=int, default=200)
+    parser.add_argument("--votes", type=int, default=2000)
+    parser.add_argument("--reads", type=int, default=500)
+    parser.add_argument("--backends", default="sql,memory,redis")
+    args = parser.parse_args()
+
+    summary = {}
+    for backend in [name.strip() for name in args.backends.split(",") if name.strip()]:
+        store = build_store(backend)
+        if store is None:
+            print(f"Skipping {backend}: backend not available")
+            continue
+        print(f"{backend}:")
+        summary[backend] = run_benchmark(store, args.tracks, args.votes, args.reads)
+
+    if summary:
+        print("\nops/sec      " + "".join(f"{name:>12}" for name in summary))
+        for metric in ("add", "vote", "next_track", "get_items"):
+            print(f"{metric:<12} " + "".join(f"{summary[name][metric]:12.1f}" for name in summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Socket.IO fan-out load test for BeatSync Mixer.
+Starts N app processes linked by a Socket.IO message queue, connects listeners
+spread across them (sticky: each client stays on one process), has a few
+senders cast votes, and measures how many `vote_updated` broadcasts per second
+reach the listeners. Run it for several process counts to see how fan-out
+throughput scales.
+
+Usage:
+    python benchmarks/socketio_fanout_load_test.py --workers 1,2,4 --listeners 60 --votes 200
+
+Needs a reachable message queue (--message-queue, default REDIS_URL or
+redis://localhost:6379/0). The processes are started with gunicorn the same
+way as the Procfile, one worker each, on ports --base-port and up.
+"""
+
+import os
+import sys
+import time
+import uuid
+import signal
+import argparse
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+
+import requests
+import socketio
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_workers(count, base_port, message_queue, database_url, log_dir=None, extra_env=None):
+    """Start `count` single-worker app processes and wait until they answer /health"""
+    env = dict(os.environ)
+    env.update({
+        "SOCKETIO_MESSAGE_QUEUE": message_queue,
+        "REDIS_URL": message_queue,
+        "QUEUE_STORE": env.get("QUEUE_STORE", "redis"),
+        "DATABASE_URL": database_url,
+        "FLASK_ENV": "development",
+    })
+    env.update(extra_env or {})
+    for key in ("SPOTIFY_CLIENT_ID", "SPOTIFY_CLIENT_SECRET"):
+        env.setdefault(key, "load-test")
+    env.setdefault("SPOTIFY_REDIRECT_URI", "http://localhost/callback")
+    # Each simulated sender votes far faster than a person; lift the per-user limits
+    env.setdefault("RATE_LIMIT_VOTE", "1000000,1000000")
+    env.setdefault("RATE_LIMIT_QUEUE_ADD", "1000000,1000000")
+
+    processes = []
+    for index in range(count):
+        port = base_port + index
+        output = open(os.path.join(log_dir, f"worker-{count}-{port}.log"), "w") if log_dir else subprocess.DEVNULL
+        processes.append(subprocess.Popen(
+            ["gunicorn", "--worker-class", "eventlet", "-w", "1", "--bind", f"127.0.0.1:{port}", "app:app"],
+            cwd=PROJECT_ROOT, env=env, stdout=output, stderr=subprocess.STDOUT,
+            start_new_session=True
+        ))
+
+    urls = [f"http://127.0.0.1:{base_port + index}" for index in range(count)]
+    deadline = time.time() + 60
+    for url in urls:
+        while True:
+            try:
+                if requests.get(f"{url}/health", timeout=1).status_code == 200:
+                    break
+            except requests.RequestException:
+                pass
+            if time.time() > deadline:
+                stop_workers(processes)
+                raise RuntimeError(f"Worker at {url} did not start")
+            time.sleep(0.2)
+    return processes, urls
+
+
+def stop_workers(processes):
+    for process in processes:
+        try:
+            os.killpg(process.pid, signal.SIGINT)
+        except ProcessLookupError:
+            pass
+    for process in processes:
+        process.wait(timeout=10)
+
+
+def connect_listener(url, attempts=3, transports=("polling",)):
+    """Join as a listener over HTTP, then open a Socket.IO connection with that session"""
+    for attempt in range(1, attempts + 1):
+        try:
+            http = requests.Session()
+            http.get(f"{url}/join-listener", allow_redirects=False, timeout=10)
+            client = socketio.Client(reconnection=False, http_session=http)
+            client.connect(url, transports=list(transports), wait_timeout=10)
+            return client
+        except (requests.RequestException, socketio.exceptions.ConnectionError):
+            if attempt == attempts:
+                raise
+            time.sleep(0.5 * attempt)
+
+
+def listener_process(urls, count, expected, timeout, ready, go, results):
+    """Hold `count` listeners and report how many vote_updated events they got"""
+    # Each vote produces a distinct up_votes count, so counting distinct values
+    # per listener ignores any duplicate deliveries
+    seen = [set() for _ in range(count)]
+    received = [0]
+    last_received = [0.0]
+    lock = threading.Lock()
+
+    def on_vote_updated(index, data):
+        with lock:
+            if data["up_votes"] not in seen[index]:
+                seen[index].add(data["up_votes"])
+                received[0] += 1
+                last_received[0] = time.time()
+
+    clients = []
+    for index in range(count):
+        client = connect_listener(urls[index % len(urls)])
+        client.on("vote_updated", lambda data, index=index: on_vote_updated(index, data))
+        clients.append(client)
+    ready.put(count)
+
+    go.wait()
+    target = expected * count
+    deadline = time.time() + timeout
+    while received[0] < target and time.time() < deadline:
+        time.sleep(0.05)
+    results.put((received[0], target, last_received[0]))
+
+    for client in clients:
+        client.disconnect()
+
+
+def run_round(workers, args, base_port):
+    # A fresh track per round so listeners don't get vote counts left by earlier rounds
+    track_uri = f"spotify:track:loadtest{uuid.uuid4().hex[:8]}"
+    database_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="beatsync-load-"), "load.db")
+    processes, urls = start_workers(workers, base_port, args.message_queue, database_url, args.log_dir)
+    try:
+        # Senders are spread over the processes just like listeners
+        senders = [connect_listener(urls[index % len(urls)]) for index in range(args.senders)]
+        senders[0].emit("queue_add", {"track_uri": track_uri, "track_name": "Load Test - BeatSync"})
+        time.sleep(0.5)
+
+        ctx = multiprocessing.get_context("spawn")
+        ready, results, go = ctx.Queue(), ctx.Queue(), ctx.Event()
+        per_process = max(1, args.listeners // args.client_processes)
+        listeners = []
+        remaining = args.listeners
+        while remaining > 0:
+            count = min(per_process, remaining)
+            remaining -= count
+            listener = ctx.Process(target=listener_process, args=(urls, count, args.votes, args.timeout, ready, go, results))
+            listener.start()
+            listeners.append(listener)
+        connected = sum(ready.get(timeout=120) for _ in listeners)
+
+        # Every vote is broadcast to every listener
+        start = time.time()
+        go.set()
+
+        def send(sender, votes):
+            # Keep at most --window votes in flight per sender: the server rejects
+            # polling requests that batch too many packets at once
+            in_flight = threading.Semaphore(args.window)
+            sender.on("vote_success", lambda data: in_flight.release())
+            sender.on("error", lambda data: in_flight.release())
+            for _ in range(votes):
+                in_flight.acquire(timeout=10)
+                try:
+                    sender.emit("vote_add", {
+                        "track_uri": track_uri,
+                        "vote": "up",
+                        "client_vote_id": uuid.uuid4().hex
+                    })
+                except socketio.exceptions.SocketIOError as e:
+                    print(f"  Sender dropped: {e}")
+                    return
+
+        votes_per_sender = [args.votes // args.senders + (1 if index < args.votes % args.senders else 0)
+                            for index in range(args.senders)]
+        threads = [threading.Thread(target=send, args=(sender, votes))
+                   for sender, votes in zip(senders, votes_per_sender)]
+        [thread.start() for thread in threads]
+        [thread.join() for thread in threads]
+
+        delivered, expected, finished = 0, 0, start
+        for _ in listeners:
+            got, target, last = results.get(timeout=args.timeout + 60)
+            delivered += got
+            expected += target
+            finished = max(finished, last)
+        [listener.join(timeout=30) for listener in listeners]
+        for sender in senders:
+            if sender.connected:
+                sender.disconnect()
+
+        elapsed = max(finished - start, 1e-6)
+        return {
+            "workers": workers,
+            "listeners": connected,
+            "delivered": delivered,
+            "expected": expected,
+            "seconds": elapsed,
+            "rate": delivered / elapsed
+        }
+    finally:
+        stop_workers(processes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Socket.IO broadcast fan-out across app processes")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated process counts to test")
+    parser.add_argument("--listeners", type=int, default=60)
+    parser.add_argument("--senders", type=int, default=4)
+    parser.add_argument("--votes", type=int, default=200)
+    parser.add_argument("--window", type=int, default=1, help="Votes in flight per sender")
+    parser.add_argument("--client-processes", type=int, default=4)
+    parser.add_argument("--timeout", type=int, default=60, help="Seconds to wait for every broadcast to arrive")
+    parser.add_argument("--base-port", type=int, default=8100)
+    parser.add_argument("--log-dir", help="Write each app process's output here")
+    parser.add_argument("--message-queue", default=os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    args = parser.parse_args()
+
+    rows = []
+    base_port = args.base_port
+    for workers in [int(count) for count in args.workers.split(",") if count.strip()]:
+        print(f"Running with {workers} worker process(es)...")
+        # Fresh ports each round so a previous round's sockets can't get in the way
+        row = run_round(workers, args, base_port)
+        base_port += workers
+        rows.append(row)
+        print(f"  {row['delivered']}/{row['expected']} broadcasts delivered to {row['listeners']} listeners "
+              f"in {row['seconds']:.2f}s -> {row['rate']:.1f} deliveries/sec")
+
+    if rows:
+        baseline = rows[0]["rate"]
+        print("\nworkers  deliveries/sec  speedup")
+        for row in rows:
+            print(f"{row['workers']:>7}  {row['rate']:>15.1f}  {row['rate'] / baseline:>6.2f}x")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+Socket.IO transport mode benchmark for BeatSync Mixer.
+Runs the app once per SOCKETIO_MODE (polling on threads, websocket on
+eventlet), connects a crowd of simulated listeners, casts votes one at a time
+and records when each `vote_updated` broadcast reaches each listener.
+Reports delivered messages/sec and p50/p99 delivery latency per mode.
+
+Usage:
+    python benchmarks/socketio_mode_benchmark.py --listeners 500 --votes 100
+
+Each mode runs in one gunicorn eventlet process, as in the Procfile, with an
+in-process queue store so no Redis is needed.
+"""
+
+import os
+import sys
+import time
+import uuid
+import argparse
+import tempfile
+import threading
+import multiprocessing
+
+from socketio_fanout_load_test import start_workers, stop_workers, connect_listener
+
+
+MODE_TRANSPORTS = {
+    # What a browser's io() ends up using against each server mode
+    "polling": ("polling",),
+    "websocket": ("polling", "websocket"),
+}
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def listener_process(url, transports, count, expected, timeout, ready, go, results):
+    """Hold `count` listeners and report (up_votes, received_at) for each first delivery"""
+    seen = [set() for _ in range(count)]
+    deliveries = []
+    lock = threading.Lock()
+
+    def on_vote_updated(index, data):
+        received_at = time.time()
+        with lock:
+            if data["up_votes"] not in seen[index]:
+                seen[index].add(data["up_votes"])
+                deliveries.append((data["up_votes"], received_at))
+
+    clients = []
+    for index in range(count):
+        client = connect_listener(url, transports=transports)
+        client.on("vote_updated", lambda data, index=index: on_vote_updated(index, data))
+        clients.append(client)
+    ready.put(count)
+
+    go.wait()
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with lock:
+            if len(deliveries) >= expected * count:
+                break
+        time.sleep(0.05)
+    with lock:
+        results.put(list(deliveries))
+
+    for client in clients:
+        client.disconnect()
+
+
+def run_mode(mode, args, port):
+    track_uri = f"spotify:track:modebench{uuid.uuid4().hex[:8]}"
+    database_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="beatsync-mode-"), "bench.db")
+    processes, urls = start_workers(
+        1, port, "", database_url, args.log_dir,
+        extra_env={"SOCKETIO_MODE": mode, "QUEUE_STORE": "memory", "STATE_STORE": "memory", "REDIS_URL": ""}
+    )
+    url = urls[0]
+    transports = MODE_TRANSPORTS[mode]
+    try:
+        ctx = multiprocessing.get_context("spawn")
+        ready, results, go = ctx.Queue(), ctx.Queue(), ctx.Event()
+        per_process = max(1, -(-args.listeners // args.client_processes))
+        listeners = []
+        remaining = args.listeners
+        while remaining > 0:
+            count = min(per_process, remaining)
+            remaining -= count
+            listener = ctx.Process(target=listener_process,
+                                   args=(url, transports, count, args.votes, args.timeout, ready, go, results))
+            listener.start()
+            listeners.append(listener)
+        connected = sum(ready.get(timeout=300) for _ in listeners)
+
+        # The sender joins once the crowd is connected so its idle connection
+        # doesn't sit through the connect storm
+        sender = connect_listener(url, transports=transports)
+        added = threading.Event()
+        sender.on("queue_add_success", lambda data: added.set())
+        sender.emit("queue_add", {"track_uri": track_uri, "track_name": "Mode Benchmark - BeatSync"})
+        added.wait(timeout=30)
+
+        # One vote in flight at a time, so vote N is the broadcast with up_votes == N
+        sent_at = {}
+        acked = threading.Semaphore(0)
+        sender.on("vote_success", lambda data: acked.release())
+        sender.on("error", lambda data: acked.release())
+
+        start = time.time()
+        go.set()
+        for vote in range(1, args.votes + 1):
+            sent_at[vote] = time.time()
+            sender.emit("vote_add", {"track_uri": track_uri, "vote": "up", "client_vote_id": uuid.uuid4().hex})
+            acked.acquire(timeout=10)
+
+        latencies = []
+        finished = start
+        for _ in listeners:
+            for up_votes, received_at in results.get(timeout=args.timeout + 60):
+                if up_votes in sent_at:
+                    latencies.append(received_at - sent_at[up_votes])
+                    finished = max(finished, received_at)
+        [listener.join(timeout=30) for listener in listeners]
+        if sender.connected:
+            sender.disconnect()
+
+        elapsed = max(finished - start, 1e-6)
+        return {
+            "mode": mode,
+            "listeners": connected,
+            "delivered": len(latencies),
+            "expected": connected * args.votes,
+            "rate": len(latencies) / elapsed,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+        }
+    finally:
+        stop_workers(processes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Socket.IO polling and websocket modes")
+    parser.add_argument("--modes", default="polling,websocket", help="Comma-separated SOCKETIO_MODE values")
+    parser.add_argument("--listeners", type=int, default=500)
+    parser.add_argument("--votes", type=int, default=100)
+    parser.add_argument("--client-processes", type=int, default=10)
+    parser.add_argument("--timeout", type=int, default=120, help="Seconds to wait for every broadcast to arrive")
+    parser.add_argument("--base-port", type=int, default=8200)
+    parser.add_argument("--log-dir", help="Write each app process's output here")
+    args = parser.parse_args()
+
+    rows = []
+    for index, mode in enumerate(mode.strip() for mode in args.modes.split(",") if mode.strip()):
+        if mode not in MODE_TRANSPORTS:
+            print(f"Skipping unknown mode {mode}")
+            continue
+        print(f"Running {mode} mode with {args.listeners} listeners...")
+        row = run_mode(mode, args, args.base_port + index)
+        rows.append(row)
+        print(f"  {row['delivered']}/{row['expected']} broadcasts delivered to {row['listeners']} listeners")
+
+    if rows:
+        print("\nmode       messages/sec  p50 ms   p99 ms")
+        for row in rows:
+            print(f"{row['mode']:<10} {row['rate']:>12.1f}  {row['p50_ms']:>7.1f}  {row['p99_ms']:>7.1f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
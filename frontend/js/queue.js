@@ -75,52 +75,56 @@ async function refreshQueueDisplay() {
   try {
     const response = await fetch('/queue/');
     const data = await response.json();
-    
-    queueCount = data.count || 0;
-    updateQueueDisplay();
-    
-    const queueList = document.getElementById('queue');
-    if (queueList && data.queue) {
-      queueList.innerHTML = '';
-      data.queue.forEach(item => {
-        const li = document.createElement('li');
-        const trackId = item.track_uri;
-        const safeTrackId = trackId.replace(/[^a-zA-Z0-9]/g, '_');
-        const timestamp = new Date(item.timestamp || Date.now()).getTime();
-        
-        li.setAttribute('data-track-uri', trackId);
-        li.setAttribute('data-timestamp', timestamp);
-        li.className = 'queue-item';
-        li.style.position = 'relative';
-        li.innerHTML = `
-          <div>
-            <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 8px;">
-              <span style="font-weight: bold;">${item.track_name || item.track_uri}</span>
-              <span class="vote-score" id="score-${safeTrackId}" style="background-color: #333; padding: 2px 8px; border-radius: 12px; font-size: 12px; color: #1db954;">Score: ${item.vote_score || 0}</span>
-            </div>
-            <small style="color: #666;">Added: ${new Date(item.timestamp || Date.now()).toLocaleTimeString()}</small>
-            <div class="vote-buttons">
-              <button class="vote-btn" onclick="voteTrack('${trackId}', 'up', this)">👍</button>
-              <span class="vote-count" id="up-${safeTrackId}">${item.upvotes || 0}</span>
-              <button class="vote-btn" onclick="voteTrack('${trackId}', 'down', this)">👎</button>
-              <span class="vote-count" id="down-${safeTrackId}">${item.downvotes || 0}</span>
-              ${window.userRole === 'host' ? `<button onclick="playTrackFromQueue('${trackId}')" style="background-color: #1db954; margin: 0 5px;">▶️ Play</button>` : ''}
-              ${window.userRole === 'host' ? `<button onclick="showAddToPlaylistModal('${trackId}', '${extractSongTitleFromTrackName(item.track_name || '').replace(/'/g, "\\'")}', '${extractArtistFromTrackName(item.track_name || '').replace(/'/g, "\\'")}', '${(item.track_album || '').replace(/'/g, "\\'")}', ${item.track_duration || 0})" style="background-color: #9b59b6; margin: 0 5px; color: white; border: none; padding: 4px 8px; border-radius: 4px; cursor: pointer;">📋 Add to Playlist</button>` : ''}
-              <button class="recommendations-btn" onclick="loadRecs('${trackId}', '${safeTrackId}')">See Similar Tracks</button>
-            </div>
-            <div id="recs-${safeTrackId}" class="recommendations-list"></div>
-          </div>
-        `;
-        queueList.appendChild(li);
-      });
-    }
-    
-    console.log('Queue refreshed, count:', queueCount);
+    renderQueue(data);
   } catch (error) {
     console.error('Error refreshing queue:', error);
   }
 }
 
+// Render a {queue, count} payload from GET /queue/ or the initial_state event
+function renderQueue(data) {
+  queueCount = data.count || 0;
+  updateQueueDisplay();
+  
+  const queueList = document.getElementById('queue');
+  if (queueList && data.queue) {
+    queueList.innerHTML = '';
+    data.queue.forEach(item => {
+      const li = document.createElement('li');
+      const trackId = item.track_uri;
+      const safeTrackId = trackId.replace(/[^a-zA-Z0-9]/g, '_');
+      const timestamp = new Date(item.timestamp || Date.now()).getTime();
+      
+      li.setAttribute('data-track-uri', trackId);
+      li.setAttribute('data-timestamp', timestamp);
+      li.className = 'queue-item';
+      li.style.position = 'relative';
+      li.innerHTML = `
+        <div>
+          <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 8px;">
+            <span style="font-weight: bold;">${item.track_name || item.track_uri}</span>
+            <span class="vote-score" id="score-${safeTrackId}" style="background-color: #333; padding: 2px 8px; border-radius: 12px; font-size: 12px; color: #1db954;">Score: ${item.vote_score || 0}</span>
+          </div>
+          <small style="color: #666;">Added: ${new Date(item.timestamp || Date.now()).toLocaleTimeString()}</small>
+          <div class="vote-buttons">
+            <button class="vote-btn" onclick="voteTrack('${trackId}', 'up', this)">👍</button>
+            <span class="vote-count" id="up-${safeTrackId}">${item.upvotes || 0}</span>
+            <button class="vote-btn" onclick="voteTrack('${trackId}', 'down', this)">👎</button>
+            <span class="vote-count" id="down-${safeTrackId}">${item.downvotes || 0}</span>
+            ${window.userRole === 'host' ? `<button onclick="playTrackFromQueue('${trackId}')" style="background-color: #1db954; margin: 0 5px;">▶️ Play</button>` : ''}
+            ${window.userRole === 'host' ? `<button onclick="showAddToPlaylistModal('${trackId}', '${extractSongTitleFromTrackName(item.track_name || '').replace(/'/g, "\\'")}', '${extractArtistFromTrackName(item.track_name || '').replace(/'/g, "\\'")}', '${(item.track_album || '').replace(/'/g, "\\'")}', ${item.track_duration || 0})" style="background-color: #9b59b6; margin: 0 5px; color: white; border: none; padding: 4px 8px; border-radius: 4px; cursor: pointer;">📋 Add to Playlist</button>` : ''}
+            <button class="recommendations-btn" onclick="loadRecs('${trackId}', '${safeTrackId}')">See Similar Tracks</button>
+          </div>
+          <div id="recs-${safeTrackId}" class="recommendations-list"></div>
+        </div>
+      `;
+      queueList.appendChild(li);
+    });
+  }
+  
+  console.log('Queue refreshed, count:', queueCount);
+}
+
 function voteTrack(trackUri, voteType, buttonElement) {
   // Check if socket is connected
   if (typeof socket === 'undefined' || !socket.connected) {
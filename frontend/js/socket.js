@@ -2,11 +2,36 @@
  * Socket.IO Connection and Events Module
  */
 
+// Highest broadcast sequence seen; sent when reconnecting so the server can
+// replay just the events we missed instead of resending everything
+let lastSeq = null;
+const seenSeqs = new Set();
+
+function noteSeq(seq) {
+  lastSeq = lastSeq === null ? seq : Math.max(lastSeq, seq);
+  seenSeqs.add(seq);
+  if (seenSeqs.size > 1000) {
+    seenSeqs.delete(seenSeqs.values().next().value);
+  }
+}
+
 // Socket initialization
-const socket = io();
+const socket = io({
+  auth: cb => cb(lastSeq === null ? {} : { last_seq: lastSeq })
+});
+
+socket.onAny((event, data) => {
+  if (data && typeof data.seq === 'number') {
+    noteSeq(data.seq);
+  }
+});
 let socketConnected = false;
 const socketId = Math.random().toString(36).substr(2, 8);
 
+// Keep-alive interval; must stay well under the server's HOST_LEASE_TTL and
+// LISTENER_LEASE_TTL (120s and 90s by default)
+const HEARTBEAT_INTERVAL_MS = 30000;
+
 // Make socket globally accessible
 window.socket = socket;
 window.socketConnected = socketConnected;
@@ -25,16 +50,70 @@ socket.on('connect', function() {
     statusElement.textContent = 'Connected';
   }
   
-  // Load chat history after connection
-  socket.emit("load_chat_history");
+  // The queue arrives in initial_state, or as missed events in replay
+});
+
+// Everything a freshly connected client needs, in one event
+socket.on('initial_state', data => {
+  // The server sends this payload pre-serialized
+  const state = typeof data === 'string' ? JSON.parse(data) : data;
+  console.log(`Initial state v${state.version}: ${state.count} queued`);
   
-  // Load queue display on initial connection
-  if (typeof refreshQueueDisplay === 'function') {
-    console.log('Loading initial queue on socket connection');
-    setTimeout(() => refreshQueueDisplay(), 500); // Small delay to ensure DOM is ready
+  const current = state.currently_playing;
+  if (current && current.is_playing && typeof updateNowPlaying === 'function') {
+    updateNowPlaying(current);
+  } else if (current && typeof updatePlayPauseButton === 'function') {
+    updatePlayPauseButton(false);
   }
+  
+  if (typeof renderQueue === 'function') {
+    renderQueue(state);
+  }
+  
+  // Start counting from the state we just loaded
+  lastSeq = state.seq;
+  seenSeqs.clear();
 });
 
+// How many people are here; sent on connect, then at most every few seconds when it changes
+socket.on('connected', data => {
+  if (data && data.presence && typeof updatePresence === 'function') {
+    updatePresence(data.presence);
+  }
+});
+
+socket.on('presence_updated', counts => {
+  if (typeof updatePresence === 'function') {
+    updatePresence(counts);
+  }
+});
+
+// Events broadcast while we were disconnected, oldest first
+socket.on('replay', data => {
+  console.log(`Replaying ${data.events.length} missed events`);
+  data.events.forEach(entry => {
+    if (seenSeqs.has(entry.seq)) {
+      return;
+    }
+    noteSeq(entry.seq);
+    socket.listeners(entry.event).forEach(handler => handler(entry.data));
+  });
+});
+
+// The server dropped our backlog of events because we fell too far behind
+// (slow connection); ask for a fresh copy of the whole state instead
+socket.on('resync', () => {
+  console.log('Fell behind on updates, resyncing state');
+  socket.emit('sync_state');
+});
+
+// Heartbeat keeps the host lease and this listener's number alive while the page is open
+setInterval(() => {
+  if (socketConnected) {
+    socket.emit('heartbeat');
+  }
+}, HEARTBEAT_INTERVAL_MS);
+
 socket.on('disconnect', function() {
   console.log(`[SOCKET ${socketId}] Disconnected`);
   socketConnected = false;
@@ -113,6 +192,13 @@ socket.on("track_added", data => {
   }
 });
 
+socket.on("tracks_added", data => {
+  console.log(`Tracks added in bulk: ${data.count}`, data);
+  if (typeof refreshQueueDisplay === 'function') {
+    refreshQueueDisplay();
+  }
+});
+
 socket.on("track_removed", data => {
   console.log('Track removed:', data);
   if (typeof refreshQueueDisplay === 'function') {
@@ -154,21 +240,79 @@ socket.on("queue_reordered", () => {
   }
 });
 
-// Chat events
-socket.on("chat_message", data => {
+// Chat has its own namespace on the same connection. We only join it while
+// the chat box is open, so a collapsed chat costs no chat traffic at all.
+const chatSocket = io('/chat', { autoConnect: false });
+window.chatSocket = chatSocket;
+
+function setChatOpen(open) {
+  if (open && !chatSocket.active) {
+    chatSocket.connect();
+  } else if (!open && chatSocket.active) {
+    chatSocket.disconnect();
+  }
+}
+window.setChatOpen = setChatOpen;
+
+// (Re)joining chat - fetch what was said while we weren't listening
+chatSocket.on("connect", () => {
+  chatSocket.emit("load_chat_history");
+});
+
+chatSocket.on("chat_message", data => {
   console.log('Chat message received:', data);
   if (typeof displayChatMessage === 'function') {
     displayChatMessage(data);
   }
 });
 
-socket.on("chat_history", data => {
+chatSocket.on("chat_history", data => {
   console.log('Chat history received:', data);
   if (typeof loadChatHistory === 'function') {
     loadChatHistory(data.messages);
   }
 });
 
+chatSocket.on("chat_page", page => {
+  if (typeof prependChatHistory === 'function') {
+    prependChatHistory(page);
+  }
+});
+
+chatSocket.on("chat_cleared", () => {
+  if (typeof loadChatHistory === 'function') {
+    loadChatHistory([]);
+  }
+});
+
+chatSocket.on("error", data => {
+  console.log('Chat error:', data);
+  if (typeof chatPageLoading !== 'undefined') {
+    chatPageLoading = false;
+  }
+  if (data && data.message && typeof showNotification === 'function') {
+    showNotification(`❌ ${data.message}`, 'error');
+  }
+});
+
+// Our host lease lapsed and someone else is hosting: reload as a listener
+socket.on("host_lost", data => {
+  console.log('Host role lost:', data);
+  if (typeof showNotification === 'function') {
+    showNotification(`⚠️ ${data.message}`, 'info');
+  }
+  setTimeout(() => {
+    window.location.reload();
+  }, 3000);
+});
+
+// Signed out or changed role (possibly in another tab): reload so this page
+// reconnects with the new identity, or lands on role selection
+socket.on("session_changed", () => {
+  console.log('Session changed, reloading');
+  window.location.reload();
+});
+
 // Session restart handling
 socket.on("session_restarted", data => {
   console.log('Session restarted:', data);
@@ -48,6 +48,14 @@ function updateConnectionStatus(status) {
   }
 }
 
+function updatePresence(counts) {
+  const presenceElement = document.getElementById('presence-count');
+  if (presenceElement && counts) {
+    presenceElement.textContent = `🎧 ${counts.total} listening`;
+    presenceElement.title = `${counts.host} host, ${counts.listener} listeners, ${counts.guest} guests`;
+  }
+}
+
 function updateNowPlaying(track) {
   const nowPlayingElement = document.querySelector('.now-playing');
   const trackNameElement = document.querySelector('.track-name');
@@ -118,10 +126,37 @@ function toggleChat() {
   
   if (chatBox && toggleBtn) {
     chatBox.classList.toggle('minimized');
-    toggleBtn.textContent = chatBox.classList.contains('minimized') ? '+' : '−';
+    const minimized = chatBox.classList.contains('minimized');
+    toggleBtn.textContent = minimized ? '+' : '−';
+    
+    // Only receive chat traffic while the chat is open
+    if (typeof setChatOpen === 'function') {
+      setChatOpen(!minimized);
+    }
   }
 }
 
+// Chat text comes from other users, so it is only ever set as text, never as HTML
+function createChatMessageElement(data, timeString) {
+  const messageDiv = document.createElement('div');
+  messageDiv.className = 'chat-message';
+
+  const userSpan = document.createElement('span');
+  userSpan.className = 'chat-user';
+  userSpan.textContent = `${data.user}:`;
+
+  const textSpan = document.createElement('span');
+  textSpan.className = 'chat-text';
+  textSpan.textContent = data.message;
+
+  const timeSpan = document.createElement('span');
+  timeSpan.className = 'chat-time';
+  timeSpan.textContent = timeString;
+
+  messageDiv.append(userSpan, ' ', textSpan, ' ', timeSpan);
+  return messageDiv;
+}
+
 function displayChatMessage(data) {
   const chatMessages = document.getElementById('chat-messages');
   if (!chatMessages) return;
@@ -131,24 +166,30 @@ function displayChatMessage(data) {
     ? new Date(data.timestamp).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' })
     : new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }); // Fallback to current time
   
-  const messageDiv = document.createElement('div');
-  messageDiv.className = 'chat-message';
-  messageDiv.innerHTML = `
-    <span class="chat-user">${data.user}:</span>
-    <span class="chat-text">${data.message}</span>
-    <span class="chat-time">${timeString}</span>
-  `;
+  const messageDiv = createChatMessageElement(data, timeString);
   
   chatMessages.appendChild(messageDiv);
   chatMessages.scrollTop = chatMessages.scrollHeight;
+  
+  if (!chatOldest) {
+    chatOldest = data;
+  }
 }
 
+// Oldest message shown, the cursor for loading the page before it
+let chatOldest = null;
+let chatHasMore = true;
+let chatPageLoading = false;
+
 function loadChatHistory(messages) {
   const chatMessages = document.getElementById('chat-messages');
   if (!chatMessages) return;
   
   // Clear existing messages
   chatMessages.innerHTML = '';
+  chatOldest = messages.length ? messages[0] : null;
+  chatHasMore = messages.length > 0;
+  chatPageLoading = false;
   
   // Load all messages from history
   messages.forEach(data => {
@@ -157,13 +198,7 @@ function loadChatHistory(messages) {
       ? new Date(data.timestamp).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' })
       : '';
     
-    const messageDiv = document.createElement('div');
-    messageDiv.className = 'chat-message';
-    messageDiv.innerHTML = `
-      <span class="chat-user">${data.user}:</span>
-      <span class="chat-text">${data.message}</span>
-      <span class="chat-time">${timeString}</span>
-    `;
+    const messageDiv = createChatMessageElement(data, timeString);
     chatMessages.appendChild(messageDiv);
   });
   
@@ -171,6 +206,51 @@ function loadChatHistory(messages) {
   chatMessages.scrollTop = chatMessages.scrollHeight;
 }
 
+// Older messages, inserted above the ones already shown
+function prependChatHistory(page) {
+  chatPageLoading = false;
+  chatHasMore = page.has_more;
+  
+  const chatMessages = document.getElementById('chat-messages');
+  if (!chatMessages || !page.messages.length) return;
+  
+  // Keep the view where it was while content is added above it
+  const previousHeight = chatMessages.scrollHeight;
+  const fragment = document.createDocumentFragment();
+  page.messages.forEach(data => {
+    const timeString = data.timestamp 
+      ? new Date(data.timestamp).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' })
+      : '';
+    
+    const messageDiv = createChatMessageElement(data, timeString);
+    fragment.appendChild(messageDiv);
+  });
+  chatMessages.insertBefore(fragment, chatMessages.firstChild);
+  chatMessages.scrollTop += chatMessages.scrollHeight - previousHeight;
+  chatOldest = page.messages[0];
+}
+
+// Fetch the previous page when the chat is scrolled to the top
+function loadOlderChatMessages() {
+  if (chatPageLoading || !chatHasMore || !chatOldest || typeof chatSocket === 'undefined') return;
+  chatPageLoading = true;
+  chatSocket.emit('load_chat_page', {
+    before_id: chatOldest.id,
+    before_timestamp: chatOldest.timestamp
+  });
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+  const chatMessages = document.getElementById('chat-messages');
+  if (chatMessages) {
+    chatMessages.addEventListener('scroll', () => {
+      if (chatMessages.scrollTop < 40) {
+        loadOlderChatMessages();
+      }
+    });
+  }
+});
+
 function sendChatMessage(event) {
   if (event) event.preventDefault();
   
@@ -179,11 +259,11 @@ function sendChatMessage(event) {
   
   if (!message) return;
   
-  if (typeof socket !== 'undefined') {
+  if (typeof chatSocket !== 'undefined') {
     // Try multiple sources for username
     const user = window.displayName || window.userId || window.userRole || 'Anonymous';
     
-    socket.emit('chat_message', {
+    chatSocket.emit('chat_message', {
       message: message,
       user: user
     });
@@ -263,6 +343,7 @@ function removeRoleIndicator() {
 // Export functions
 window.showNotification = showNotification;
 window.updateConnectionStatus = updateConnectionStatus;
+window.updatePresence = updatePresence;
 window.updateNowPlaying = updateNowPlaying;
 window.updatePlayPauseButton = updatePlayPauseButton;
 window.enablePlaybackControls = enablePlaybackControls;
@@ -270,6 +351,7 @@ window.formatTime = formatTime;
 window.updateProgress = updateProgress;
 window.toggleChat = toggleChat;
 window.displayChatMessage = displayChatMessage;
+window.prependChatHistory = prependChatHistory;
 window.sendChatMessage = sendChatMessage;
 window.initializeUI = initializeUI;
 window.addRoleIndicator = addRoleIndicator;
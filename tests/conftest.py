@@ -0,0 +1,59 @@
+"""
+Shared test setup: the database engine is created when backend.models is
+first imported, so point it at a throwaway SQLite file before any test
+module imports the backend. The Spotify client is also built at import time
+and needs (placeholder) credentials.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+_db_dir = tempfile.mkdtemp(prefix="beatsync-tests-")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_db_dir, "test.db")
+os.environ.setdefault("SPOTIFY_CLIENT_ID", "test-client-id")
+os.environ.setdefault("SPOTIFY_CLIENT_SECRET", "test-client-secret")
+os.environ.setdefault("SPOTIFY_REDIRECT_URI", "http://localhost/callback")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db_tables():
+    """Fresh tables for one test"""
+    from backend.models.database_config import Base, engine, init_db
+    init_db()
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def redis_client():
+    """In-process Redis (with Lua scripting) configured like the app's clients"""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+def app(monkeypatch):
+    """Bare Flask app with the app's cache wrapper (no Redis), an in-memory queue
+    store and an in-process broadcast log"""
+    from flask import Flask
+    from flask_caching import Cache
+    import backend.queue_store
+    from backend.queue_store import InMemoryQueueStore
+    from backend.utils import cache, config
+    from backend.websockets import broadcast
+
+    monkeypatch.setattr(config, "create_manual_redis_client", lambda: None)
+    monkeypatch.setattr(backend.queue_store, "_queue_store", InMemoryQueueStore())
+    monkeypatch.setattr(broadcast, "_broadcast_log", broadcast.InMemoryBroadcastLog())
+    monkeypatch.setattr(cache, "queue_ops_log", cache.deque(maxlen=cache.QUEUE_OPS_LOG_SIZE))
+    monkeypatch.setattr(cache, "initial_state_cache", {})
+
+    app = Flask("beatsync-tests")
+    app.config["TESTING"] = True
+    app.cache = config.ManualRedisCache(Cache(app, config={"CACHE_TYPE": "SimpleCache"}))
+    return app
@@ -0,0 +1,106 @@
+"""
+Outbound backpressure patches private parts of Engine.IO: the async mode's
+queue class (its _put, queue deque and unfinished_tasks) and the server's
+create_queue. These tests fail if an Engine.IO upgrade moves any of them.
+"""
+
+import collections
+import queue
+import types
+
+import engineio
+import engineio.socket
+import pytest
+import socketio
+from engineio import packet as eio_packet
+
+from backend.websockets import backpressure
+from backend.websockets.backpressure import OutboundQueueMixin, install_backpressure
+
+
+def _async_modes():
+    modes = ["threading"]
+    try:
+        import eventlet  # noqa: F401
+        modes.append("eventlet")
+    except ImportError:
+        pass
+    return modes
+
+
+def event(data):
+    return eio_packet.Packet(eio_packet.MESSAGE, data)
+
+
+def events(q):
+    return [pkt.data for pkt in q.queue]
+
+
+@pytest.fixture
+def outbound_queue(monkeypatch):
+    monkeypatch.setattr(backpressure, "OUTBOUND_HIGH_WATER", 2)
+    monkeypatch.setattr(backpressure, "OUTBOUND_MAX_QUEUE", 5)
+    return backpressure._outbound_queue_class(queue.Queue)()
+
+
+@pytest.mark.parametrize("async_mode", _async_modes())
+def test_engineio_queue_internals(async_mode):
+    eio = engineio.Server(async_mode=async_mode)
+    assert callable(eio.create_queue)
+    base = eio._async["queue"]
+    q = base()
+    assert callable(getattr(base, "_put", None))
+    assert isinstance(q.queue, collections.deque)
+    assert isinstance(q.unfinished_tasks, int)
+    q.put(event('2["a"]'))
+    assert len(q.queue) == 1 and q.unfinished_tasks == 1
+
+
+@pytest.mark.parametrize("async_mode", _async_modes())
+def test_sockets_get_the_bounded_queue(async_mode):
+    server = socketio.Server(async_mode=async_mode)
+    install_backpressure(types.SimpleNamespace(server=server))
+    socket = engineio.socket.Socket(server.eio, "sid")
+    assert isinstance(socket.queue, OutboundQueueMixin)
+    assert isinstance(socket.queue, server.eio._async["queue"])
+
+
+def test_vote_updates_collapse_past_high_water(outbound_queue):
+    outbound_queue.put(event('2["track_added",{"n":0}]'))
+    outbound_queue.put(event('2["track_added",{"n":1}]'))
+    for votes in range(4):
+        outbound_queue.put(event('2["vote_updated",{"track_uri":"a","votes":%d}]' % votes))
+    outbound_queue.put(event('2["vote_updated",{"track_uri":"b","votes":1}]'))
+    assert events(outbound_queue)[2:] == [
+        '2["vote_updated",{"track_uri":"a","votes":3}]',
+        '2["vote_updated",{"track_uri":"b","votes":1}]',
+    ]
+    assert outbound_queue.unfinished_tasks == 4
+
+
+def test_laggard_gets_a_single_resync(outbound_queue):
+    for n in range(8):
+        outbound_queue.put(event('2["track_added",{"n":%d}]' % n))
+    assert events(outbound_queue).count('2["resync",{}]') == 1
+    assert len(outbound_queue.queue) <= backpressure.OUTBOUND_MAX_QUEUE
+    assert outbound_queue.unfinished_tasks == len(outbound_queue.queue)
+
+
+def test_queue_events_overtake_chat(outbound_queue):
+    outbound_queue.put(event('2/chat,["chat_message",{"message":"hi"}]'))
+    outbound_queue.put(event('2["track_removed",{"track_uri":"a"}]'))
+    assert events(outbound_queue) == [
+        '2["track_removed",{"track_uri":"a"}]',
+        '2/chat,["chat_message",{"message":"hi"}]',
+    ]
+
+
+def test_task_count_stays_balanced_for_join(outbound_queue):
+    for n in range(12):
+        outbound_queue.put(event('2["vote_updated",{"track_uri":"a","votes":%d}]' % n))
+        outbound_queue.put(event('2["track_added",{"n":%d}]' % n))
+    while not outbound_queue.empty():
+        outbound_queue.get()
+        outbound_queue.task_done()
+    outbound_queue.join()
+    assert outbound_queue.unfinished_tasks == 0
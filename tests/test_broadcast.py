@@ -0,0 +1,86 @@
+"""
+Sequenced broadcasts: every event gets the next seq and can be replayed from the log.
+"""
+
+import types
+
+import pytest
+
+from backend.utils.serialization import loads
+from backend.websockets import broadcast as broadcast_module
+from backend.websockets.broadcast import (
+    CHAT_NAMESPACE, InMemoryBroadcastLog, RedisBroadcastLog, broadcast, with_seq
+)
+
+
+@pytest.fixture(params=["memory", "redis"])
+def make_log(request):
+    def make(size=10):
+        if request.param == "memory":
+            return InMemoryBroadcastLog(size=size)
+        return RedisBroadcastLog(request.getfixturevalue("redis_client"), size=size)
+    return make
+
+
+class RecordingSocketIO:
+    def __init__(self):
+        self.emitted = []
+
+    def emit(self, event, payload, namespace=None):
+        self.emitted.append((event, payload, namespace))
+
+
+def test_with_seq_splices_into_the_encoded_object():
+    assert with_seq('{"track_uri":"a"}', 7) == '{"seq":7,"track_uri":"a"}'
+    assert with_seq("{}", 1) == '{"seq":1}'
+
+
+def test_since_returns_the_missed_events_in_order(make_log):
+    log = make_log()
+    for n in range(4):
+        assert log.append("vote_updated", '{"n":%d}' % n) == n + 1
+    assert log.current_seq() == 4
+    replay = log.since(2)
+    assert [(entry["seq"], entry["event"]) for entry in replay] == [(3, "vote_updated"), (4, "vote_updated")]
+    assert replay[0]["data"] == {"seq": 3, "n": 2}
+    assert log.since(4) == []
+
+
+def test_payloads_containing_colons_round_trip(make_log):
+    log = make_log()
+    log.append("track_added", '{"track_uri":"spotify:track:1"}')
+    assert log.since(0)[0]["data"] == {"seq": 1, "track_uri": "spotify:track:1"}
+
+
+def test_gaps_the_log_no_longer_covers_need_a_full_resync(make_log):
+    log = make_log(size=3)
+    for n in range(6):
+        log.append("vote_updated", "{}")
+    assert [entry["seq"] for entry in log.since(3)] == [4, 5, 6]
+    assert log.since(2) is None
+    # A client ahead of the log (the sequence was reset) must resync too
+    assert log.since(10) is None
+
+
+def test_broadcast_stamps_and_logs_default_namespace_events(monkeypatch):
+    log = InMemoryBroadcastLog()
+    monkeypatch.setattr(broadcast_module, "_broadcast_log", log)
+    app = types.SimpleNamespace(socketio=RecordingSocketIO())
+
+    assert broadcast("vote_updated", {"track_uri": "a"}, app=app) == 1
+    event, payload, namespace = app.socketio.emitted[0]
+    assert event == "vote_updated" and namespace is None
+    assert loads(payload) == {"seq": 1, "track_uri": "a"}
+    assert log.since(0)[0]["data"] == {"seq": 1, "track_uri": "a"}
+
+
+
+def test_chat_namespace_broadcasts_are_not_sequenced(monkeypatch):
+    log = InMemoryBroadcastLog()
+    monkeypatch.setattr(broadcast_module, "_broadcast_log", log)
+    app = types.SimpleNamespace(socketio=RecordingSocketIO())
+
+    assert broadcast("chat_message", {"message": "hi"}, app=app, namespace=CHAT_NAMESPACE) is None
+    event, payload, namespace = app.socketio.emitted[0]
+    assert namespace == CHAT_NAMESPACE and loads(payload) == {"message": "hi"}
+    assert log.current_seq() == 0
@@ -0,0 +1,118 @@
+"""
+Cache helpers: the in-memory cache generation shared through the state store.
+"""
+
+import pytest
+
+import backend.state_store
+from backend.state_store import InMemoryStateStore
+from backend.utils import cache
+
+
+class CountingStore(InMemoryStateStore):
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    def get(self, key):
+        self.reads += 1
+        return super().get(key)
+
+
+@pytest.fixture
+def state_store(monkeypatch):
+    store = CountingStore()
+    monkeypatch.setattr(backend.state_store, "get_state_store", lambda: store)
+    monkeypatch.setattr(cache, "_generation_sync", {"checked_at": 0, "subscribed": False})
+    cache._reset_in_memory_cache(None)
+    cache.get_in_memory_cache()  # first sync adopts the shared generation
+    return store
+
+
+def test_cache_hits_do_not_read_the_state_store(state_store):
+    reads = state_store.reads
+    for _ in range(100):
+        cache.get_in_memory_cache()
+    assert state_store.reads == reads
+
+
+def test_clear_in_another_worker_drops_this_workers_copy(state_store):
+    cache.set_in_memory_cache("playlists", ["p1"])
+    assert cache.get_in_memory_cache()["playlists"] == ["p1"]
+
+    # Another worker clears: bumps the shared generation and notifies everyone
+    generation = state_store.incr(cache.CACHE_GENERATION_KEY)
+    state_store.publish(cache.CACHE_CLEARED_CHANNEL, generation)
+
+    assert cache.get_in_memory_cache()["playlists"] is None
+    assert cache.get_in_memory_cache()["generation"] == generation
+
+
+def test_missed_notification_is_caught_by_the_periodic_check(state_store):
+    cache.set_in_memory_cache("playlists", ["p1"])
+    state_store.incr(cache.CACHE_GENERATION_KEY)  # no publish
+    assert cache.get_in_memory_cache()["playlists"] == ["p1"]
+
+    cache._generation_sync["checked_at"] -= cache.CACHE_GENERATION_CHECK_SECONDS + 1
+    assert cache.get_in_memory_cache()["playlists"] is None
+
+
+def test_local_clear_bumps_the_generation(state_store):
+    cache.set_in_memory_cache("playlists", ["p1"])
+    cache.clear_in_memory_cache()
+    assert state_store.get(cache.CACHE_GENERATION_KEY) == 1
+    assert cache.get_in_memory_cache()["playlists"] is None
+
+
+def test_initial_state_is_built_once_per_version(app, monkeypatch):
+    from backend.queue_store import get_queue_store
+    from backend.utils.serialization import loads
+
+    builds = []
+    snapshot = cache.get_versioned_queue_snapshot
+    monkeypatch.setattr(cache, "get_versioned_queue_snapshot", lambda app=None: builds.append(1) or snapshot(app))
+
+    with app.app_context():
+        get_queue_store().add_tracks([{"track_uri": "spotify:track:1", "track_name": "T1"}])
+        cache.record_queue_change("add", {})
+        first = cache.get_initial_state_payload()
+        second = cache.get_initial_state_payload()
+        assert first == second and len(builds) == 1
+        state = loads(first)
+        assert (state["version"], state["count"], state["seq"]) == (1, 1, 0)
+        assert state["queue"][0]["track_uri"] == "spotify:track:1"
+
+        get_queue_store().add_tracks([{"track_uri": "spotify:track:2", "track_name": "T2"}])
+        cache.record_queue_change("add", {})
+        assert loads(cache.get_initial_state_payload())["count"] == 2
+        assert len(builds) == 2
+
+
+def test_listener_initial_state_hides_the_playing_track(app):
+    from backend.queue_store import get_queue_store
+    from backend.utils.serialization import loads
+
+    with app.app_context():
+        get_queue_store().add_tracks([
+            {"track_uri": "spotify:track:1", "track_name": "T1"},
+            {"track_uri": "spotify:track:2", "track_name": "T2"},
+        ])
+        cache.record_queue_change("add", {})
+        cache.set_currently_playing("spotify:track:1", "T1")
+        host = loads(cache.get_initial_state_payload())
+        listener = loads(cache.get_initial_state_payload(hide_currently_playing=True))
+    assert host["count"] == 2
+    assert [item["track_uri"] for item in listener["queue"]] == ["spotify:track:2"]
+    assert listener["currently_playing"]["track_uri"] == "spotify:track:1"
+
+
+def test_initial_state_carries_the_current_broadcast_seq(app):
+    from backend.websockets.broadcast import get_broadcast_log
+    from backend.utils.serialization import loads
+
+    with app.app_context():
+        assert loads(cache.get_initial_state_payload())["seq"] == 0
+        # Broadcasts that don't change the body still advance the sequence
+        get_broadcast_log().append("playback_paused", "{}")
+        get_broadcast_log().append("playback_paused", "{}")
+        assert loads(cache.get_initial_state_payload())["seq"] == 2
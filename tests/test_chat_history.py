@@ -0,0 +1,154 @@
+"""
+Chat history: ids handed out before a message is saved, and cursor pages on
+(timestamp, id).
+"""
+
+from datetime import datetime
+
+import pytest
+
+import backend.state_store
+from backend.models.database_config import get_db
+from backend.models.chat_models import ChatMessage
+from backend.state_store import InMemoryStateStore
+from backend.utils import chat_history, chat_writer
+from backend.utils.chat_history import load_history_page
+from backend.utils.serialization import loads
+
+
+@pytest.fixture
+def state_store(monkeypatch):
+    store = InMemoryStateStore()
+    monkeypatch.setattr(backend.state_store, "get_state_store", lambda: store)
+    monkeypatch.setattr(chat_writer, "get_state_store", lambda: store)
+    monkeypatch.setattr(chat_writer, "_chat_id_seeded", False)
+    return store
+
+
+def save(*rows):
+    with get_db() as db:
+        db.add_all(ChatMessage(id=id, user="u", message=f"m{id}", timestamp=ts) for id, ts in rows)
+
+
+def ids(page):
+    return [message["id"] for message in page["messages"]]
+
+
+def test_chat_ids_start_past_the_saved_messages(db_tables, state_store):
+    save((7, datetime(2026, 1, 1)))
+    assert chat_writer.next_chat_id() == 8
+    assert chat_writer.next_chat_id() == 9
+
+    # Another process seeds from the database too, but keeps the shared counter
+    chat_writer._chat_id_seeded = False
+    assert chat_writer.next_chat_id() == 10
+
+
+def test_pages_walk_back_through_messages_sharing_a_timestamp(db_tables):
+    same = datetime(2026, 1, 1, 12, 0, 0)
+    save((1, datetime(2026, 1, 1, 11)), (2, same), (3, same), (4, same), (5, datetime(2026, 1, 1, 13)))
+
+    page = load_history_page(before_id=5, limit=2)
+    assert ids(page) == [3, 4] and page["has_more"]
+    page = load_history_page(page["before_id"], page["before_timestamp"], limit=2)
+    assert ids(page) == [1, 2] and not page["has_more"]
+
+
+def test_cursor_for_a_message_not_saved_yet(db_tables):
+    same = datetime(2026, 1, 1, 12, 0, 0)
+    save((1, same), (2, same))
+    # Message 3 is still in the write-behind buffer: its id and timestamp locate it
+    page = load_history_page(before_id=3, before_timestamp="2026-01-01T12:00:00+00:00")
+    assert ids(page) == [1, 2]
+    # Without the timestamp an unknown id has nothing before it
+    assert ids(load_history_page(before_id=3)) == []
+
+
+def test_timestamp_alone_is_not_a_cursor(db_tables):
+    with pytest.raises(ValueError):
+        load_history_page(before_timestamp="2026-01-01T12:00:00+00:00")
+    with pytest.raises(ValueError):
+        load_history_page(before_id=1, before_timestamp="yesterday")
+
+
+class CountingRedis:
+    """Wraps a client and counts SET calls (the loaded marker)"""
+
+    def __init__(self, client):
+        self._client = client
+        self.sets = 0
+
+    def set(self, *args, **kwargs):
+        self.sets += 1
+        return self._client.set(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def test_redis_buffer_checks_the_loaded_marker_once_per_process(db_tables, redis_client):
+    client = CountingRedis(redis_client)
+    buffer = chat_history.RedisChatBuffer(client, size=5)
+    for n in range(3):
+        buffer.append(f'{{"id":{n}}}')
+        buffer.recent_payload()
+    assert client.sets == 1
+
+
+def test_failed_redis_load_is_retried(db_tables, redis_client, monkeypatch):
+    save((1, datetime(2026, 1, 1)))
+    buffer = chat_history.RedisChatBuffer(redis_client, size=5)
+
+    def down(limit):
+        raise ConnectionError("database unavailable")
+
+    monkeypatch.setattr(chat_history, "load_recent_from_db", down)
+    with pytest.raises(ConnectionError):
+        buffer.recent_payload()
+    assert not redis_client.exists(buffer.loaded_key)
+
+    monkeypatch.undo()
+    assert ids(loads(buffer.recent_payload())) == [1]
+
+
+@pytest.fixture(params=["memory", "redis"])
+def make_buffer(request):
+    def make(size):
+        if request.param == "memory":
+            return chat_history.InMemoryChatBuffer(size=size)
+        return chat_history.RedisChatBuffer(request.getfixturevalue("redis_client"), size=size)
+    return make
+
+
+def test_buffer_starts_from_the_newest_saved_messages(db_tables, make_buffer):
+    save(*((n, datetime(2026, 1, 1, 12, n)) for n in range(1, 6)))
+    buffer = make_buffer(3)
+    buffer.append('{"id":6}')
+    assert ids(loads(buffer.recent_payload())) == [4, 5, 6]
+    assert ids(loads(buffer.recent_payload(limit=2))) == [5, 6]
+    assert loads(buffer.recent_payload(limit=0)) == {"messages": []}
+
+
+def test_buffer_keeps_the_last_size_messages(db_tables, make_buffer):
+    buffer = make_buffer(3)
+    for n in range(1, 6):
+        buffer.append(f'{{"id":{n}}}')
+    assert ids(loads(buffer.recent_payload(limit=10))) == [3, 4, 5]
+
+
+def test_clear_empties_the_buffer_without_reloading(db_tables, make_buffer):
+    save((1, datetime(2026, 1, 1)))
+    buffer = make_buffer(3)
+    buffer.append('{"id":2}')
+    buffer.clear()
+    assert ids(loads(buffer.recent_payload())) == []
+    buffer.append('{"id":3}')
+    assert ids(loads(buffer.recent_payload())) == [3]
+
+
+def test_in_memory_payload_is_reused_until_the_next_message(db_tables):
+    buffer = chat_history.InMemoryChatBuffer(size=3)
+    first = buffer.recent_payload()
+    assert buffer.recent_payload() is first
+    buffer.append('{"id":1}')
+    assert buffer.recent_payload() is not first
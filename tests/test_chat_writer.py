@@ -0,0 +1,57 @@
+"""
+Chat write-behind: a batch that fails must not keep failing every flush.
+"""
+
+from datetime import datetime, timezone
+
+from backend.models.database_config import get_db
+from backend.models.chat_models import ChatMessage
+from backend.utils import chat_writer
+from backend.utils.chat_writer import ChatWriteBehind
+
+
+def row(message, user="u"):
+    return {"user": user, "message": message, "timestamp": datetime.now(timezone.utc)}
+
+
+def saved_messages():
+    with get_db() as db:
+        return [m.message for m in db.query(ChatMessage).order_by(ChatMessage.id)]
+
+
+def test_batch_is_written_in_order(db_tables):
+    writer = ChatWriteBehind(limit=10)
+    for n in range(3):
+        writer._pending.append(row(f"m{n}"))
+    assert writer.flush() == 3
+    assert saved_messages() == ["m0", "m1", "m2"]
+
+
+def test_bad_row_is_dropped_and_the_rest_are_saved(db_tables):
+    writer = ChatWriteBehind(limit=10)
+    writer._pending.extend([row("m0"), row(None), row("m2")])  # message is NOT NULL
+    assert writer.flush() == 2
+    assert saved_messages() == ["m0", "m2"]
+    stats = writer.get_stats()
+    assert stats["pending"] == 0 and stats["dropped"] == 1 and stats["failed_flushes"] == 1
+
+    writer._pending.append(row("m3"))
+    assert writer.flush() == 1
+    assert saved_messages() == ["m0", "m2", "m3"]
+
+
+def test_rows_are_kept_while_the_database_is_down(db_tables, monkeypatch):
+    def down():
+        raise ConnectionError("database unavailable")
+
+    monkeypatch.setattr(chat_writer, "get_db", down)
+    writer = ChatWriteBehind(limit=10)
+    writer._pending.extend([row("m0"), row("m1")])
+    assert writer.flush() == 0
+    assert [r["message"] for r in writer._pending] == ["m0", "m1"]
+    assert writer.get_stats()["dropped"] == 0
+
+    monkeypatch.undo()
+    writer._pending.append(row("m2"))
+    assert writer.flush() == 3
+    assert saved_messages() == ["m0", "m1", "m2"]
@@ -0,0 +1,63 @@
+"""
+Response compression: versioned JSON is serialized and compressed once per version.
+"""
+
+import gzip
+
+import pytest
+
+from backend.utils import compression
+from backend.utils.compression import choose_encoding, compress_response, versioned_json_response
+from backend.utils.serialization import loads
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(compression, "response_cache", compression.OrderedDict())
+    monkeypatch.setattr(compression, "COMPRESSION_THRESHOLD", 10)
+
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0, deflate") is None
+    assert choose_encoding("") is None
+    assert choose_encoding("*") == "gzip"
+
+
+def test_versioned_payload_is_built_and_compressed_once(app, monkeypatch):
+    builds, compressions = [], []
+    real_compress = compression.compress
+    monkeypatch.setattr(compression, "compress", lambda body, encoding: compressions.append(1) or real_compress(body, encoding))
+
+    def build():
+        builds.append(1)
+        return {"queue": ["a"] * 20, "version": 3}
+
+    with app.test_request_context():
+        for _ in range(3):
+            response = compress_response(versioned_json_response(("queue", 3), build), "gzip")
+            assert response.headers["Content-Encoding"] == "gzip"
+            assert loads(gzip.decompress(response.get_data()))["version"] == 3
+        # Clients that don't accept gzip get the same cached body uncompressed
+        plain = compress_response(versioned_json_response(("queue", 3), build), "")
+        assert loads(plain.get_data())["version"] == 3
+    assert len(builds) == 1 and len(compressions) == 1
+
+
+def test_new_version_is_built_again(app):
+    with app.test_request_context():
+        first = versioned_json_response(("queue", 1), lambda: {"version": 1})
+        second = versioned_json_response(("queue", 2), lambda: {"version": 2})
+    assert loads(first.get_data()) == {"version": 1}
+    assert loads(second.get_data()) == {"version": 2}
+
+
+def test_small_and_unversioned_responses(app):
+    from flask import jsonify
+
+    with app.test_request_context():
+        small = compress_response(jsonify({"a": 1}), "gzip")
+        assert "Content-Encoding" not in small.headers
+        large = compress_response(jsonify({"items": list(range(50))}), "gzip")
+        assert large.headers["Content-Encoding"] == "gzip"
+    assert compression.response_cache == {}
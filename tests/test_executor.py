@@ -0,0 +1,28 @@
+"""
+Background pools: a full pool sheds new tasks without touching the others.
+"""
+
+import threading
+
+from backend.utils.executor import BoundedPool
+
+
+def test_full_pool_sheds_tasks_and_counts_them():
+    started, release = threading.Event(), threading.Event()
+    chat = BoundedPool("chat", workers=1, max_queued=1)
+    other = BoundedPool("initial_sync", workers=1, max_queued=1)
+    try:
+        chat.submit(lambda: started.set() or release.wait())
+        assert started.wait(3)
+        assert chat.submit(lambda: None) is not None  # waits behind the running task
+        assert chat.submit(lambda: None) is None
+        assert chat.stats()["rejected"] == 1
+
+        # A chat flood doesn't hold up the other pools
+        assert other.submit(lambda: "ok").result(timeout=3) == "ok"
+    finally:
+        release.set()
+        chat._executor.shutdown(wait=True)
+        other._executor.shutdown(wait=True)
+    stats = chat.stats()
+    assert stats["completed"] == 2 and stats["queued"] == 0 and stats["running"] == 0
@@ -0,0 +1,80 @@
+"""
+Host lease: claimed with compare-and-set, renewed by heartbeats, expiring when they stop.
+"""
+
+import time
+
+import pytest
+
+from backend.state_store import InMemoryStateStore, RedisStateStore
+from backend.utils import host
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request, monkeypatch):
+    if request.param == "memory":
+        store = InMemoryStateStore()
+    else:
+        store = RedisStateStore(request.getfixturevalue("redis_client"))
+    monkeypatch.setattr(host, "get_state_store", lambda: store)
+    monkeypatch.setattr(host, "_host_cache", {"host": None, "loaded_at": 0, "subscribed": True})
+    return store
+
+
+def test_first_claim_wins(store):
+    assert host.claim_host("u1", "Alice")
+    assert not host.claim_host("u2", "Bob")
+    current = host.get_current_host()
+    assert (current["user_id"], current["display_name"]) == ("u1", "Alice")
+    assert host.is_current_host("u1")
+    assert not host.is_current_host("u2")
+    assert not host.is_current_host(None)
+
+
+def test_renewal_extends_the_lease(store):
+    assert host.claim_host("u1", "Alice")
+    first_expiry = host.get_current_host()["expires_at"]
+    time.sleep(0.01)
+    assert host.renew_host("u1", "Alice")
+    assert host.get_current_host()["expires_at"] > first_expiry
+
+
+def test_lapsed_lease_can_be_taken_over(store, monkeypatch):
+    monkeypatch.setattr(host, "HOST_LEASE_TTL", 0.1)
+    assert host.claim_host("u1", "Alice")
+    assert not host.claim_host("u2", "Bob")
+    time.sleep(0.2)
+    assert host.get_current_host() is None
+    assert host.claim_host("u2", "Bob")
+    assert host.is_current_host("u2")
+    # The old host's heartbeat can't take it back
+    assert not host.renew_host("u1", "Alice")
+
+
+def test_clear_only_releases_the_holders_lease(store):
+    assert host.claim_host("u1", "Alice")
+    host.clear_host("u2")
+    assert host.is_current_host("u1")
+    host.clear_host("u1")
+    assert host.get_current_host() is None
+    assert host.claim_host("u2", "Bob")
+
+
+def test_update_host_requires_the_lease(store):
+    assert host.claim_host("u1", "Host")
+    assert not host.update_host("u2", "u3", "Mallory")
+    assert host.update_host("u1", "u1", "Alice")
+    assert host.get_current_host()["display_name"] == "Alice"
+
+
+def test_change_notifications_update_other_workers(store, monkeypatch):
+    # Another worker's copy is stale until the change notification reaches it
+    monkeypatch.setattr(host, "_host_cache", {"host": None, "loaded_at": time.time(), "subscribed": False})
+    assert host.get_current_host() is None
+    store.set(host.HOST_KEY, {"user_id": "u9", "display_name": "Zed", "expires_at": time.time() + 60})
+    assert host.get_current_host() is None
+    store.publish(host.HOST_CHANNEL, store.get(host.HOST_KEY))
+    deadline = time.time() + 3
+    while host.get_current_host() is None and time.time() < deadline:
+        time.sleep(0.05)
+    assert host.is_current_host("u9")
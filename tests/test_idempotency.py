@@ -0,0 +1,57 @@
+"""
+Client operation IDs: a retried write replays the first result instead of writing again.
+"""
+
+from collections import OrderedDict
+
+import pytest
+
+from backend.utils import idempotency
+from backend.utils.idempotency import claim_operation, complete_operation, release_operation
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend_client(request, monkeypatch):
+    client = request.getfixturevalue("redis_client") if request.param == "redis" else None
+    monkeypatch.setattr(idempotency, "get_redis_client", lambda app=None: client)
+    monkeypatch.setattr(idempotency, "_recent_operations", OrderedDict())
+    return client
+
+
+def test_first_claim_wins_and_replays_get_the_result(backend_client):
+    assert claim_operation("vote:u1", "op1") == (True, None)
+    # Still in flight: claimed by someone else, no result yet
+    assert claim_operation("vote:u1", "op1") == (False, None)
+    complete_operation("vote:u1", "op1", {"up_votes": 1})
+    assert claim_operation("vote:u1", "op1") == (False, {"up_votes": 1})
+
+
+def test_scopes_and_missing_ids_are_independent(backend_client):
+    assert claim_operation("vote:u1", "op1")[0]
+    assert claim_operation("vote:u2", "op1")[0]
+    assert claim_operation("vote:u1", None) == (True, None)
+    assert claim_operation("vote:u1", None) == (True, None)
+
+
+def test_released_operation_can_be_retried(backend_client):
+    assert claim_operation("queue:u1", "op1")[0]
+    release_operation("queue:u1", "op1")
+    assert claim_operation("queue:u1", "op1") == (True, None)
+
+
+def test_other_workers_see_the_claim_through_redis(redis_client, monkeypatch):
+    monkeypatch.setattr(idempotency, "get_redis_client", lambda app=None: redis_client)
+    monkeypatch.setattr(idempotency, "_recent_operations", OrderedDict())
+    assert claim_operation("vote:u1", "op1")[0]
+    complete_operation("vote:u1", "op1", {"up_votes": 2})
+
+    # A second worker has nothing in its own memory
+    monkeypatch.setattr(idempotency, "_recent_operations", OrderedDict())
+    assert claim_operation("vote:u1", "op1") == (False, {"up_votes": 2})
+
+
+def test_local_memory_is_bounded(backend_client, monkeypatch):
+    monkeypatch.setattr(idempotency, "OPERATION_LRU_SIZE", 3)
+    for n in range(5):
+        complete_operation("vote:u1", f"op{n}", {"n": n})
+    assert len(idempotency._recent_operations) == 3
@@ -0,0 +1,57 @@
+"""
+Listener numbers: the smallest free number, reused after release or lease expiry.
+"""
+
+import time
+
+import pytest
+
+from backend.utils.listener_numbers import InMemoryListenerNumbers, RedisListenerNumbers
+
+
+@pytest.fixture(params=["memory", "redis"])
+def make_numbers(request):
+    def make(ttl=60):
+        if request.param == "memory":
+            return InMemoryListenerNumbers(ttl=ttl)
+        return RedisListenerNumbers(request.getfixturevalue("redis_client"), ttl=ttl)
+    return make
+
+
+def test_numbers_count_up_and_are_stable_per_sid(make_numbers):
+    numbers = make_numbers()
+    assert [numbers.assign(sid) for sid in ("a", "b", "c")] == [1, 2, 3]
+    assert numbers.assign("b") == 2
+
+
+def test_smallest_released_number_is_reused_first(make_numbers):
+    numbers = make_numbers()
+    for sid in ("a", "b", "c", "d"):
+        numbers.assign(sid)
+    assert numbers.release("c") == 3
+    assert numbers.release("b") == 2
+    assert numbers.release("b") is None
+    assert numbers.assign("e") == 2
+    assert numbers.assign("f") == 3
+    assert numbers.assign("g") == 5
+
+
+def test_renew_only_for_current_holders(make_numbers):
+    numbers = make_numbers()
+    numbers.assign("a")
+    assert numbers.renew("a")
+    numbers.release("a")
+    assert not numbers.renew("a")
+
+
+def test_expired_leases_are_reclaimed(make_numbers):
+    numbers = make_numbers(ttl=0.1)
+    numbers.assign("a")
+    numbers.assign("b")
+    time.sleep(0.05)
+    assert numbers.renew("b")
+    time.sleep(0.07)
+    # a missed its heartbeat; b renewed in time
+    assert not numbers.renew("a")
+    assert numbers.renew("b")
+    assert numbers.assign("c") == 1
@@ -0,0 +1,61 @@
+"""
+Lease locks and their fencing tokens, with Redis and with the in-process fallback.
+"""
+
+import time
+
+import pytest
+
+from backend.utils import locks
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend_client(request, monkeypatch):
+    client = request.getfixturevalue("redis_client") if request.param == "redis" else None
+    monkeypatch.setattr(locks, "get_redis_client", lambda app=None: client)
+    monkeypatch.setattr(locks, "_local_leases", {})
+    monkeypatch.setattr(locks, "_local_fence", {"last": 0})
+    return client
+
+
+def test_only_one_holder_at_a_time(backend_client):
+    token = locks.acquire_lease("autoplay", 1000)
+    assert token is not None
+    assert locks.acquire_lease("autoplay", 1000) is None
+    assert locks.lease_is_current("autoplay", token)
+    assert locks.acquire_lease("other", 1000) is not None
+
+
+def test_release_lets_the_next_holder_in(backend_client):
+    token = locks.acquire_lease("autoplay", 1000)
+    assert not locks.release_lease("autoplay", token + 1)
+    assert locks.release_lease("autoplay", token)
+    assert not locks.lease_is_current("autoplay", token)
+    assert locks.acquire_lease("autoplay", 1000) is not None
+
+
+def test_release_with_hold_keeps_others_out(backend_client):
+    token = locks.acquire_lease("autoplay", 1000)
+    assert locks.release_lease("autoplay", token, hold_ms=100)
+    assert locks.acquire_lease("autoplay", 1000) is None
+    time.sleep(0.15)
+    assert locks.acquire_lease("autoplay", 1000) is not None
+
+
+def test_expired_lease_is_taken_over_with_a_newer_token(backend_client):
+    first = locks.acquire_lease("autoplay", 50)
+    time.sleep(0.1)
+    assert not locks.lease_is_current("autoplay", first)
+    second = locks.acquire_lease("autoplay", 1000)
+    assert second > first
+    assert locks.lease_is_current("autoplay", second)
+
+
+def test_tokens_never_go_backwards_or_fall_behind_the_clock(backend_client):
+    tokens = []
+    for _ in range(5):
+        token = locks.acquire_lease("autoplay", 1000)
+        tokens.append(token)
+        locks.release_lease("autoplay", token)
+    assert tokens == sorted(set(tokens))
+    assert tokens[0] >= int(time.time() * 1000) - 1000
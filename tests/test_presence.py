@@ -0,0 +1,105 @@
+"""
+Presence: per-role counts with heartbeat expiry, and one presence_updated
+announcement per change across workers.
+"""
+
+import pytest
+
+from backend.utils import presence
+from backend.utils.presence import (
+    BROADCAST_CLAIMED, BROADCAST_THROTTLED, BROADCAST_UNCHANGED, InMemoryPresence, RedisPresence
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(presence, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "redis"])
+def tracker(request, clock):
+    if request.param == "memory":
+        return InMemoryPresence(ttl=90)
+    return RedisPresence(request.getfixturevalue("redis_client"), ttl=90)
+
+
+def test_counts_follow_joins_and_leaves(tracker):
+    tracker.join("s1", "host")
+    tracker.join("s2", "listener")
+    tracker.join("s3", "listener")
+    tracker.join("s3", "listener")  # reconnect with the same sid counts once
+    assert tracker.counts() == {"host": 1, "listener": 2, "guest": 0, "total": 3}
+
+    tracker.join("s2", "guest")  # role change moves the sid
+    assert tracker.leave("s3", "listener")
+    assert not tracker.leave("s3", "listener")
+    assert tracker.counts() == {"host": 1, "listener": 0, "guest": 1, "total": 2}
+
+
+def test_sids_without_heartbeats_expire(tracker, clock):
+    tracker.join("s1", "listener")
+    tracker.join("s2", "listener")
+    clock.now += 60
+    assert tracker.touch("s1", "listener")
+    clock.now += 60
+    assert tracker.counts()["listener"] == 1
+    assert not tracker.touch("s2", "listener")
+    assert tracker.counts()["total"] == 1
+
+
+def test_unchanged_counts_are_not_announced_again(tracker):
+    counts = {"host": 1, "listener": 2, "guest": 0, "total": 3}
+    assert tracker.claim_broadcast(counts) == BROADCAST_CLAIMED
+    assert tracker.claim_broadcast(dict(counts)) == BROADCAST_UNCHANGED
+
+
+def test_one_worker_announces_per_interval(redis_client):
+    first = RedisPresence(redis_client)
+    second = RedisPresence(redis_client)
+    assert first.claim_broadcast({"host": 1, "total": 1}) == BROADCAST_CLAIMED
+    # Same counts already announced by another worker
+    assert second.claim_broadcast({"host": 1, "total": 1}) == BROADCAST_UNCHANGED
+    # New counts inside the interval wait for the next window
+    assert second.claim_broadcast({"host": 1, "listener": 1, "total": 2}) == BROADCAST_THROTTLED
+
+
+class RecordingSocketIO:
+    def __init__(self):
+        self.emitted = []
+        self.scheduled = []
+
+    def sleep(self, seconds):
+        pass
+
+    def start_background_task(self, fn, *args):
+        self.scheduled.append((fn, args))
+
+    def emit(self, event, payload):
+        self.emitted.append((event, payload))
+
+
+def test_throttled_broadcast_is_rescheduled(monkeypatch):
+    class Throttled(InMemoryPresence):
+        def claim_broadcast(self, counts):
+            return BROADCAST_THROTTLED
+
+    monkeypatch.setattr(presence, "_presence", Throttled())
+    monkeypatch.setattr(presence, "_broadcast_pending", False)
+    socketio = RecordingSocketIO()
+    presence.schedule_presence_broadcast(socketio)
+    presence.schedule_presence_broadcast(socketio)  # one pending send at a time
+    assert len(socketio.scheduled) == 1
+
+    fn, args = socketio.scheduled.pop()
+    fn(*args)
+    assert socketio.emitted == [] and len(socketio.scheduled) == 1
@@ -0,0 +1,112 @@
+"""
+GET /queue/: ETag revalidation and incremental ?since=<version> reads.
+POST /queue/bulk-add: skipped and truncated counts.
+"""
+
+import pytest
+
+from backend.queue_store import get_queue_store
+from backend.routes import queue as queue_routes
+from backend.routes.queue import queue_bp
+from backend.utils import cache
+from backend.utils.cache import record_queue_change
+
+
+@pytest.fixture
+def client(app):
+    app.register_blueprint(queue_bp, url_prefix="/queue")
+    return app.test_client()
+
+
+def add(app, n):
+    with app.app_context():
+        added = get_queue_store().add_tracks([{"track_uri": f"spotify:track:{n}", "track_name": f"T{n}"}])
+        return record_queue_change("add", added[0])
+
+
+def test_etag_revalidation(app, client):
+    add(app, 1)
+    response = client.get("/queue/")
+    assert response.status_code == 200
+    assert response.get_json()["count"] == 1
+    etag = response.headers["ETag"]
+
+    assert client.get("/queue/", headers={"If-None-Match": etag}).status_code == 304
+
+    add(app, 2)
+    response = client.get("/queue/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.get_json()["count"] == 2
+    assert response.headers["ETag"] != etag
+
+
+def test_since_returns_only_the_missed_ops(app, client):
+    add(app, 1)
+    add(app, 2)
+    add(app, 3)
+    body = client.get("/queue/?since=1").get_json()
+    assert body["version"] == 3
+    assert [op["version"] for op in body["ops"]] == [2, 3]
+    assert [op["data"]["track_uri"] for op in body["ops"]] == ["spotify:track:2", "spotify:track:3"]
+
+    assert client.get("/queue/?since=3").get_json()["ops"] == []
+
+
+def test_since_outside_the_log_falls_back_to_a_snapshot(app, client):
+    for n in range(3):
+        add(app, n)
+    cache.queue_ops_log.popleft()  # version 1 rolled out of the log
+    body = client.get("/queue/?since=0").get_json()
+    assert body["full"] is True and body["count"] == 3
+
+    # A version from the future (e.g. after a reset) also gets the full queue
+    assert client.get("/queue/?since=99").get_json()["full"] is True
+
+
+def test_queue_is_ordered_by_score_then_age(app, client):
+    for n in range(3):
+        add(app, n)
+    get_queue_store().cast_vote("spotify:track:2", "u1", "up")
+    with app.app_context():
+        record_queue_change("vote", {})
+    queue = client.get("/queue/").get_json()["queue"]
+    assert [item["track_uri"] for item in queue] == ["spotify:track:2", "spotify:track:0", "spotify:track:1"]
+    assert queue[0]["vote_score"] == 1
+
+
+def track(n):
+    return {"track_uri": f"spotify:track:{n}", "track_name": f"T{n}"}
+
+
+@pytest.fixture
+def listener(app, client):
+    app.secret_key = "test"
+    with client.session_transaction() as sess:
+        sess["role"] = "listener"
+        sess["user_id"] = "l1"
+    return client
+
+
+def test_bulk_add_counts_skipped_and_truncated_separately(listener, monkeypatch):
+    monkeypatch.setattr(queue_routes, "MAX_BULK_TRACKS", 4)
+    tracks = [track(1), track(1), "not a track", track(2), track(3), track(4)]
+    body = listener.post("/queue/bulk-add", json={"tracks": tracks}).get_json()
+    assert (body["added"], body["skipped"], body["truncated"]) == (2, 2, 2)
+    assert [t["track_uri"] for t in body["tracks"]] == ["spotify:track:1", "spotify:track:2"]
+
+
+@pytest.mark.parametrize("tracks", [None, []])
+def test_bulk_add_with_no_tracks_loads_the_playlist(listener, monkeypatch, tracks):
+    loaded = []
+    monkeypatch.setattr(queue_routes, "resolve_playlist_tracks",
+                        lambda playlist_id, **kwargs: loaded.append(playlist_id) or [track(1)])
+    body = {"playlist_id": "p1", "source": "custom"}
+    if tracks is not None:
+        body["tracks"] = tracks
+    result = listener.post("/queue/bulk-add", json=body).get_json()
+    assert loaded == ["p1"] and result["added"] == 1 and result["truncated"] == 0
+
+
+def test_bulk_add_needs_tracks_or_a_playlist(listener):
+    assert listener.post("/queue/bulk-add", json={"tracks": []}).status_code == 400
+    assert listener.post("/queue/bulk-add", json=["spotify:track:1"]).status_code == 400
@@ -0,0 +1,164 @@
+"""
+The memory, Redis and SQL queue stores must behave the same.
+"""
+
+import pytest
+
+from backend.queue_store import InMemoryQueueStore, RedisQueueStore, SQLQueueStore, QueueStore
+from backend.queue_store import StaleFenceError, pick_next_track
+from backend.queue_store import memory_store, redis_store
+from backend.utils import votes
+
+
+@pytest.fixture(params=["memory", "redis", "sql"])
+def store(request):
+    if request.param == "memory":
+        return InMemoryQueueStore()
+    if request.param == "redis":
+        return RedisQueueStore(request.getfixturevalue("redis_client"))
+    request.getfixturevalue("db_tables")
+    return SQLQueueStore()
+
+
+@pytest.fixture
+def ledger_mode(monkeypatch):
+    for module in (votes, memory_store, redis_store):
+        monkeypatch.setattr(module, "VOTE_MODE", "ledger")
+
+
+def track(n):
+    return {"track_uri": f"spotify:track:{n}", "track_name": f"Track {n} - Artist"}
+
+
+def uris(items):
+    return [item["track_uri"] for item in items]
+
+
+def test_interface_is_abstract():
+    with pytest.raises(TypeError):
+        QueueStore()
+
+
+def test_add_skips_tracks_already_queued(store):
+    added = store.add_tracks([track(1), track(2)])
+    assert uris(added) == ["spotify:track:1", "spotify:track:2"]
+    assert all(item["timestamp"] for item in added)
+
+    added = store.add_tracks([track(2), track(3), track(1)])
+    assert uris(added) == ["spotify:track:3"]
+    assert store.add_track("spotify:track:3", "Track 3 - Artist") is None
+    assert uris(store.get_items()) == ["spotify:track:1", "spotify:track:2", "spotify:track:3"]
+    assert store.count() == 3
+
+
+def test_items_carry_their_vote_counts(store):
+    store.add_tracks([track(1), track(2)])
+    store.cast_vote("spotify:track:2", "u1", "up")
+    store.cast_vote("spotify:track:2", "u2", "down")
+    store.cast_vote("spotify:track:2", "u3", "up")
+    item = store.get_track("spotify:track:2")
+    assert (item["track_name"], item["up_votes"], item["down_votes"]) == ("Track 2 - Artist", 2, 1)
+    assert store.get_track("spotify:track:9") is None
+
+
+def test_next_track_is_highest_score_then_oldest(store):
+    store.add_tracks([track(1), track(2), track(3)])
+    assert store.get_next_track()["track_uri"] == "spotify:track:1"
+    store.cast_vote("spotify:track:3", "u1", "up")
+    assert store.get_next_track()["track_uri"] == "spotify:track:3"
+    store.cast_vote("spotify:track:1", "u1", "down")
+    store.cast_vote("spotify:track:3", "u2", "down")
+    # 2 (score 0) is older than 3 (score 0); 1 is at -1
+    assert store.get_next_track()["track_uri"] == "spotify:track:2"
+
+
+def test_remove_and_clear(store):
+    store.add_tracks([track(1), track(2), track(3)])
+    store.cast_vote("spotify:track:2", "u1", "up")
+    assert store.remove_track("spotify:track:1")
+    assert not store.remove_track("spotify:track:1")
+    assert uris(store.get_items()) == ["spotify:track:2", "spotify:track:3"]
+
+    assert store.clear() == 2
+    assert store.get_items() == []
+    assert store.get_next_track() is None
+    store.add_tracks([track(2)])
+    assert store.get_track("spotify:track:2")["up_votes"] == 0
+
+
+def test_fenced_removal_rejects_older_tokens(store):
+    store.add_tracks([track(1), track(2), track(3)])
+    assert store.remove_track("spotify:track:1", fence_token=10)
+    with pytest.raises(StaleFenceError):
+        store.remove_track("spotify:track:2", fence_token=9)
+    assert store.get_track("spotify:track:2") is not None
+    assert store.remove_track("spotify:track:2", fence_token=10)
+    assert store.remove_track("spotify:track:3", fence_token=11)
+
+
+def test_fenced_clear_shares_the_removal_fence(store):
+    store.add_tracks([track(1), track(2)])
+    assert store.remove_track("spotify:track:1", fence_token=10)
+    with pytest.raises(StaleFenceError):
+        store.clear(fence_token=9)
+    assert store.count() == 1
+    assert store.clear(fence_token=11) == 1
+    with pytest.raises(StaleFenceError):
+        store.remove_track("spotify:track:2", fence_token=10)
+
+
+def test_clear_forgets_who_voted(store, ledger_mode):
+    store.add_tracks([track(1)])
+    store.cast_vote("spotify:track:1", "u1", "up")
+    store.clear()
+    store.add_tracks([track(1)])
+    assert store.cast_vote("spotify:track:1", "u1", "up") == (1, 0)
+
+
+def test_pick_next_track():
+    items = [
+        {"track_uri": "a", "track_name": "A", "up_votes": 1, "down_votes": 1},
+        {"track_uri": "b", "track_name": "B", "up_votes": 2, "down_votes": 0},
+        {"track_uri": "c", "track_name": "C", "up_votes": 3, "down_votes": 1},
+    ]
+    assert pick_next_track(items) == {
+        "track_uri": "b", "track_name": "B", "up_votes": 2, "down_votes": 0, "net_score": 2
+    }
+    assert pick_next_track([]) is None
+
+
+def test_vote_for_a_track_that_is_not_queued_records_nothing(store):
+    assert store.cast_vote("spotify:track:1", "u1", "up") is None
+    assert store.retract_vote("spotify:track:1", "u1") is None
+
+    store.add_tracks([track(1)])
+    assert store.get_track("spotify:track:1")["up_votes"] == 0
+
+
+def test_readded_track_starts_without_votes(store):
+    store.add_tracks([track(1)])
+    assert store.cast_vote("spotify:track:1", "u1", "up") == (1, 0)
+    assert store.remove_track("spotify:track:1")
+    assert store.cast_vote("spotify:track:1", "u2", "up") is None
+
+    store.add_tracks([track(1)])
+    item = store.get_track("spotify:track:1")
+    assert (item["up_votes"], item["down_votes"]) == (0, 0)
+
+
+def test_unlimited_votes_count_every_click(store):
+    store.add_tracks([track(1)])
+    store.cast_vote("spotify:track:1", "u1", "up")
+    store.cast_vote("spotify:track:1", "u1", "up")
+    assert store.cast_vote("spotify:track:1", "u1", "down") == (2, 1)
+    assert store.retract_vote("spotify:track:1", "u1") == (2, 0)
+
+
+def test_ledger_keeps_one_vote_per_user(store, ledger_mode):
+    store.add_tracks([track(1)])
+    assert store.cast_vote("spotify:track:1", "u1", "up") == (1, 0)
+    assert store.cast_vote("spotify:track:1", "u1", "up") == (1, 0)
+    assert store.cast_vote("spotify:track:1", "u1", "down") == (0, 1)
+    assert store.cast_vote("spotify:track:1", "u2", "down") == (0, 2)
+    assert store.retract_vote("spotify:track:1", "u1") == (0, 1)
+    assert store.retract_vote("spotify:track:1", "u1") == (0, 1)
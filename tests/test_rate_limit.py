@@ -0,0 +1,88 @@
+"""
+Token buckets for socket events, in process and in Redis.
+"""
+
+import pytest
+
+from backend.utils import rate_limit
+from backend.utils.rate_limit import InMemoryRateLimiter, RedisRateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    monkeypatch.setitem(rate_limit.RATE_LIMITS, "chat", (1.0, 3.0))
+    return clock
+
+
+@pytest.fixture(params=["memory", "redis"])
+def limiter(request, clock):
+    if request.param == "memory":
+        return InMemoryRateLimiter()
+    return RedisRateLimiter(request.getfixturevalue("redis_client"))
+
+
+def test_burst_then_reject(limiter):
+    assert [limiter.allow("chat", "u1") for _ in range(4)] == [True, True, True, False]
+    # Other users have their own bucket
+    assert limiter.allow("chat", "u2")
+
+
+def test_bucket_refills_at_the_rate(limiter, clock):
+    for _ in range(3):
+        limiter.allow("chat", "u1")
+    assert not limiter.allow("chat", "u1")
+    clock.now += 1
+    assert limiter.allow("chat", "u1")
+    assert not limiter.allow("chat", "u1")
+    # Refill stops at the burst size
+    clock.now += 60
+    assert [limiter.allow("chat", "u1") for _ in range(4)] == [True, True, True, False]
+
+
+def test_refilled_buckets_are_pruned(clock):
+    limiter = InMemoryRateLimiter()
+    limiter.allow("chat", "u1")
+    limiter.allow("chat", "u2")
+    clock.now += 0.5
+    limiter._prune(clock.now)
+    assert ("chat", "u1") in limiter._buckets  # 2.5 of 3 tokens
+    clock.now += 0.5
+    limiter._prune(clock.now)
+    assert limiter._buckets == {}
+
+
+def test_allow_event_counts_rejections_and_fails_open(clock, monkeypatch):
+    monkeypatch.setattr(rate_limit, "_rate_limiter", InMemoryRateLimiter())
+    monkeypatch.setattr(rate_limit, "_rejected", {name: 0 for name in rate_limit.RATE_LIMITS})
+    for _ in range(5):
+        rate_limit.allow_event("chat", "u1")
+    assert rate_limit.get_rate_limit_stats()["chat"] == {"rate_per_second": 1.0, "burst": 3.0, "rejected": 2}
+
+    class Broken:
+        def allow(self, name, identity):
+            raise ConnectionError("redis down")
+
+    monkeypatch.setattr(rate_limit, "_rate_limiter", Broken())
+    assert rate_limit.allow_event("chat", "u1")
+
+
+def test_invalid_limits_fall_back_to_the_default(monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_TEST", "fast")
+    assert rate_limit._parse_limit("RATE_LIMIT_TEST", "1,5") == (1.0, 5.0)
+    monkeypatch.setenv("RATE_LIMIT_TEST", "0,5")
+    assert rate_limit._parse_limit("RATE_LIMIT_TEST", "1,5") == (1.0, 5.0)
+    monkeypatch.setenv("RATE_LIMIT_TEST", "2,10")
+    assert rate_limit._parse_limit("RATE_LIMIT_TEST", "1,5") == (2.0, 10.0)
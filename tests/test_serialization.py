@@ -0,0 +1,44 @@
+"""
+Pre-encoded payloads must reach clients as JSON values, locally and when
+relayed to other workers through a Socket.IO message queue.
+"""
+
+import socketio
+from socketio import packet
+from backend.utils import serialization
+from backend.utils.serialization import EncodedJSON, dumps, loads
+
+
+class CapturingManager(socketio.PubSubManager):
+    """Message queue manager that keeps what it would publish"""
+
+    def __init__(self):
+        super().__init__(channel="test", write_only=True)
+        self.published = []
+
+    def _publish(self, data):
+        self.published.append(self.json.dumps(data))
+
+
+def test_encoded_json_spliced_at_top_level():
+    assert dumps(["vote_updated", EncodedJSON('{"seq":1}')]) == '["vote_updated",{"seq":1}]'
+
+
+def test_encoded_json_spliced_when_nested():
+    text = dumps({"method": "emit", "data": [EncodedJSON('{"seq":1,"track_uri":"a"}')], "room": None})
+    assert loads(text) == {"method": "emit", "data": [{"seq": 1, "track_uri": "a"}], "room": None}
+
+
+def test_broadcast_through_message_queue_arrives_as_object():
+    manager = CapturingManager()
+    server = socketio.Server(client_manager=manager, json=serialization)
+    server.emit("vote_updated", EncodedJSON('{"seq":1,"track_uri":"a","up_votes":2}'))
+
+    assert len(manager.published) == 1
+    message = loads(manager.published[0])
+    assert message["event"] == "vote_updated"
+    assert message["data"] == [{"seq": 1, "track_uri": "a", "up_votes": 2}]
+
+    # The relaying worker encodes the decoded arguments into the client packet
+    pkt = server.packet_class(packet.EVENT, data=["vote_updated"] + message["data"])
+    assert pkt.encode() == '2["vote_updated",{"seq":1,"track_uri":"a","up_votes":2}]'
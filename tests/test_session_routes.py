@@ -0,0 +1,51 @@
+"""
+POST /restart-session: only the host holding the lease may wipe the session.
+"""
+
+import pytest
+
+from backend.queue_store import get_queue_store
+from backend.routes.session import session_mgmt_bp
+from backend.state_store import InMemoryStateStore
+from backend.utils import host
+
+
+@pytest.fixture
+def client(app, db_tables, monkeypatch):
+    store = InMemoryStateStore()
+    monkeypatch.setattr(host, "get_state_store", lambda: store)
+    monkeypatch.setattr(host, "_host_cache", {"host": None, "loaded_at": 0, "subscribed": True})
+    app.secret_key = "test"
+    app.register_blueprint(session_mgmt_bp)
+    with app.app_context():
+        get_queue_store().add_tracks([{"track_uri": "spotify:track:1", "track_name": "T1"}])
+    return app.test_client()
+
+
+def login(client, role, user_id):
+    with client.session_transaction() as sess:
+        sess["role"] = role
+        sess["user_id"] = user_id
+
+
+def queued(app):
+    with app.app_context():
+        return get_queue_store().count()
+
+
+@pytest.mark.parametrize("role,user_id", [("listener", "l1"), ("host", "stale-host"), (None, None)])
+def test_only_the_current_host_can_restart(app, client, role, user_id):
+    host.claim_host("h1", "Host")
+    if role:
+        login(client, role, user_id)
+    assert client.post("/restart-session").status_code == 403
+    assert queued(app) == 1
+    assert host.is_current_host("h1")
+
+
+def test_current_host_restarts_and_releases_the_lease(app, client):
+    host.claim_host("h1", "Host")
+    login(client, "host", "h1")
+    assert client.post("/restart-session").status_code == 200
+    assert queued(app) == 0
+    assert host.get_current_host() is None
@@ -0,0 +1,96 @@
+"""
+The in-process and Redis state stores must behave the same.
+"""
+
+import threading
+import time
+
+import pytest
+
+from backend.state_store import InMemoryStateStore, RedisStateStore, StateStore
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request):
+    if request.param == "memory":
+        return InMemoryStateStore()
+    return RedisStateStore(request.getfixturevalue("redis_client"))
+
+
+def test_interface_is_abstract():
+    with pytest.raises(TypeError):
+        StateStore()
+
+
+def test_values_round_trip_as_json(store):
+    assert store.get("missing") is None
+    store.set("host", {"user_id": "u1", "numbers": [1, 2]})
+    assert store.get("host") == {"user_id": "u1", "numbers": [1, 2]}
+    assert store.delete("host")
+    assert not store.delete("host")
+    assert store.get("host") is None
+
+
+def test_values_expire_after_ttl(store):
+    store.set("short", 1, ttl=0.05)
+    store.set("long", 2, ttl=60)
+    time.sleep(0.1)
+    assert store.get("short") is None
+    assert store.get("long") == 2
+
+
+def test_set_if_absent(store):
+    assert store.set_if_absent("lease", "a", ttl=60)
+    assert not store.set_if_absent("lease", "b", ttl=60)
+    assert store.get("lease") == "a"
+
+
+def test_compare_and_set_and_delete(store):
+    store.set("host", {"user_id": "u1"})
+    assert not store.compare_and_set("host", {"user_id": "u2"}, {"user_id": "u3"})
+    assert store.compare_and_set("host", {"user_id": "u1"}, {"user_id": "u2"})
+    assert store.get("host") == {"user_id": "u2"}
+    assert not store.compare_and_delete("host", {"user_id": "u1"})
+    assert store.compare_and_delete("host", {"user_id": "u2"})
+    assert store.get("host") is None
+    # None as expected means "only if missing"
+    assert store.compare_and_set("host", None, {"user_id": "u4"})
+
+
+def test_incr_and_expire(store):
+    assert store.incr("generation") == 1
+    assert store.incr("generation", 5) == 6
+    assert not store.expire("missing", 60)
+    assert store.expire("generation", 0.05)
+    time.sleep(0.1)
+    assert store.get("generation") is None
+
+
+def test_hashes(store):
+    assert store.hash_get("numbers", "sid1") is None
+    store.hash_set("numbers", "sid1", 1)
+    store.hash_set("numbers", "sid2", {"n": 2})
+    assert store.hash_get("numbers", "sid2") == {"n": 2}
+    assert store.hash_get_all("numbers") == {"sid1": 1, "sid2": {"n": 2}}
+    assert store.hash_delete("numbers", "sid1")
+    assert not store.hash_delete("numbers", "sid1")
+    assert store.hash_get_all("numbers") == {"sid2": {"n": 2}}
+
+
+def test_publish_reaches_subscribers(store):
+    received = []
+    arrived = threading.Event()
+
+    def on_message(message):
+        received.append(message)
+        arrived.set()
+
+    worker = store.subscribe("cache:cleared", on_message)
+    try:
+        time.sleep(0.1)
+        store.publish("cache:cleared", {"generation": 3})
+        assert arrived.wait(3)
+        assert received == [{"generation": 3}]
+    finally:
+        if worker is not None:
+            worker.stop()
@@ -0,0 +1,72 @@
+"""
+Vote helpers: ledger mode keeps one row per user and track.
+"""
+
+import pytest
+
+from backend.models.database_config import get_db
+from backend.models.models import Vote, VoteLedger
+from backend.utils import votes
+
+
+@pytest.fixture
+def ledger_mode(monkeypatch):
+    monkeypatch.setattr(votes, "VOTE_MODE", "ledger")
+
+
+@pytest.fixture(params=["upsert", "read-then-write"])
+def ledger_write_path(request, monkeypatch, ledger_mode):
+    # Dialects without ON CONFLICT fall back to updating the row they read
+    if request.param == "read-then-write":
+        monkeypatch.setattr(votes, "dialect_insert", lambda model: None)
+
+
+def test_ledger_repeated_clicks_update_one_row(db_tables, ledger_write_path):
+    with get_db() as db:
+        for _ in range(5):
+            assert votes.cast_vote(db, "spotify:track:1", "u1", "up") == (1, 0)
+        assert votes.cast_vote(db, "spotify:track:1", "u1", "down") == (0, 1)
+        assert votes.cast_vote(db, "spotify:track:1", "u2", "down") == (0, 2)
+    with get_db() as db:
+        assert db.query(VoteLedger).count() == 2
+        assert db.query(Vote).count() == 0
+
+
+def test_ledger_retract_removes_the_users_vote(db_tables, ledger_mode):
+    with get_db() as db:
+        votes.cast_vote(db, "spotify:track:1", "u1", "up")
+        votes.cast_vote(db, "spotify:track:1", "u2", "up")
+        assert votes.retract_vote(db, "spotify:track:1", "u1") == (1, 0)
+        assert votes.retract_vote(db, "spotify:track:1", "u1") == (1, 0)
+
+
+def test_unlimited_mode_keeps_every_click(db_tables, monkeypatch):
+    monkeypatch.setattr(votes, "VOTE_MODE", "unlimited")
+    with get_db() as db:
+        votes.cast_vote(db, "spotify:track:1", "u1", "up")
+        votes.cast_vote(db, "spotify:track:1", "u1", "up")
+        assert votes.cast_vote(db, "spotify:track:1", "u1", "down") == (2, 1)
+        # Retract undoes the latest click only
+        assert votes.retract_vote(db, "spotify:track:1", "u1") == (2, 0)
+        assert db.query(Vote).count() == 2
+
+
+def test_count_votes_groups_by_track(db_tables, ledger_mode):
+    with get_db() as db:
+        votes.cast_vote(db, "spotify:track:1", "u1", "up")
+        votes.cast_vote(db, "spotify:track:1", "u2", "down")
+        votes.cast_vote(db, "spotify:track:2", "u1", "up")
+        assert votes.count_votes(db) == {"spotify:track:1": (1, 1), "spotify:track:2": (1, 0)}
+        assert votes.count_votes(db, ["spotify:track:2"]) == {"spotify:track:2": (1, 0)}
+        assert votes.get_track_votes(db, "spotify:track:3") == (0, 0)
+
+
+def test_delete_votes_clears_both_tables(db_tables, monkeypatch):
+    with get_db() as db:
+        monkeypatch.setattr(votes, "VOTE_MODE", "ledger")
+        votes.cast_vote(db, "spotify:track:1", "u1", "up")
+        votes.cast_vote(db, "spotify:track:2", "u1", "up")
+        monkeypatch.setattr(votes, "VOTE_MODE", "unlimited")
+        votes.cast_vote(db, "spotify:track:1", "u1", "up")
+        assert votes.delete_votes(db, "spotify:track:1") == 2
+        assert votes.delete_votes(db) == 1